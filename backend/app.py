@@ -1,37 +1,57 @@
+import hmac
+import importlib
 import os
 import logging
+import time
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from services.registry import registry
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 def create_app():
+    app_started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
     app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
     
+    # Use the client address from X-Forwarded-For so anonymous rate limits aren't shared by everyone behind the proxy
+    if Config.TRUSTED_PROXY_COUNT:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_COUNT, x_proto=Config.TRUSTED_PROXY_COUNT)
+    
     # Enable CORS
     CORS(app, origins=[Config.FRONTEND_ORIGIN])
     
-    # Register Blueprints
-    from routes.auth import auth_bp
-    from routes.journal import journal_bp
-    from routes.planner import planner_bp
-    from routes.progress import progress_bp
-    from routes.gamification import gamification_bp
-    from routes.chat import chat_bp
-    from routes.meditations import meditations_bp
+    # Per-user rate limiting (limits are applied per route in the blueprints)
+    from utils.rate_limit import limiter
+    limiter.init_app(app)
+    
+    # Register Blueprints (service clients are created on first use, not on import)
+    blueprints = [
+        ('routes.auth', 'auth_bp', '/api/auth'),
+        ('routes.journal', 'journal_bp', '/api/journal'),
+        ('routes.planner', 'planner_bp', '/api/planner'),
+        ('routes.progress', 'progress_bp', '/api/progress'),
+        ('routes.gamification', 'gamification_bp', '/api/gamification'),
+        ('routes.chat', 'chat_bp', '/api/chat'),
+        ('routes.meditations', 'meditations_bp', '/api/meditations'),
+    ]
+    for module_name, blueprint_name, url_prefix in blueprints:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        registry.record_startup(f"import {module_name}", started)
+        app.register_blueprint(getattr(module, blueprint_name), url_prefix=url_prefix)
+    
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
     
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(journal_bp, url_prefix='/api/journal')
-    app.register_blueprint(planner_bp, url_prefix='/api/planner')
-    app.register_blueprint(progress_bp, url_prefix='/api/progress')
-    app.register_blueprint(gamification_bp, url_prefix='/api/gamification')
-    app.register_blueprint(chat_bp, url_prefix='/api/chat')
-    app.register_blueprint(meditations_bp, url_prefix='/api/meditations')
+    registry.record_startup("create_app total", app_started)
+    logger.info("Startup timings (ms): " + ", ".join(f"{label}={ms}" for label, ms in registry.startup_ms.items()))
     
     @app.route('/')
     def index():
@@ -54,11 +74,54 @@ def create_app():
             "service": "glowra-backend",
             "environment": Config.FLASK_ENV
         })
-    
+
+    @app.route('/metrics')
+    def metrics():
+        # Internal only: a bearer token is required; without one, DEV_MODE allows loopback callers
+        if Config.METRICS_TOKEN:
+            supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(supplied.encode(), Config.METRICS_TOKEN.encode()):
+                return jsonify({"error": "Not found"}), 404
+        else:
+            # Check the socket peer, not the X-Forwarded-For address ProxyFix put in remote_addr
+            peer = request.environ.get('werkzeug.proxy_fix.orig', request.environ).get('REMOTE_ADDR')
+            if not Config.DEV_MODE or peer not in ('127.0.0.1', '::1'):
+                return jsonify({"error": "Not found"}), 404
+        
+        from services.firebase_service import firebase_service
+        from services.journal_analysis_service import journal_analysis_service
+        from services.analysis_cache import analysis_cache
+        from services.model_router import model_router
+        from services.ai_service import ai_service
+        from services.plan_service import plan_service
+        from services.conversation_service import conversation_service
+        from services.bigquery_batcher import bigquery_batcher
+        from services.analytics_spool import analytics_spool
+        from utils.rate_limit import rate_limit_stats
+        return jsonify({
+            "token_cache": firebase_service.get_cache_stats(),
+            "journal_analysis": journal_analysis_service.stats(),
+            "analysis_cache": analysis_cache.stats(),
+            "model_routing": model_router.stats(),
+            "gemini_circuits": ai_service.resilience_stats(),
+            "plan_pregeneration": plan_service.stats(),
+            "ai_single_flight": ai_service.inflight_stats(),
+            "conversation_summaries": conversation_service.stats(),
+            "rate_limits": rate_limit_stats(),
+            "bigquery_stream": bigquery_batcher.stats(),
+            "analytics_spool": analytics_spool.stats() if analytics_spool else None,
+            "services": registry.stats()
+        })
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({"error": "Not found"}), 404
     
+    @app.errorhandler(429)
+    def rate_limited(error):
+        # Retry-After and X-RateLimit-* headers are added by the limiter
+        return jsonify({"error": "Too many requests, please slow down", "limit": str(error.description)}), 429
+    
     @app.errorhandler(500)
     def internal_error(error):
         logger.error(f"Internal server error: {error}")
@@ -66,6 +129,21 @@ def create_app():
     
     return app
 
+def start_serving_jobs():
+    """Start background jobs that belong in request-serving processes only.
+
+    Called by gunicorn's post_fork and by the dev server, never from
+    create_app, so `flask` CLI commands and the preloaded arbiter don't run
+    them. The analytics spool drains right away so rows left by a crashed
+    process are replayed.
+    """
+    if Config.ANALYTICS_SPOOL_DIR:
+        from services.analytics_spool import analytics_spool
+        analytics_spool.start()
+
 if __name__ == '__main__':
     app = create_app()
+    # debug=True runs a reloader parent; only its child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_serving_jobs()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,145 @@
+"""Compare worker memory with and without preloading the app before fork.
+
+Forks N workers the way gunicorn does and reads each worker's PSS and USS
+from /proc (Linux only) while all of them are alive:
+
+  - per-worker: each worker imports and builds the app after the fork
+    (gunicorn without preload_app)
+  - preload: the parent builds the app and freezes the GC, workers inherit
+    it copy-on-write (gunicorn.conf.py)
+
+No service clients are created in either mode; every worker also does a
+little request-like work so the preloaded pages it touches are counted.
+
+    GEMINI_API_KEY=x python benchmarks/bench_fork_memory.py --workers 4
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def build_app():
+    from app import create_app
+    return create_app()
+
+
+def touch(app):
+    """A bit of per-request work: routing, schemas and the lexicon classifier"""
+    from services.ai_service import JournalInsight
+    from services.lexicon_classifier import lexicon_classifier
+
+    insight = lexicon_classifier.classify("Work deadlines keep me up at night and I feel anxious")
+    JournalInsight.model_validate({k: v for k, v in insight.items() if k != 'provisional'})
+    with app.test_client() as client:
+        client.get('/health')
+
+
+def read_memory(pid):
+    """Return (pss_kb, uss_kb) for a process from smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values.get('Pss', 0), values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+
+
+def run(mode, workers):
+    app = None
+    if mode == 'preload':
+        app = build_app()
+        gc.freeze()
+
+    children = []
+    for _ in range(workers):
+        ready_r, ready_w = os.pipe()
+        done_r, done_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(done_w)
+            status = 0
+            try:
+                worker_app = app or build_app()
+                touch(worker_app)
+            except Exception as e:
+                print(f"worker failed: {e}", file=sys.stderr)
+                status = 1
+            finally:
+                os.write(ready_w, b'1')
+                os.read(done_r, 1)  # stay alive until the parent has measured everyone
+                os._exit(status)
+        os.close(ready_w)
+        os.close(done_r)
+        children.append((pid, ready_r, done_w))
+
+    for _, ready_r, _ in children:
+        os.read(ready_r, 1)
+    time.sleep(0.2)
+
+    parent_pss, _ = read_memory(os.getpid())
+    worker_memory = [read_memory(pid) for pid, _, _ in children]
+
+    for pid, ready_r, done_w in children:
+        os.write(done_w, b'1')
+        os.waitpid(pid, 0)
+        os.close(ready_r)
+        os.close(done_w)
+
+    worker_pss = sum(pss for pss, _ in worker_memory)
+    return {
+        'mode': mode,
+        'workers': workers,
+        'parent_pss_mb': round(parent_pss / 1024, 1),
+        'worker_pss_mb': round(worker_pss / 1024 / workers, 1),
+        'worker_uss_mb': round(sum(uss for _, uss in worker_memory) / 1024 / workers, 1),
+        'total_pss_mb': round((parent_pss + worker_pss) / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mode', choices=['per-worker', 'preload'])
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit("This benchmark needs Linux /proc/<pid>/smaps_rollup")
+
+    if args.mode:
+        result = run(args.mode, args.workers)
+        print(json.dumps(result))
+        return
+
+    # Run each mode in a fresh interpreter so the parent starts from the same baseline
+    import subprocess
+    results = []
+    for mode in ('per-worker', 'preload'):
+        output = subprocess.run([sys.executable, __file__, '--mode', mode, '--workers', str(args.workers)],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<12}{'workers':>8}{'parent PSS':>12}{'worker PSS':>12}{'worker USS':>12}{'total PSS':>12}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['workers']:>8}{r['parent_pss_mb']:>10.1f}MB{r['worker_pss_mb']:>10.1f}MB"
+              f"{r['worker_uss_mb']:>10.1f}MB{r['total_pss_mb']:>10.1f}MB")
+    saved = results[0]['total_pss_mb'] - results[1]['total_pss_mb']
+    print(f"\npreloading saves {saved:.1f}MB across {args.workers} workers")
+
+
+if __name__ == '__main__':
+    main()
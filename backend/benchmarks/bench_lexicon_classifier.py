@@ -0,0 +1,92 @@
+"""Measure speed and label accuracy of the local lexicon classifier.
+
+Runs LexiconClassifier.classify over the labeled journal fixtures and
+reports per-entry latency plus mood accuracy, category precision/recall and
+risk recall (the fast path must catch moderate and high risk entries).
+
+    python benchmarks/bench_lexicon_classifier.py --rounds 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.lexicon_classifier import LexiconClassifier
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "journal_labels.json")
+
+
+def evaluate(classifier, samples):
+    mood_correct = 0
+    category_tp = category_fp = category_fn = 0
+    risky = risky_caught = false_alarms = 0
+    misses = []
+
+    for sample in samples:
+        result = classifier.classify(sample["text"])
+        if result["mood"] == sample["mood"]:
+            mood_correct += 1
+        else:
+            misses.append({"text": sample["text"][:60], "expected": sample["mood"], "got": result["mood"]})
+
+        expected = set(sample["categories"]) - {"general"}
+        predicted = set(result["categories"]) - {"general"}
+        category_tp += len(expected & predicted)
+        category_fp += len(predicted - expected)
+        category_fn += len(expected - predicted)
+
+        if sample["risk"] != "low":
+            risky += 1
+            risky_caught += result["risk"] != "low"
+        elif result["risk"] != "low":
+            false_alarms += 1
+
+    return {
+        "samples": len(samples),
+        "mood_accuracy": round(mood_correct / len(samples), 3),
+        "category_precision": round(category_tp / max(1, category_tp + category_fp), 3),
+        "category_recall": round(category_tp / max(1, category_tp + category_fn), 3),
+        "risk_recall": round(risky_caught / max(1, risky), 3),
+        "risk_false_alarms": false_alarms,
+        "mood_misses": misses
+    }
+
+
+def time_classify(classifier, samples, rounds):
+    samples_us = []
+    for _ in range(rounds):
+        for sample in samples:
+            start = time.perf_counter()
+            classifier.classify(sample["text"])
+            samples_us.append((time.perf_counter() - start) * 1e6)
+    samples_us.sort()
+    return {
+        "p50_us": round(statistics.median(samples_us), 2),
+        "p95_us": round(samples_us[int(len(samples_us) * 0.95) - 1], 2),
+        "mean_us": round(statistics.fmean(samples_us), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--fixtures", default=FIXTURES)
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        samples = json.load(f)
+
+    classifier = LexiconClassifier()
+    results = {
+        "accuracy": evaluate(classifier, samples),
+        "latency": time_classify(classifier, samples, args.rounds)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compare local ID token verification against the firebase_admin path.
+
+Generates a throwaway RSA key and self-signed certificate, writes them as a
+certificate fixture in the format served by Google's securetoken endpoint,
+and times SigningKeyStore.verify on tokens signed with that key. Pass
+--live-token with a real Firebase ID token (and credentials configured) to
+time auth.verify_id_token for comparison.
+
+    python benchmarks/bench_token_verify.py --iterations 2000
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from services.key_store import SigningKeyStore, FIREBASE_ISSUER_PREFIX
+
+PROJECT_ID = "glowra-bench"
+KID = "bench-key"
+
+
+def write_fixture(directory):
+    """Create a signing key and a certs fixture file; return (signer, path)"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+
+    certs_path = os.path.join(directory, "certs.json")
+    with open(certs_path, "w") as f:
+        json.dump({KID: cert.public_bytes(serialization.Encoding.PEM).decode()}, f)
+
+    pem = key.private_bytes(serialization.Encoding.PEM,
+                            serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    signer = crypt.RSASigner.from_string(pem, key_id=KID)
+    return signer, certs_path
+
+
+def make_token(signer, uid):
+    now = int(time.time())
+    payload = {
+        "iss": f"{FIREBASE_ISSUER_PREFIX}{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": uid,
+        "auth_time": now,
+        "iat": now,
+        "exp": now + 3600,
+        "email": f"{uid}@bench.local"
+    }
+    return jwt.encode(signer, payload).decode()
+
+
+def time_calls(fn, tokens):
+    samples = []
+    for token in tokens:
+        start = time.perf_counter()
+        fn(token)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+        "mean_ms": round(statistics.fmean(samples), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--live-token", help="Real Firebase ID token to time firebase_admin verification")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        signer, certs_path = write_fixture(tmp)
+        store = SigningKeyStore(PROJECT_ID, certs_file=certs_path)
+        store.load()
+
+        tokens = [make_token(signer, f"user-{i}") for i in range(args.iterations)]
+        results = {"local_verify": time_calls(store.verify, tokens)}
+
+    if args.live_token:
+        from services.firebase_service import firebase_service
+        from firebase_admin import auth
+        # Warm firebase_admin's certificate cache, then time steady state
+        auth.verify_id_token(args.live_token)
+        results["firebase_admin_verify"] = time_calls(auth.verify_id_token,
+                                                      [args.live_token] * args.iterations)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import click
+import logging
+from config import Config
+from datetime import datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def register_commands(app):
+    """Register maintenance CLI commands (run with `flask --app main <command>`)"""
+
+    @app.cli.command('backfill-rollups')
+    @click.option('--days', default=90, show_default=True, help='Number of past days to rebuild')
+    @click.option('--uid', default=None, help='Rebuild a single user instead of all users')
+    def backfill_rollups(days, uid):
+        """Rebuild user_daily_rollups documents from raw mood logs, journals and plans"""
+        from services.firestore_service import firestore_service
+        from utils.helpers import build_daily_rollups
+
+        if uid:
+            uids = [uid]
+        else:
+            uids = [doc.id for doc in firestore_service.db.collection('users').stream()]
+
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=days)
+        dates = [(end_date.date() - timedelta(days=i)).isoformat() for i in range(days)]
+
+        for user_id in uids:
+            mood_logs = firestore_service.get_mood_logs(user_id, start_date, end_date)
+            journal_entries = firestore_service.get_journal_entries(
+                user_id, limit=None, from_date=start_date, fields=['ai_insight']
+            )
+            daily_plans = list(firestore_service.get_daily_plans(user_id, dates).values())
+
+            rollups = build_daily_rollups(mood_logs, journal_entries, daily_plans)
+            for date, rollup in rollups.items():
+                firestore_service.replace_daily_rollup(user_id, date, rollup)
+            click.echo(f"{user_id}: rebuilt {len(rollups)} daily rollups")
+
+    @app.cli.command('migrate-mood-buckets')
+    @click.option('--uid', default=None, help='Migrate a single user instead of all users')
+    def migrate_mood_buckets(uid):
+        """Copy mood_logs documents into monthly buckets before switching MOOD_LOG_STORAGE to buckets"""
+        from services.firestore_service import firestore_service
+
+        if uid:
+            uids = [uid]
+        else:
+            uids = [doc.id for doc in firestore_service.db.collection('users').stream()]
+
+        total = 0
+        for user_id in uids:
+            copied = firestore_service.migrate_mood_logs_to_buckets(user_id)
+            total += copied
+            click.echo(f"{user_id}: copied {copied} mood logs")
+        click.echo(f"Copied {total} mood logs for {len(uids)} users")
+
+    @app.cli.command('reanalyze-journals')
+    @click.option('--older-than-minutes', default=10, show_default=True,
+                  help='Only pick up entries left pending/failed for at least this long')
+    @click.option('--limit', default=100, show_default=True)
+    def reanalyze_journals(older_than_minutes, limit):
+        """Re-run analysis for journal entries whose background analysis never completed"""
+        from services.ai_service import ai_service
+        from services.firestore_service import firestore_service
+        from services.analytics_spool import analytics_sink
+
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=older_than_minutes)
+        entries = firestore_service.get_pending_journal_entries(cutoff, limit)
+        for entry in entries:
+            ai_insight = ai_service.analyze_journal(entry['text'])
+            firestore_service.save_journal_insight(entry['user_id'], entry['id'], ai_insight, entry['timestamp'])
+            analytics_sink.stream_journal_insight({**entry, 'ai_insight': ai_insight})
+        analytics_sink.flush()
+        click.echo(f"Re-analyzed {len(entries)} journal entries")
+
+    @app.cli.command('init-bigquery')
+    def init_bigquery():
+        """Create the BigQuery analytics dataset and tables if they don't exist"""
+        from services.bigquery_service import bigquery_service
+
+        bigquery_service.ensure_schema()
+        click.echo(f"BigQuery dataset {Config.BQ_DATASET} is ready")
+
+    @app.cli.command('drain-analytics-spool')
+    def drain_analytics_spool():
+        """Load sealed analytics spool segments into BigQuery now"""
+        from services.analytics_spool import analytics_spool
+
+        if analytics_spool is None:
+            raise click.ClickException("ANALYTICS_SPOOL_DIR is not set")
+        report = analytics_spool.drain()
+        if 'skipped' in report:
+            click.echo(f"Skipped: {report['skipped']}")
+            return
+        click.echo(f"Loaded {report['rows']} rows in {report['batches']} batches, "
+                   f"{report['failed']} tables failed, {report['recovered']} segments recovered")
+
+    @app.cli.command('run-plan-scheduler')
+    @click.option('--at', 'run_at', default=Config.PLAN_PREGENERATE_AT or None,
+                  help='Daily run time (HH:MM, UTC); defaults to PLAN_PREGENERATE_AT')
+    def run_plan_scheduler(run_at):
+        """Pre-generate daily plans every day at a fixed time (run in exactly one process)"""
+        from services.plan_service import plan_service
+
+        if not run_at:
+            raise click.ClickException("Pass --at or set PLAN_PREGENERATE_AT")
+        try:
+            plan_service.run_scheduler(run_at)
+        except KeyboardInterrupt:
+            plan_service.stop_scheduler()
+
+    @app.cli.command('pregenerate-plans')
+    @click.option('--date', default=None, help='Plan date (YYYY-MM-DD, UTC); defaults to today')
+    @click.option('--active-days', default=Config.PLAN_PREGENERATE_ACTIVE_DAYS, show_default=True,
+                  help='Only users with activity in this many past days')
+    @click.option('--workers', default=Config.PLAN_PREGENERATE_WORKERS, show_default=True,
+                  help='Concurrent plan generations')
+    @click.option('--uid', 'uids', multiple=True, help='Generate for specific users instead of all active users')
+    @click.option('--overwrite', is_flag=True, help='Regenerate plans that already exist')
+    def pregenerate_plans(date, active_days, workers, uids, overwrite):
+        """Generate daily plans ahead of time so the first dashboard load is a single read"""
+        from services.plan_service import plan_service
+
+        report = plan_service.pregenerate_plans(date=date, uids=list(uids) or None, active_days=active_days,
+                                                workers=workers, overwrite=overwrite)
+        click.echo(f"{report['date']}: {report['generated']} generated, {report['failed']} failed, "
+                   f"{report['skipped_existing']} already existed of {report['candidates']} users "
+                   f"in {report['elapsed_seconds']}s ({report['plans_per_second']} plans/s)")
+        if report['failed_uids']:
+            click.echo(f"Failed users: {', '.join(report['failed_uids'])}")
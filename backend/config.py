@@ -13,6 +13,15 @@ class Config:
     FIREBASE_API_KEY = os.environ.get('FIREBASE_API_KEY')
     FIREBASE_APP_ID = os.environ.get('FIREBASE_APP_ID')
     GOOGLE_APPLICATION_CREDENTIALS = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+    TOKEN_CACHE_TTL_SECONDS = int(os.environ.get('TOKEN_CACHE_TTL_SECONDS', '300'))
+    TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', '10000'))
+    JWT_LOCAL_VERIFY = os.environ.get('JWT_LOCAL_VERIFY', 'false').lower() == 'true'
+    FIREBASE_CERTS_URL = os.environ.get(
+        'FIREBASE_CERTS_URL',
+        'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+    )
+    FIREBASE_CERTS_FILE = os.environ.get('FIREBASE_CERTS_FILE')
+    FIREBASE_CERTS_REFRESH_MARGIN_SECONDS = int(os.environ.get('FIREBASE_CERTS_REFRESH_MARGIN_SECONDS', '300'))
     
     # Google Cloud Configuration
     GCP_PROJECT = os.environ.get('GCP_PROJECT')
@@ -21,14 +30,96 @@ class Config:
     # AI Configuration
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     
+    # Model routing: try the fast model first, escalate to the strong model when rules trip
+    MODEL_ROUTING_ENABLED = os.environ.get('MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+    JOURNAL_FAST_MODEL = os.environ.get('JOURNAL_FAST_MODEL', 'gemini-2.5-flash')
+    JOURNAL_STRONG_MODEL = os.environ.get('JOURNAL_STRONG_MODEL', 'gemini-2.5-pro')
+    JOURNAL_MIN_CONFIDENCE = float(os.environ.get('JOURNAL_MIN_CONFIDENCE', '0.7'))
+    JOURNAL_ESCALATE_RISKS = os.environ.get('JOURNAL_ESCALATE_RISKS', 'moderate,high')
+    CHAT_FAST_MODEL = os.environ.get('CHAT_FAST_MODEL', 'gemini-2.5-flash')
+    CHAT_STRONG_MODEL = os.environ.get('CHAT_STRONG_MODEL', 'gemini-2.5-pro')
+    CHAT_ESCALATE_MOODS = os.environ.get('CHAT_ESCALATE_MOODS', 'hopeless,suicidal,crisis,distressed')
+    
+    # Prompt token budgets per call type (estimated at ~4 characters per token)
+    PROMPT_BUDGET_CHAT_TOKENS = int(os.environ.get('PROMPT_BUDGET_CHAT_TOKENS', '1200'))
+    PROMPT_BUDGET_PLAN_TOKENS = int(os.environ.get('PROMPT_BUDGET_PLAN_TOKENS', '600'))
+    PROMPT_BUDGET_JOURNAL_TOKENS = int(os.environ.get('PROMPT_BUDGET_JOURNAL_TOKENS', '800'))
+    # Chat turns kept verbatim; older turns are folded into the conversation summary in batches
+    CHAT_RECENT_TURNS = int(os.environ.get('CHAT_RECENT_TURNS', '6'))
+    CHAT_SUMMARY_BATCH_TURNS = int(os.environ.get('CHAT_SUMMARY_BATCH_TURNS', '4'))
+    # In-process cache of recent turns for active conversations
+    CHAT_HISTORY_CACHE_SIZE = int(os.environ.get('CHAT_HISTORY_CACHE_SIZE', '5000'))
+    CHAT_HISTORY_CACHE_TTL_SECONDS = int(os.environ.get('CHAT_HISTORY_CACHE_TTL_SECONDS', '1800'))
+    
+    # Gemini resilience: total time budget per call (all tiers and retries) and circuit breaker
+    GEMINI_JOURNAL_DEADLINE_SECONDS = float(os.environ.get('GEMINI_JOURNAL_DEADLINE_SECONDS', '20'))
+    GEMINI_CHAT_DEADLINE_SECONDS = float(os.environ.get('GEMINI_CHAT_DEADLINE_SECONDS', '15'))
+    GEMINI_PLAN_DEADLINE_SECONDS = float(os.environ.get('GEMINI_PLAN_DEADLINE_SECONDS', '20'))
+    GEMINI_MAX_ATTEMPTS = int(os.environ.get('GEMINI_MAX_ATTEMPTS', '3'))
+    GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('GEMINI_BREAKER_FAILURE_THRESHOLD', '5'))
+    GEMINI_BREAKER_RESET_SECONDS = float(os.environ.get('GEMINI_BREAKER_RESET_SECONDS', '30'))
+    
+    # Firestore Configuration
+    # 'documents' stores one document per mood log; 'buckets' packs a user's month into one document
+    # (run `flask migrate-mood-buckets` before switching, see .env.example)
+    MOOD_LOG_STORAGE = os.environ.get('MOOD_LOG_STORAGE', 'documents')
+    
+    # Journal Analysis Configuration
+    # When enabled, entries are saved immediately and analyzed on a background worker pool
+    JOURNAL_ASYNC_ANALYSIS = os.environ.get('JOURNAL_ASYNC_ANALYSIS', 'false').lower() == 'true'
+    JOURNAL_ANALYSIS_WORKERS = int(os.environ.get('JOURNAL_ANALYSIS_WORKERS', '4'))
+    JOURNAL_ANALYSIS_MAX_PENDING = int(os.environ.get('JOURNAL_ANALYSIS_MAX_PENDING', '100'))
+    
+    # Journal analysis result cache (in-process LRU, optionally backed by Firestore)
+    ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', '2048'))
+    ANALYSIS_CACHE_TTL_SECONDS = int(os.environ.get('ANALYSIS_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    ANALYSIS_CACHE_PERSISTENT = os.environ.get('ANALYSIS_CACHE_PERSISTENT', 'false').lower() == 'true'
+    
     # BigQuery Configuration
     BQ_DATASET = os.environ.get('BQ_DATASET', 'glowra_analytics')
     BQ_MOOD_TABLE = os.environ.get('BQ_MOOD_TABLE', 'mood_logs')
     BQ_JOURNAL_TABLE = os.environ.get('BQ_JOURNAL_TABLE', 'journal_insights')
+    # Streaming inserts are buffered per table and flushed by row count, size or age
+    BQ_BATCH_MAX_ROWS = int(os.environ.get('BQ_BATCH_MAX_ROWS', '500'))
+    BQ_BATCH_MAX_BYTES = int(os.environ.get('BQ_BATCH_MAX_BYTES', '5000000'))
+    BQ_BATCH_MAX_LATENCY_SECONDS = float(os.environ.get('BQ_BATCH_MAX_LATENCY_SECONDS', '2'))
+    BQ_BATCH_MAX_QUEUE_ROWS = int(os.environ.get('BQ_BATCH_MAX_QUEUE_ROWS', '50000'))
+    BQ_INSERT_MAX_ATTEMPTS = int(os.environ.get('BQ_INSERT_MAX_ATTEMPTS', '5'))
+    BQ_INSERT_TIMEOUT_SECONDS = float(os.environ.get('BQ_INSERT_TIMEOUT_SECONDS', '10'))
+    # Durable local spool bulk-loaded with load jobs; empty streams rows through the batcher instead
+    ANALYTICS_SPOOL_DIR = os.environ.get('ANALYTICS_SPOOL_DIR', '')
+    ANALYTICS_SPOOL_FSYNC_INTERVAL_SECONDS = float(os.environ.get('ANALYTICS_SPOOL_FSYNC_INTERVAL_SECONDS', '0.2'))
+    ANALYTICS_SPOOL_SEGMENT_MAX_BYTES = int(os.environ.get('ANALYTICS_SPOOL_SEGMENT_MAX_BYTES', str(16 * 1024 * 1024)))
+    ANALYTICS_SPOOL_SEGMENT_MAX_AGE_SECONDS = float(os.environ.get('ANALYTICS_SPOOL_SEGMENT_MAX_AGE_SECONDS', '60'))
+    ANALYTICS_SPOOL_DRAIN_INTERVAL_SECONDS = float(os.environ.get('ANALYTICS_SPOOL_DRAIN_INTERVAL_SECONDS', '300'))
+    ANALYTICS_SPOOL_MAX_LOAD_ATTEMPTS = int(os.environ.get('ANALYTICS_SPOOL_MAX_LOAD_ATTEMPTS', '10'))
     
     # Cloud Storage Configuration
     GCS_BUCKET = os.environ.get('GCS_BUCKET', 'glowra-assets')
     
+    # Daily Plan Pre-generation Configuration
+    PLAN_PREGENERATE_AT = os.environ.get('PLAN_PREGENERATE_AT', '')  # "HH:MM" UTC, used by `flask run-plan-scheduler`
+    PLAN_PREGENERATE_ACTIVE_DAYS = int(os.environ.get('PLAN_PREGENERATE_ACTIVE_DAYS', '7'))
+    PLAN_PREGENERATE_WORKERS = int(os.environ.get('PLAN_PREGENERATE_WORKERS', '8'))
+    # Cross-instance lease that makes a single worker generate each user's plan
+    PLAN_LEASE_TTL_SECONDS = float(os.environ.get('PLAN_LEASE_TTL_SECONDS', '60'))
+    PLAN_LEASE_WAIT_SECONDS = float(os.environ.get('PLAN_LEASE_WAIT_SECONDS', '30'))
+    
+    # Rate Limiting Configuration (per authenticated user; memory:// or a shared store such as redis://)
+    # memory:// counts per process: with several gunicorn workers use a shared store
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'sliding-window-counter')
+    RATE_LIMIT_AI = os.environ.get('RATE_LIMIT_AI', '10 per minute;100 per hour')
+    RATE_LIMIT_STANDARD = os.environ.get('RATE_LIMIT_STANDARD', '120 per minute')
+    # Proxies in front of the app whose X-Forwarded-For entry is trusted (0 when clients connect directly)
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '1'))
+    
+    # Monitoring: /metrics requires "Authorization: Bearer <token>"; unset disables it outside DEV_MODE (loopback only)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Concurrency Configuration
+    PARALLEL_MAX_WORKERS = int(os.environ.get('PARALLEL_MAX_WORKERS', '16'))
+    
     # Development Configuration
     DEV_MODE = os.environ.get('DEV_MODE', 'false').lower() == 'true'
     FRONTEND_ORIGIN = os.environ.get('FRONTEND_ORIGIN', 'http://localhost:5000')
@@ -0,0 +1,54 @@
+"""Gunicorn settings for running Glowra with a preloaded app.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the arbiter, so routes, pydantic models, SDK
+modules and the lexicon tables are shared copy-on-write by every worker.
+Service clients are created lazily through services.registry and are
+dropped in each forked child, so no gRPC channel or HTTP pool crosses a
+fork. See benchmarks/bench_fork_memory.py for the memory comparison.
+"""
+import gc
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = 60
+preload_app = True
+
+
+def when_ready(server):
+    from config import Config
+
+    if server.cfg.workers > 1 and Config.RATELIMIT_STORAGE_URI.startswith('memory://'):
+        # Each worker keeps its own counters, so every limit is effectively multiplied by the worker count
+        server.log.warning(f"RATELIMIT_STORAGE_URI is memory:// with {server.cfg.workers} workers; "
+                           f"limits are enforced per worker. Set it to a shared store such as redis://")
+
+
+def pre_fork(server, worker):
+    # Move preloaded objects out of GC generations so collections in the
+    # workers don't write to (and un-share) the parent's pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import start_serving_jobs
+    from services.registry import registry
+
+    # registry.reset already ran via os.register_at_fork; nothing is created until first use
+    logger.info(f"Worker {worker.pid} forked; {len(registry.stats()['services'])} services will initialize lazily")
+    start_serving_jobs()
+
+
+def worker_exit(server, worker):
+    # Deliver buffered analytics rows (or seal spooled ones) before the worker goes away
+    from services.analytics_spool import analytics_spool
+    from services.bigquery_batcher import bigquery_batcher
+    bigquery_batcher.shutdown()
+    if analytics_spool:
+        analytics_spool.shutdown()
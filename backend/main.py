@@ -1,6 +1,10 @@
-from app import create_app
+import os
+from app import create_app, start_serving_jobs
 
 app = create_app()
 
 if __name__ == '__main__':
+    # debug=True runs a reloader parent; only its child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_serving_jobs()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify, g
 from services.firebase_service import firebase_service
 from services.firestore_service import firestore_service
 from utils.decorators import require_auth, handle_errors
-from utils.helpers import format_response, get_current_utc_time
+from utils.rate_limit import standard_limit
+from utils.helpers import format_response
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ logger = logging.getLogger(__name__)
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/signup', methods=['POST'])
+@standard_limit
 @handle_errors
 def signup():
     """Create user profile after Firebase registration"""
@@ -51,6 +53,7 @@ def signup():
 
 @auth_bp.route('/profile', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_profile():
     """Get current user's profile"""
@@ -80,6 +83,7 @@ def get_profile():
 
 @auth_bp.route('/profile', methods=['PUT'])
 @require_auth
+@standard_limit
 @handle_errors
 def update_profile():
     """Update user profile"""
@@ -94,12 +98,9 @@ def update_profile():
         if not update_data:
             return jsonify(format_response(None, False, "No valid fields to update")), 400
         
-        update_data['updated_at'] = get_current_utc_time()
+        updated_profile = firestore_service.update_user(uid, update_data)
         
-        success = firestore_service.create_user(uid, update_data)  # Using merge=True
-        
-        if success:
-            updated_profile = firestore_service.get_user(uid)
+        if updated_profile is not None:
             return jsonify(format_response(updated_profile, True, "Profile updated successfully"))
         else:
             return jsonify(format_response(None, False, "Failed to update profile")), 500
@@ -109,6 +110,7 @@ def update_profile():
         return jsonify(format_response(None, False, "Update failed")), 500
 
 @auth_bp.route('/verify', methods=['POST'])
+@standard_limit
 @handle_errors
 def verify_token():
     """Verify Firebase ID token"""
@@ -132,6 +134,7 @@ def verify_token():
 
 @auth_bp.route('/logout', methods=['POST'])
 @require_auth
+@standard_limit
 @handle_errors
 def logout():
     """Logout user (client-side token removal)"""
@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from services.ai_service import ai_service
 from services.firestore_service import firestore_service
+from services.conversation_service import conversation_service
 from utils.decorators import require_auth, handle_errors
+from utils.rate_limit import ai_limit, standard_limit
 from utils.helpers import format_response, get_current_utc_time
+from utils.concurrency import parallel
 from models.schemas import ChatIn, ChatOut
 from pydantic import ValidationError
+import json
 import logging
 import uuid
 
@@ -14,6 +18,7 @@ chat_bp = Blueprint('chat', __name__)
 
 @chat_bp.route('/', methods=['POST'])
 @require_auth
+@ai_limit
 @handle_errors
 def chat_with_ai():
     """Chat with AI wellness companion"""
@@ -27,50 +32,25 @@ def chat_with_ai():
         except ValidationError as e:
             return jsonify(format_response(None, False, f"Validation error: {e}")), 400
         
-        # Get or create conversation ID
-        conversation_id = chat_input.conversation_id or str(uuid.uuid4())
+        # Get recent turns and the rolling summary of older ones (cached for active conversations)
+        conversation, conversation_history, summary = conversation_service.load_context(
+            uid, chat_input.conversation_id
+        )
         
-        # Get conversation history
-        conversation_history = []
-        if chat_input.conversation_id:
-            # In production, you'd fetch from database
-            # For now, we'll work with current message only
-            conversation_history = []
+        # Continue the supplied conversation; start a new one if there is none or it isn't this user's
+        conversation_id = chat_input.conversation_id if conversation is not None else str(uuid.uuid4())
         
         logger.info(f"Processing chat message for user {uid}")
         
         # Get AI response
         ai_response = ai_service.chat_response(
             message=chat_input.message,
-            conversation_history=conversation_history
+            conversation_history=conversation_history,
+            summary=summary
         )
         
-        # Save conversation turn to Firestore
-        conversation_data = {
-            'conversation_id': conversation_id,
-            'user_message': chat_input.message,
-            'ai_response': ai_response['response'],
-            'mood_detected': ai_response.get('mood_detected', 'neutral'),
-            'suggestions': ai_response.get('suggestions', []),
-            'timestamp': get_current_utc_time()
-        }
-        
-        # Save to conversations collection
-        try:
-            conversation_ref = firestore_service.db.collection('conversations').document()
-            conversation_ref.set({**conversation_data, 'user_id': uid})
-            logger.info(f"Conversation turn saved for user {uid}")
-        except Exception as e:
-            logger.warning(f"Failed to save conversation: {e}")
-        
-        # Update user stats (engagement points)
-        user_stats = firestore_service.get_user_stats(uid)
-        updated_stats = {
-            'points': user_stats.get('points', 0) + 2,  # 2 points for chat interaction
-            'chat_messages': user_stats.get('chat_messages', 0) + 1,
-            'last_chat_date': get_current_utc_time()
-        }
-        firestore_service.update_user_stats(uid, updated_stats)
+        # Save conversation turn and award engagement points
+        save_chat_turn(uid, conversation_id, chat_input.message, ai_response, conversation)
         
         # Prepare response
         response_data = {
@@ -89,8 +69,89 @@ def chat_with_ai():
         logger.error(f"Chat error: {e}")
         return jsonify(format_response(None, False, "Failed to process chat message")), 500
 
+@chat_bp.route('/stream', methods=['POST'])
+@require_auth
+@ai_limit
+@handle_errors
+def chat_with_ai_stream():
+    """Chat with AI wellness companion, streaming the response as server-sent events"""
+    uid = g.current_user['uid']
+    # A missing or non-JSON body is a validation error, caught before the event stream starts
+    data = request.get_json(silent=True) or {}
+    
+    # Validate input
+    try:
+        chat_input = ChatIn(**data)
+    except ValidationError as e:
+        return jsonify(format_response(None, False, f"Validation error: {e}")), 400
+    
+    conversation, conversation_history, summary = conversation_service.load_context(
+        uid, chat_input.conversation_id
+    )
+    conversation_id = chat_input.conversation_id if conversation is not None else str(uuid.uuid4())
+    
+    logger.info(f"Streaming chat message for user {uid}")
+    
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    def generate():
+        yield sse('start', {'conversation_id': conversation_id})
+        
+        try:
+            ai_response = None
+            for kind, value in ai_service.chat_response_stream(chat_input.message, conversation_history, summary):
+                if kind == 'token':
+                    yield sse('token', {'text': value})
+                else:
+                    ai_response = value
+            
+            # Persist the turn only once the full response is known
+            save_chat_turn(uid, conversation_id, chat_input.message, ai_response, conversation)
+            
+            yield sse('done', {
+                'conversation_id': conversation_id,
+                'mood_detected': ai_response.get('mood_detected', 'neutral'),
+                'suggestions': ai_response.get('suggestions', []),
+                'points_earned': 2,
+                'timestamp': get_current_utc_time().isoformat()
+            })
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield sse('error', {'message': "Failed to process chat message"})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def save_chat_turn(uid, conversation_id, message, ai_response, conversation=None):
+    """Save a conversation turn to Firestore and award engagement points"""
+    conversation_data = {
+        'user_message': message,
+        'ai_response': ai_response['response'],
+        'mood_detected': ai_response.get('mood_detected', 'neutral'),
+        'suggestions': ai_response.get('suggestions', []),
+        'timestamp': get_current_utc_time()
+    }
+    
+    # Save to conversations collection (may schedule a summary refresh)
+    try:
+        conversation_service.record_turn(uid, conversation_id, conversation_data, conversation)
+        logger.info(f"Conversation turn saved for user {uid}")
+    except Exception as e:
+        logger.warning(f"Failed to save conversation: {e}")
+    
+    # Update user stats (engagement points)
+    firestore_service.increment_user_stats(
+        uid,
+        {'points': 2, 'chat_messages': 1},  # 2 points for chat interaction
+        fields={'last_chat_date': get_current_utc_time()}
+    )
+
 @chat_bp.route('/conversations', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_conversations():
     """Get user's recent conversations"""
@@ -161,6 +222,7 @@ def get_conversations():
 
 @chat_bp.route('/conversations/<conversation_id>', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_conversation_history(conversation_id):
     """Get full conversation history"""
@@ -223,6 +285,7 @@ def get_conversation_history(conversation_id):
 
 @chat_bp.route('/suggestions', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_chat_suggestions():
     """Get suggested conversation starters based on user's recent mood/journal data"""
@@ -232,8 +295,10 @@ def get_chat_suggestions():
         # Get user's recent data for context
         from utils.helpers import get_date_range
         start_date, end_date = get_date_range(7)
-        recent_moods = firestore_service.get_mood_logs(uid, start_date, end_date)
-        recent_journals = firestore_service.get_journal_entries(uid, 3)
+        recent_moods, recent_journals = parallel(
+            lambda: firestore_service.get_mood_logs(uid, start_date, end_date),
+            lambda: firestore_service.get_journal_entries(uid, 3, fields=['ai_insight'])
+        )
         
         # Generate contextual suggestions
         suggestions = []
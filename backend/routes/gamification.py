@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, g
 from services.firestore_service import firestore_service
 from utils.decorators import require_auth, handle_errors
+from utils.rate_limit import standard_limit
 from utils.helpers import format_response, get_current_utc_time, get_date_range
+from utils.concurrency import parallel
 from datetime import datetime, timezone, timedelta
 import logging
 
@@ -136,28 +138,25 @@ def check_badge_eligibility(uid, user_stats, mood_logs, journal_entries, daily_p
 
 @gamification_bp.route('/badges', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_user_badges():
     """Get user's earned badges and available badges"""
     try:
         uid = g.current_user['uid']
         
-        # Get user stats
-        user_stats = firestore_service.get_user_stats(uid)
-        
-        # Get user activity data for badge calculation
+        # Get user stats and activity data for badge calculation
         start_date, end_date = get_date_range(90)  # Last 90 days for comprehensive check
-        mood_logs = firestore_service.get_mood_logs(uid, start_date, end_date)
-        journal_entries = firestore_service.get_journal_entries(uid, 50)
-        
-        # Get daily plans for activity type analysis
-        daily_plans = []
         current_date = datetime.now(timezone.utc).date()
-        for i in range(30):  # Last 30 days
-            date_str = (current_date - timedelta(days=i)).isoformat()
-            plan = firestore_service.get_daily_plan(uid, date_str)
-            if plan:
-                daily_plans.append(plan)
+        dates = [(current_date - timedelta(days=i)).isoformat() for i in range(30)]  # Last 30 days of plans
+        
+        user_stats, mood_logs, journal_entries, plans_by_date = parallel(
+            lambda: firestore_service.get_user_stats(uid),
+            lambda: firestore_service.get_mood_logs(uid, start_date, end_date),
+            lambda: firestore_service.get_journal_entries(uid, 50, fields=['timestamp']),
+            lambda: firestore_service.get_daily_plans(uid, dates)
+        )
+        daily_plans = [plans_by_date[date] for date in dates if date in plans_by_date]
         
         # Check for new badges
         new_badges, updated_badge_list = check_badge_eligibility(
@@ -167,12 +166,15 @@ def get_user_badges():
         # Update user stats if new badges were earned
         if new_badges:
             badge_points = sum(badge['points'] for badge in new_badges)
-            updated_stats = {
+            firestore_service.increment_user_stats(
+                uid,
+                {'points': badge_points},
+                append={'badges': [badge['id'] for badge in new_badges]}
+            )
+            user_stats.update({
                 'badges': updated_badge_list,
                 'points': user_stats.get('points', 0) + badge_points
-            }
-            firestore_service.update_user_stats(uid, updated_stats)
-            user_stats.update(updated_stats)
+            })
         
         # Get earned badge details
         available_badges = get_available_badges()
@@ -227,6 +229,7 @@ def get_user_badges():
 
 @gamification_bp.route('/leaderboard', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_leaderboard():
     """Get wellness leaderboard (anonymized)"""
@@ -297,19 +300,25 @@ def get_leaderboard():
 
 @gamification_bp.route('/stats', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_user_stats():
     """Get comprehensive user statistics"""
     try:
         uid = g.current_user['uid']
         
-        # Get user stats
-        user_stats = firestore_service.get_user_stats(uid)
-        
-        # Get activity data
+        # Get user stats and activity data
         start_date, end_date = get_date_range(30)  # Last 30 days
-        mood_logs = firestore_service.get_mood_logs(uid, start_date, end_date)
-        journal_entries = firestore_service.get_journal_entries(uid, 30)
+        current_date = datetime.now(timezone.utc).date()
+        
+        user_stats, mood_logs, journal_entries, recent_plans = parallel(
+            lambda: firestore_service.get_user_stats(uid),
+            lambda: firestore_service.get_mood_logs(uid, start_date, end_date),
+            lambda: firestore_service.get_journal_entries(uid, 30, fields=['timestamp']),
+            lambda: firestore_service.get_daily_plans(
+                uid, [(current_date - timedelta(days=i)).isoformat() for i in range(7)]
+            )
+        )
         
         # Calculate additional metrics
         total_points = user_stats.get('points', 0)
@@ -328,11 +337,7 @@ def get_user_stats():
         personal_bests = {
             'longest_streak': user_stats.get('longest_streak', user_stats.get('streak_days', 0)),
             'most_tasks_per_day': max([
-                len(plan.get('tasks', [])) for plan in [
-                    firestore_service.get_daily_plan(uid, 
-                        (datetime.now(timezone.utc).date() - timedelta(days=i)).isoformat()
-                    ) for i in range(7)
-                ] if plan
+                len(plan.get('tasks', [])) for plan in recent_plans.values()
             ], default=0),
             'highest_energy_level': max([log.get('energy', 0) for log in mood_logs], default=0),
             'lowest_stress_level': min([log.get('stress', 10) for log in mood_logs], default=10)
@@ -1,9 +1,13 @@
 from flask import Blueprint, request, jsonify, g
 from services.ai_service import ai_service
 from services.firestore_service import firestore_service
-from services.bigquery_service import bigquery_service
+from services.analytics_spool import analytics_sink
+from services.journal_analysis_service import journal_analysis_service
+from services.lexicon_classifier import lexicon_classifier
+from config import Config
 from utils.decorators import require_auth, handle_errors
-from utils.helpers import format_response, get_current_utc_time
+from utils.rate_limit import ai_limit, standard_limit
+from utils.helpers import format_response, get_current_utc_time, encode_cursor, decode_cursor
 from models.schemas import JournalIn, InsightOut
 from pydantic import ValidationError
 import logging
@@ -14,6 +18,7 @@ journal_bp = Blueprint('journal', __name__)
 
 @journal_bp.route('/', methods=['POST'])
 @require_auth
+@ai_limit
 @handle_errors
 def create_journal_entry():
     """Create a new journal entry with AI analysis"""
@@ -27,39 +32,59 @@ def create_journal_entry():
         except ValidationError as e:
             return jsonify(format_response(None, False, f"Validation error: {e}")), 400
         
-        # Get AI analysis of journal text
-        logger.info(f"Analyzing journal entry for user {uid}")
-        ai_insight = ai_service.analyze_journal(journal_input.text)
-        
         # Prepare journal entry data
         journal_data = {
             'text': journal_input.text,
-            'ai_insight': ai_insight,
             'word_count': len(journal_input.text.split()),
             'character_count': len(journal_input.text)
         }
         
-        # Save to Firestore
-        entry_id = firestore_service.save_journal_entry(uid, journal_data)
-        
-        # Stream to BigQuery for analytics
-        bigquery_service.stream_journal_insight(journal_data)
+        if Config.JOURNAL_ASYNC_ANALYSIS:
+            # Save right away and analyze on the background pool; clients poll the insight endpoint
+            journal_data['ai_insight'] = {}
+            journal_data['provisional_insight'] = lexicon_classifier.classify(journal_input.text)
+            journal_data['analysis_status'] = 'pending'
+            entry_id = firestore_service.save_journal_entry(uid, journal_data)
+            
+            if journal_analysis_service.submit(uid, entry_id, journal_input.text, journal_data['timestamp']):
+                ai_insight = None
+            else:
+                # Queue is full; fall back to analyzing on the request thread
+                ai_insight = ai_service.analyze_journal(journal_input.text)
+                firestore_service.save_journal_insight(uid, entry_id, ai_insight, journal_data['timestamp'])
+                analytics_sink.stream_journal_insight({**journal_data, 'ai_insight': ai_insight})
+        else:
+            # Get AI analysis of journal text
+            logger.info(f"Analyzing journal entry for user {uid}")
+            ai_insight = ai_service.analyze_journal(journal_input.text)
+            journal_data['ai_insight'] = ai_insight
+            journal_data['analysis_status'] = 'complete'
+            
+            # Save to Firestore
+            entry_id = firestore_service.save_journal_entry(uid, journal_data)
+            
+            # Hand off to BigQuery analytics (batched or spooled, never a round trip here)
+            analytics_sink.stream_journal_insight(journal_data)
         
         # Update user stats
-        firestore_service.update_user_stats(uid, {
-            'journal_entries': firestore_service.get_user_stats(uid).get('journal_entries', 0) + 1,
-            'points': firestore_service.get_user_stats(uid).get('points', 0) + 10,  # 10 points for journaling
-            'last_journal_date': get_current_utc_time()
-        })
+        firestore_service.increment_user_stats(
+            uid,
+            {'journal_entries': 1, 'points': 10},  # 10 points for journaling
+            fields={'last_journal_date': get_current_utc_time()}
+        )
         
         # Format response
         response_data = {
             'entry_id': entry_id,
             'insight': ai_insight,
+            'analysis_status': 'pending' if ai_insight is None else 'complete',
+            'provisional_insight': journal_data.get('provisional_insight') if ai_insight is None else None,
             'points_earned': 10
         }
         
         logger.info(f"Journal entry created successfully for user {uid}")
+        if ai_insight is None:
+            return jsonify(format_response(response_data, True, "Journal entry created, analysis in progress")), 202
         return jsonify(format_response(response_data, True, "Journal entry created and analyzed"))
         
     except Exception as e:
@@ -68,6 +93,7 @@ def create_journal_entry():
 
 @journal_bp.route('/', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_journal_entries():
     """Get user's journal entries"""
@@ -76,28 +102,39 @@ def get_journal_entries():
         
         # Get query parameters
         limit = request.args.get('limit', 10, type=int)
-        limit = min(limit, 50)  # Max 50 entries
+        limit = max(1, min(limit, 50))  # Max 50 entries
+        
+        try:
+            start_after = decode_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify(format_response(None, False, "Invalid cursor")), 400
+        
+        # Clients that only render metadata can skip transferring entry text
+        include_text = request.args.get('include_text', 'true').lower() != 'false'
+        fields = None if include_text else ['word_count', 'ai_insight']
         
-        # Get journal entries from Firestore
-        entries = firestore_service.get_journal_entries(uid, limit)
+        # Get one page of journal entries from Firestore
+        entries = firestore_service.get_journal_entries(uid, limit, start_after=start_after, fields=fields)
         
         # Format entries for response
         formatted_entries = []
         for entry in entries:
             formatted_entry = {
                 'id': entry['id'],
-                'text': entry['text'],
                 'word_count': entry.get('word_count', 0),
                 'timestamp': entry['timestamp'].isoformat(),
                 'ai_insight': entry.get('ai_insight', {}),
                 'mood': entry.get('ai_insight', {}).get('mood', 'neutral')
             }
+            if include_text:
+                formatted_entry['text'] = entry['text']
             formatted_entries.append(formatted_entry)
         
         logger.info(f"Retrieved {len(formatted_entries)} journal entries for user {uid}")
         return jsonify(format_response({
             'entries': formatted_entries,
-            'total': len(formatted_entries)
+            'total': len(formatted_entries),
+            'next_cursor': encode_cursor(entries[-1]) if len(entries) == limit else None
         }))
         
     except Exception as e:
@@ -106,29 +143,19 @@ def get_journal_entries():
 
 @journal_bp.route('/<entry_id>', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_journal_entry(entry_id):
     """Get specific journal entry"""
     try:
         uid = g.current_user['uid']
         
-        # Get specific entry (would need to implement in firestore_service)
-        # For now, get all entries and filter
-        entries = firestore_service.get_journal_entries(uid, 100)
-        
-        entry = None
-        for e in entries:
-            if e['id'] == entry_id:
-                entry = e
-                break
+        # Direct document lookup; entries owned by other users are reported as not found
+        entry = firestore_service.get_journal_entry(uid, entry_id)
         
         if not entry:
             return jsonify(format_response(None, False, "Journal entry not found")), 404
         
-        # Check if entry belongs to current user
-        if entry.get('user_id') != uid:
-            return jsonify(format_response(None, False, "Unauthorized")), 403
-        
         formatted_entry = {
             'id': entry['id'],
             'text': entry['text'],
@@ -144,8 +171,35 @@ def get_journal_entry(entry_id):
         logger.error(f"Get journal entry error: {e}")
         return jsonify(format_response(None, False, "Failed to get journal entry")), 500
 
+@journal_bp.route('/<entry_id>/insight', methods=['GET'])
+@require_auth
+@standard_limit
+@handle_errors
+def get_journal_insight(entry_id):
+    """Get the analysis status and insight of a journal entry"""
+    try:
+        uid = g.current_user['uid']
+        
+        entry = firestore_service.get_journal_entry(uid, entry_id)
+        
+        if not entry:
+            return jsonify(format_response(None, False, "Journal entry not found")), 404
+        
+        status = entry.get('analysis_status', 'complete')
+        return jsonify(format_response({
+            'entry_id': entry_id,
+            'analysis_status': status,
+            'insight': entry.get('ai_insight') if status == 'complete' else None,
+            'provisional_insight': entry.get('provisional_insight') if status != 'complete' else None
+        }))
+        
+    except Exception as e:
+        logger.error(f"Get journal insight error: {e}")
+        return jsonify(format_response(None, False, "Failed to get journal insight")), 500
+
 @journal_bp.route('/insights/summary', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_insights_summary():
     """Get summary of recent insights and patterns"""
@@ -153,7 +207,7 @@ def get_insights_summary():
         uid = g.current_user['uid']
         
         # Get recent journal entries
-        recent_entries = firestore_service.get_journal_entries(uid, 30)  # Last 30 entries
+        recent_entries = firestore_service.get_journal_entries(uid, 30, fields=['ai_insight'])  # Last 30 entries
         
         if not recent_entries:
             return jsonify(format_response({
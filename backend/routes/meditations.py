@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify, g
 from services.storage_service import storage_service
 from services.firestore_service import firestore_service
 from utils.decorators import require_auth, handle_errors
+from utils.rate_limit import standard_limit
 from utils.helpers import format_response, get_current_utc_time
+from utils.concurrency import parallel
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,14 +13,18 @@ meditations_bp = Blueprint('meditations', __name__)
 
 @meditations_bp.route('/', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_meditations():
     """Get list of available meditation resources"""
     try:
         uid = g.current_user['uid']
         
-        # Get meditation files from Cloud Storage
-        meditation_files = storage_service.list_meditation_files()
+        # Get meditation files from Cloud Storage alongside the user's meditation history
+        meditation_files, user_stats = parallel(
+            storage_service.list_meditation_files,
+            lambda: firestore_service.get_user_stats(uid)
+        )
         
         # Categorize meditations
         categorized_meditations = {
@@ -59,7 +65,6 @@ def get_meditations():
             categorized_meditations[category].append(meditation)
         
         # Get user's meditation history
-        user_stats = firestore_service.get_user_stats(uid)
         completed_meditations = user_stats.get('completed_meditations', [])
         
         # Add completion status to meditations
@@ -83,6 +88,7 @@ def get_meditations():
 
 @meditations_bp.route('/<meditation_id>/start', methods=['POST'])
 @require_auth
+@standard_limit
 @handle_errors
 def start_meditation(meditation_id):
     """Start a meditation session"""
@@ -115,6 +121,7 @@ def start_meditation(meditation_id):
 
 @meditations_bp.route('/sessions/<session_id>/complete', methods=['POST'])
 @require_auth
+@standard_limit
 @handle_errors
 def complete_meditation(session_id):
     """Complete a meditation session"""
@@ -149,32 +156,27 @@ def complete_meditation(session_id):
         session_ref.update(completion_data)
         
         # Update user stats
-        user_stats = firestore_service.get_user_stats(uid)
         meditation_id = session_data.get('meditation_id')
-        completed_meditations = user_stats.get('completed_meditations', [])
-        
-        # Add to completed list if not already there
-        if meditation_id and meditation_id not in completed_meditations:
-            completed_meditations.append(meditation_id)
         
         # Calculate points (1 point per minute, bonus for completion)
         points_earned = duration_minutes + 10  # Base 10 points for completion
         
-        updated_stats = {
-            'completed_meditations': completed_meditations,
-            'total_meditation_minutes': user_stats.get('total_meditation_minutes', 0) + duration_minutes,
-            'meditation_sessions': user_stats.get('meditation_sessions', 0) + 1,
-            'points': user_stats.get('points', 0) + points_earned,
-            'last_meditation_date': get_current_utc_time()
-        }
-        
-        firestore_service.update_user_stats(uid, updated_stats)
+        firestore_service.increment_user_stats(
+            uid,
+            {
+                'total_meditation_minutes': duration_minutes,
+                'meditation_sessions': 1,
+                'points': points_earned
+            },
+            fields={'last_meditation_date': get_current_utc_time()},
+            # ArrayUnion skips IDs already in the completed list
+            append={'completed_meditations': [meditation_id]} if meditation_id else None
+        )
         
         response_data = {
             'session_id': session_id,
             'points_earned': points_earned,
-            'total_meditation_minutes': updated_stats['total_meditation_minutes'],
-            'completed_meditations_count': len(completed_meditations)
+            'duration_minutes': duration_minutes
         }
         
         logger.info(f"Meditation session completed for user {uid}")
@@ -186,6 +188,7 @@ def complete_meditation(session_id):
 
 @meditations_bp.route('/history', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_meditation_history():
     """Get user's meditation session history"""
@@ -242,6 +245,7 @@ def get_meditation_history():
 
 @meditations_bp.route('/recommendations', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_meditation_recommendations():
     """Get personalized meditation recommendations"""
@@ -251,8 +255,10 @@ def get_meditation_recommendations():
         # Get user's recent mood and stress data
         from utils.helpers import get_date_range
         start_date, end_date = get_date_range(7)
-        recent_moods = firestore_service.get_mood_logs(uid, start_date, end_date)
-        user_stats = firestore_service.get_user_stats(uid)
+        recent_moods, user_stats = parallel(
+            lambda: firestore_service.get_mood_logs(uid, start_date, end_date),
+            lambda: firestore_service.get_user_stats(uid)
+        )
         
         # Analyze patterns to suggest meditations
         recommendations = []
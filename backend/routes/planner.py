@@ -1,11 +1,11 @@
 from flask import Blueprint, request, jsonify, g
-from services.ai_service import ai_service
 from services.firestore_service import firestore_service
+from services.plan_service import plan_service
 from utils.decorators import require_auth, handle_errors
-from utils.helpers import format_response, get_current_utc_time, get_date_range
-from datetime import datetime, timezone
+from utils.rate_limit import charge_ai_limit, standard_limit
+from utils.helpers import format_response, get_current_utc_time
+from datetime import datetime, timezone, timedelta
 import logging
-import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +13,7 @@ planner_bp = Blueprint('planner', __name__)
 
 @planner_bp.route('/today', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_daily_plan():
     """Get or generate daily plan for today"""
@@ -27,66 +28,19 @@ def get_daily_plan():
             logger.info(f"Retrieved existing daily plan for user {uid}")
             return jsonify(format_response(existing_plan))
         
-        # Generate new plan based on user's recent data
-        logger.info(f"Generating new daily plan for user {uid}")
-        
-        # Get user's recent mood logs and journal insights
-        start_date, end_date = get_date_range(7)  # Last 7 days
-        recent_moods = firestore_service.get_mood_logs(uid, start_date, end_date)
-        recent_journals = firestore_service.get_journal_entries(uid, 5)  # Last 5 entries
-        user_stats = firestore_service.get_user_stats(uid)
-        
-        # Prepare data for AI recommendation generation
-        user_data = {
-            'recent_moods': [
-                {
-                    'mood': log.get('mood'),
-                    'energy': log.get('energy'),
-                    'stress': log.get('stress'),
-                    'timestamp': log.get('timestamp').isoformat() if log.get('timestamp') else None
-                } for log in recent_moods[-7:]  # Last 7 mood logs
-            ],
-            'recent_insights': [
-                {
-                    'categories': entry.get('ai_insight', {}).get('categories', []),
-                    'mood': entry.get('ai_insight', {}).get('mood'),
-                    'risk': entry.get('ai_insight', {}).get('risk')
-                } for entry in recent_journals
-            ],
-            'preferences': firestore_service.get_user(uid).get('preferences', {}),
-            'stats': user_stats
-        }
-        
-        # Generate AI recommendations
-        recommendations = ai_service.generate_daily_recommendations(user_data)
-        
-        # Create tasks from recommendations
-        tasks = []
-        for i, rec in enumerate(recommendations):
-            task = {
-                'id': str(uuid.uuid4()),
-                'title': rec.get('title', f'Activity {i+1}'),
-                'cta_type': rec.get('cta_type', 'activity'),
-                'estimated_minutes': rec.get('estimated_minutes', 10),
-                'description': rec.get('description', ''),
-                'type': rec.get('type', 'general'),
-                'status': 'pending'
-            }
-            tasks.append(task)
-        
-        # Create daily plan
-        daily_plan = {
-            'date': today,
-            'tasks': tasks,
-            'generated_at': get_current_utc_time(),
-            'total_estimated_minutes': sum(task['estimated_minutes'] for task in tasks),
-            'completed_tasks': 0
-        }
+        # Generating calls the model, so only this branch is charged to the AI bucket
+        breached = charge_ai_limit()
+        if breached:
+            limit, retry_after = breached
+            response = jsonify({"error": "Too many requests, please slow down", "limit": limit})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
         
-        # Save plan to Firestore
-        firestore_service.save_daily_plan(uid, today, daily_plan)
+        # Generate new plan based on user's recent data (normally done ahead of time by the nightly batch)
+        logger.info(f"Generating new daily plan for user {uid}")
+        daily_plan = plan_service.get_or_generate_plan(uid, today)
         
-        logger.info(f"Generated daily plan with {len(tasks)} tasks for user {uid}")
+        logger.info(f"Generated daily plan with {len(daily_plan['tasks'])} tasks for user {uid}")
         return jsonify(format_response(daily_plan, True, "Daily plan generated successfully"))
         
     except Exception as e:
@@ -95,6 +49,7 @@ def get_daily_plan():
 
 @planner_bp.route('/task/<task_id>/complete', methods=['POST'])
 @require_auth
+@standard_limit
 @handle_errors
 def complete_task(task_id):
     """Mark a task as completed"""
@@ -126,19 +81,22 @@ def complete_task(task_id):
         
         # Save updated plan
         firestore_service.save_daily_plan(uid, today, daily_plan)
+        firestore_service.increment_daily_rollup(uid, today, {'tasks_completed': 1})
         
         # Update user stats and award points
-        user_stats = firestore_service.get_user_stats(uid)
         points_earned = 5  # 5 points per completed task
-        
-        updated_stats = {
-            'completed_tasks': user_stats.get('completed_tasks', 0) + 1,
-            'points': user_stats.get('points', 0) + points_earned,
+        increments = {
+            'completed_tasks': 1,
+            'points': points_earned
+        }
+        fields = {
             'last_activity_date': get_current_utc_time()
         }
+        streak_days = 0
         
-        # Check for streak update
-        if completed_count == 1:  # First task of the day
+        # Check for streak update; only the first task of the day needs the previous activity date
+        if completed_count == 1:
+            user_stats = firestore_service.get_user_stats(uid)
             last_activity = user_stats.get('last_activity_date')
             if last_activity:
                 last_date = last_activity.date() if hasattr(last_activity, 'date') else datetime.fromisoformat(str(last_activity)).date()
@@ -146,22 +104,23 @@ def complete_task(task_id):
                 
                 if (today_date - last_date).days == 1:
                     # Consecutive day - increment streak
-                    updated_stats['streak_days'] = user_stats.get('streak_days', 0) + 1
+                    increments['streak_days'] = 1
+                    streak_days = user_stats.get('streak_days', 0) + 1
                 elif (today_date - last_date).days > 1:
                     # Streak broken - reset
-                    updated_stats['streak_days'] = 1
+                    fields['streak_days'] = streak_days = 1
             else:
                 # First activity ever
-                updated_stats['streak_days'] = 1
+                fields['streak_days'] = streak_days = 1
         
-        firestore_service.update_user_stats(uid, updated_stats)
+        firestore_service.increment_user_stats(uid, increments, fields=fields)
         
         response_data = {
             'task_id': task_id,
             'status': 'completed',
             'points_earned': points_earned,
             'total_completed': completed_count,
-            'streak_days': updated_stats.get('streak_days', 0)
+            'streak_days': streak_days
         }
         
         logger.info(f"Task {task_id} completed by user {uid}")
@@ -173,6 +132,7 @@ def complete_task(task_id):
 
 @planner_bp.route('/task/<task_id>/skip', methods=['POST'])
 @require_auth
+@standard_limit
 @handle_errors
 def skip_task(task_id):
     """Mark a task as skipped"""
@@ -210,6 +170,7 @@ def skip_task(task_id):
 
 @planner_bp.route('/history', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_plan_history():
     """Get user's daily plan history"""
@@ -223,10 +184,11 @@ def get_plan_history():
         # Generate date list for the last N days
         history = []
         current_date = datetime.now(timezone.utc).date()
+        dates = [(current_date - timedelta(days=i)).isoformat() for i in range(days)]
+        plans_by_date = firestore_service.get_daily_plans(uid, dates)
         
-        for i in range(days):
-            date_str = (current_date - datetime.timedelta(days=i)).isoformat()
-            plan = firestore_service.get_daily_plan(uid, date_str)
+        for date_str in dates:
+            plan = plans_by_date.get(date_str)
             
             if plan:
                 # Calculate completion rate
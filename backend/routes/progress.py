@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, g
 from services.firestore_service import firestore_service
 from utils.decorators import require_auth, handle_errors
-from utils.helpers import format_response, get_date_range, calculate_mood_average, calculate_streak, get_wellness_insights
+from utils.rate_limit import standard_limit
+from utils.helpers import format_response, get_date_range, calculate_rollup_average, calculate_streak, get_rollup_wellness_insights, encode_cursor, decode_cursor
+from utils.concurrency import parallel
 from datetime import datetime, timezone, timedelta
 import logging
 
@@ -11,6 +13,7 @@ progress_bp = Blueprint('progress', __name__)
 
 @progress_bp.route('/weekly', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_weekly_progress():
     """Get user's weekly progress summary"""
@@ -19,46 +22,32 @@ def get_weekly_progress():
         
         # Get date range for last 7 days
         start_date, end_date = get_date_range(7)
+        current_date = datetime.now(timezone.utc).date()
+        dates = [(current_date - timedelta(days=i)).isoformat() for i in range(7)]
         
-        # Get mood logs for the week
-        mood_logs = firestore_service.get_mood_logs(uid, start_date, end_date)
-        
-        # Get journal entries for the week
-        journal_entries = firestore_service.get_journal_entries(uid, 20)  # Get more to filter by date
-        weekly_journals = [
-            entry for entry in journal_entries 
-            if entry.get('timestamp') and entry['timestamp'] >= start_date
-        ]
-        
-        # Get user stats
-        user_stats = firestore_service.get_user_stats(uid)
+        # Daily rollups hold the week's mood and journal aggregates; plans and stats are independent reads
+        rollups_by_date, plans_by_date, user_stats = parallel(
+            lambda: firestore_service.get_daily_rollups(uid, dates),
+            lambda: firestore_service.get_daily_plans(uid, dates),
+            lambda: firestore_service.get_user_stats(uid)
+        )
+        rollups = [rollups_by_date[date] for date in dates if date in rollups_by_date]  # Newest day first
         
         # Calculate mood averages
-        mood_averages = calculate_mood_average(mood_logs)
-        
-        # Calculate activity dates for streak
-        activity_dates = []
+        mood_averages = calculate_rollup_average(rollups)
         
-        # Add mood log dates
-        for log in mood_logs:
-            if log.get('timestamp'):
-                activity_dates.append(log['timestamp'])
-        
-        # Add journal entry dates
-        for entry in weekly_journals:
-            if entry.get('timestamp'):
-                activity_dates.append(entry['timestamp'])
-        
-        # Calculate current streak
+        # Calculate current streak from days with mood or journal activity
+        activity_dates = [
+            datetime.strptime(date, '%Y-%m-%d') for date, rollup in rollups_by_date.items()
+            if rollup.get('mood_count') or rollup.get('journal_entries')
+        ]
         current_streak = calculate_streak(activity_dates)
         
         # Get daily plan completion stats
         plan_stats = []
-        current_date = datetime.now(timezone.utc).date()
         
-        for i in range(7):
-            date_str = (current_date - timedelta(days=i)).isoformat()
-            daily_plan = firestore_service.get_daily_plan(uid, date_str)
+        for date_str in dates:
+            daily_plan = plans_by_date.get(date_str)
             
             if daily_plan:
                 completed = sum(1 for task in daily_plan.get('tasks', []) if task['status'] == 'completed')
@@ -71,14 +60,12 @@ def get_weekly_progress():
         
         total_completed_tasks = sum(day['completed_tasks'] for day in plan_stats)
         
-        # Analyze mood trend
+        # Analyze mood trend: most recent 3 check-in days vs the previous 3
         mood_trend = "stable"
-        if len(mood_logs) >= 4:
-            recent_moods = mood_logs[:3]  # Most recent 3
-            older_moods = mood_logs[3:6]  # Previous 3
-            
-            recent_avg = calculate_mood_average(recent_moods)['mood_score']
-            older_avg = calculate_mood_average(older_moods)['mood_score']
+        mood_days = [rollup for rollup in rollups if rollup.get('mood_count')]
+        if len(mood_days) >= 4:
+            recent_avg = calculate_rollup_average(mood_days[:3])['mood_score']
+            older_avg = calculate_rollup_average(mood_days[3:6])['mood_score']
             
             if recent_avg > older_avg + 0.5:
                 mood_trend = "improving"
@@ -97,12 +84,12 @@ def get_weekly_progress():
                 'average_energy': mood_averages['energy'],
                 'average_stress': mood_averages['stress'],
                 'mood_trend': mood_trend,
-                'total_mood_logs': len(mood_logs)
+                'total_mood_logs': sum(rollup.get('mood_count', 0) for rollup in rollups)
             },
             'activity_metrics': {
                 'streak_days': current_streak,
                 'completed_tasks': total_completed_tasks,
-                'total_journal_entries': len(weekly_journals),
+                'total_journal_entries': sum(rollup.get('journal_entries', 0) for rollup in rollups),
                 'daily_plan_stats': plan_stats
             },
             'user_stats': {
@@ -122,6 +109,7 @@ def get_weekly_progress():
 
 @progress_bp.route('/insights', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_progress_insights():
     """Get detailed wellness insights and patterns"""
@@ -130,61 +118,57 @@ def get_progress_insights():
         
         # Get date range (configurable via query param)
         days = request.args.get('days', 30, type=int)
-        days = min(days, 90)  # Max 90 days
+        days = max(1, min(days, 90))  # Max 90 days
         
         start_date, end_date = get_date_range(days)
+        current_date = datetime.now(timezone.utc).date()
+        dates = [(current_date - timedelta(days=i)).isoformat() for i in range(days)]
         
-        # Get data for analysis
-        mood_logs = firestore_service.get_mood_logs(uid, start_date, end_date)
-        journal_entries = firestore_service.get_journal_entries(uid, 50)  # Get more entries
-        
-        # Filter journal entries by date
-        period_journals = [
-            entry for entry in journal_entries 
-            if entry.get('timestamp') and entry['timestamp'] >= start_date
-        ]
+        # One small rollup document per active day, newest first
+        rollups_by_date = firestore_service.get_daily_rollups(uid, dates)
+        rollups = [rollups_by_date[date] for date in dates if date in rollups_by_date]
         
         # Generate wellness insights
-        insights = get_wellness_insights(mood_logs, period_journals)
+        insights = get_rollup_wellness_insights(rollups)
         
         # Analyze mood patterns by day of week
         mood_by_day = {}
-        for log in mood_logs:
-            if log.get('timestamp'):
-                day_of_week = log['timestamp'].strftime('%A')
-                if day_of_week not in mood_by_day:
-                    mood_by_day[day_of_week] = []
-                mood_by_day[day_of_week].append(log)
+        for date in dates:
+            rollup = rollups_by_date.get(date)
+            if rollup and rollup.get('mood_count'):
+                day_of_week = datetime.strptime(date, '%Y-%m-%d').strftime('%A')
+                mood_by_day.setdefault(day_of_week, []).append(rollup)
         
         # Calculate averages by day of week
         daily_patterns = {}
-        for day, logs in mood_by_day.items():
-            daily_patterns[day] = calculate_mood_average(logs)
+        for day, day_rollups in mood_by_day.items():
+            daily_patterns[day] = calculate_rollup_average(day_rollups)
         
         # Analyze journal categories over time
         category_trends = {}
-        for entry in period_journals:
-            ai_insight = entry.get('ai_insight', {})
-            categories = ai_insight.get('categories', [])
-            entry_date = entry.get('timestamp')
+        for date, rollup in rollups_by_date.items():
+            categories = rollup.get('category_counts', {})
+            if not categories:
+                continue
             
-            if entry_date:
-                week_start = entry_date - timedelta(days=entry_date.weekday())
-                week_key = week_start.strftime('%Y-%W')
-                
-                if week_key not in category_trends:
-                    category_trends[week_key] = {}
-                
-                for category in categories:
-                    category_trends[week_key][category] = category_trends[week_key].get(category, 0) + 1
-        
-        # Calculate improvement metrics
-        if len(mood_logs) >= 10:
-            first_half = mood_logs[len(mood_logs)//2:]  # Older entries
-            second_half = mood_logs[:len(mood_logs)//2]  # Newer entries
+            entry_date = datetime.strptime(date, '%Y-%m-%d')
+            week_start = entry_date - timedelta(days=entry_date.weekday())
+            week_key = week_start.strftime('%Y-%W')
             
-            first_avg = calculate_mood_average(first_half)
-            second_avg = calculate_mood_average(second_half)
+            if week_key not in category_trends:
+                category_trends[week_key] = {}
+            
+            for category, count in categories.items():
+                category_trends[week_key][category] = category_trends[week_key].get(category, 0) + count
+        
+        # Calculate improvement metrics: older half of check-in days vs newer half
+        mood_days = [rollup for rollup in rollups if rollup.get('mood_count')]
+        if sum(rollup['mood_count'] for rollup in mood_days) >= 10 and len(mood_days) >= 2:
+            first_half = mood_days[len(mood_days)//2:]  # Older days
+            second_half = mood_days[:len(mood_days)//2]  # Newer days
+            
+            first_avg = calculate_rollup_average(first_half)
+            second_avg = calculate_rollup_average(second_half)
             
             improvements = {
                 'mood_improvement': round(second_avg['mood_score'] - first_avg['mood_score'], 2),
@@ -235,6 +219,7 @@ def get_progress_insights():
 
 @progress_bp.route('/mood-logs', methods=['POST'])
 @require_auth
+@standard_limit
 @handle_errors
 def create_mood_log():
     """Create a new mood log entry"""
@@ -271,17 +256,16 @@ def create_mood_log():
         # Save to Firestore
         log_id = firestore_service.save_mood_log(uid, mood_data)
         
-        # Stream to BigQuery
-        from services.bigquery_service import bigquery_service
-        bigquery_service.stream_mood_log({**mood_data, 'user_id': uid})
+        # Hand off to BigQuery analytics (batched or spooled, never a round trip here)
+        from services.analytics_spool import analytics_sink
+        analytics_sink.stream_mood_log({**mood_data, 'user_id': uid})
         
         # Update user stats
-        user_stats = firestore_service.get_user_stats(uid)
-        updated_stats = {
-            'points': user_stats.get('points', 0) + 5,  # 5 points for mood logging
-            'last_mood_log_date': get_current_utc_time()
-        }
-        firestore_service.update_user_stats(uid, updated_stats)
+        firestore_service.increment_user_stats(
+            uid,
+            {'points': 5},  # 5 points for mood logging
+            fields={'last_mood_log_date': get_current_utc_time()}
+        )
         
         response_data = {
             'log_id': log_id,
@@ -301,6 +285,7 @@ def create_mood_log():
 
 @progress_bp.route('/mood-logs', methods=['GET'])
 @require_auth
+@standard_limit
 @handle_errors
 def get_mood_logs():
     """Get user's mood logs with optional date filtering"""
@@ -311,7 +296,12 @@ def get_mood_logs():
         from_date_str = request.args.get('from')
         to_date_str = request.args.get('to')
         limit = request.args.get('limit', 50, type=int)
-        limit = min(limit, 100)  # Max 100 logs
+        limit = max(1, min(limit, 100))  # Max 100 logs
+        
+        try:
+            start_after = decode_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify(format_response(None, False, "Invalid cursor")), 400
         
         # Parse dates if provided
         from_date = None
@@ -329,11 +319,8 @@ def get_mood_logs():
             except ValueError:
                 return jsonify(format_response(None, False, "Invalid 'to' date format")), 400
         
-        # Get mood logs
-        mood_logs = firestore_service.get_mood_logs(uid, from_date, to_date)
-        
-        # Limit results
-        mood_logs = mood_logs[:limit]
+        # Get one page of mood logs
+        mood_logs = firestore_service.get_mood_logs(uid, from_date, to_date, limit=limit, start_after=start_after)
         
         # Format response
         formatted_logs = []
@@ -351,6 +338,7 @@ def get_mood_logs():
         response_data = {
             'logs': formatted_logs,
             'total': len(formatted_logs),
+            'next_cursor': encode_cursor(mood_logs[-1]) if len(mood_logs) == limit else None,
             'period': {
                 'from': from_date.isoformat() if from_date else None,
                 'to': to_date.isoformat() if to_date else None
@@ -1,17 +1,27 @@
+import copy
+import hashlib
 import json
 import logging
 import os
+import threading
+import time
 from google import genai
 from google.genai import types
 from pydantic import BaseModel, Field
-from typing import List, Literal
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
 from config import Config
+from services.registry import registry
+from services.analysis_cache import analysis_cache
+from services.model_router import RoutingRule, model_router
+from services.lexicon_classifier import lexicon_classifier
+from utils.resilience import CircuitBreaker, Deadline, call_with_retries, is_retryable
+from utils.singleflight import SingleFlight
+from services.prompt_builder import prompt_builder
 
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini client
-client = genai.Client(api_key=Config.GEMINI_API_KEY)
+# Gemini client, created on first use
+client = registry.register('gemini', lambda: genai.Client(api_key=Config.GEMINI_API_KEY))
 
 class JournalInsight(BaseModel):
     mood: Literal["happy", "sad", "stressed", "anxious", "neutral"]
@@ -26,16 +36,135 @@ class ChatResponse(BaseModel):
     mood_detected: str = Field(description="Detected mood from the conversation")
     suggestions: List[str] = Field(description="Helpful suggestions or coping strategies")
 
+CHAT_SYSTEM_PROMPT = """
+            You are Glowra, a compassionate AI companion for young people's mental wellness.
+            
+            Guidelines:
+            - Be warm, empathetic, and supportive
+            - Use age-appropriate language for teens/young adults
+            - Provide practical coping strategies and encouragement
+            - Never provide medical diagnosis or replace professional help
+            - If someone mentions self-harm or severe distress, gently encourage seeking help
+            - Focus on strengths, resilience, and growth mindset
+            - Validate emotions while offering hope and practical next steps
+            
+            Respond with helpful suggestions and maintain a caring, non-judgmental tone.
+            """
+
+# Bump when the journal analysis prompt or schema changes so cached results are not reused
+JOURNAL_PROMPT_VERSION = "1"
+
+# Separates streamed response text from the trailing metadata JSON
+CHAT_STREAM_DELIMITER = "<<<META>>>"
+
+CHAT_FALLBACK_RESPONSE = {
+    "response": "I'm here to listen and support you. Sometimes talking through our feelings can really help. What's on your mind today?",
+    "mood_detected": "neutral",
+    "suggestions": [
+        "Take a few deep breaths",
+        "Consider journaling about your feelings",
+        "Reach out to someone you trust"
+    ]
+}
+
 class AIService:
     def __init__(self):
-        self.model_name = "gemini-2.5-pro"
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        # Identical concurrent requests (double submits, retried requests) share one model call
+        self._journal_inflight = SingleFlight('journal_analysis')
+        self._chat_inflight = SingleFlight('chat')
         logger.info("AI Service initialized with Gemini")
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    def _breaker(self, model: str) -> CircuitBreaker:
+        """Return the circuit breaker for a model, creating it on first use"""
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.setdefault(model, CircuitBreaker(
+                    model,
+                    failure_threshold=Config.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                    reset_timeout_seconds=Config.GEMINI_BREAKER_RESET_SECONDS
+                ))
+        return breaker
+    
+    def _generate(self, model: str, contents, config: types.GenerateContentConfig, deadline: Deadline):
+        """Call generate_content with retries bounded by the deadline and the model's breaker"""
+        def attempt(timeout: float):
+            timed_config = config.model_copy(update={
+                'http_options': types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+            })
+            return client.models.generate_content(model=model, contents=contents, config=timed_config)
+        
+        return call_with_retries(attempt, deadline, self._breaker(model), max_attempts=Config.GEMINI_MAX_ATTEMPTS)
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Return circuit breaker state per model"""
+        return {model: breaker.stats() for model, breaker in list(self._breakers.items())}
+    
+    def inflight_stats(self) -> Dict[str, Any]:
+        """Return single-flight coalescing counters"""
+        return {
+            'journal_analysis': self._journal_inflight.stats(),
+            'chat': self._chat_inflight.stats()
+        }
+    
     def analyze_journal(self, text: str) -> dict:
         """Analyze journal text and return structured insights"""
+        # Instant local labels; risk keywords skip straight to the strong model
+        provisional = lexicon_classifier.classify(text)
+        
+        route_id = model_router.rules['journal'].route_id
+        cached = analysis_cache.get(text, route_id, JOURNAL_PROMPT_VERSION)
+        if cached is not None:
+            logger.info("Journal analysis served from cache")
+            return cached
+        
         try:
-            system_prompt = """
+            key = analysis_cache.make_key(text, route_id, JOURNAL_PROMPT_VERSION)
+            result = self._journal_inflight.do(
+                key, lambda: self._analyze_with_model(text, route_id, provisional["risk"] != "low")
+            )
+            # Coalesced callers share the result object
+            return copy.deepcopy(result)
+                
+        except Exception as e:
+            logger.error(f"Journal analysis failed: {e}")
+            # Degrade to the local classifier's labels rather than a fixed neutral answer
+            self._add_escalation_advice(provisional)
+            return provisional
+    
+    def _analyze_with_model(self, text: str, route_id: str, risky: bool) -> dict:
+        """Run tiered journal analysis and cache the result"""
+        started = time.perf_counter()
+        # One budget covers both tiers and all retries
+        deadline = Deadline(Config.GEMINI_JOURNAL_DEADLINE_SECONDS)
+        result = model_router.run(
+            'journal',
+            lambda model: self._generate_journal_insight(text, model, deadline),
+            self._journal_escalation_reason,
+            force_reason='risk_keywords' if risky else None
+        )
+        self._add_escalation_advice(result)
+        
+        # Only real model results are cached; fallbacks are not
+        analysis_cache.put(text, route_id, JOURNAL_PROMPT_VERSION, result,
+                           (time.perf_counter() - started) * 1000)
+        logger.info("Journal analysis completed successfully")
+        return result
+    
+    @staticmethod
+    def _add_escalation_advice(result: dict):
+        """Add support advice to high risk insights"""
+        if result.get("risk") == "high":
+            result["escalation_advice"] = (
+                "Please consider reaching out to a trusted adult, counselor, or mental health helpline. "
+                "You don't have to go through this alone - support is available."
+            )
+    
+    def _generate_journal_insight(self, text: str, model: str, deadline: Deadline) -> dict:
+        """Run one journal analysis call and validate it against the schema"""
+        system_prompt = """
             You are a compassionate mental health AI assistant for young people. 
             Analyze the journal entry and provide insights in the exact JSON format requested.
             
@@ -52,147 +181,217 @@ class AIService:
             
             Respond ONLY with valid JSON matching the schema.
             """
-            
-            response = client.models.generate_content(
-                model=self.model_name,
-                contents=[
-                    types.Content(role="user", parts=[types.Part(text=f"Analyze this journal entry: {text}")])
-                ],
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    response_mime_type="application/json",
-                    response_schema=JournalInsight,
-                ),
+        
+        response = self._generate(
+            model,
+            [types.Content(role="user", parts=[types.Part(text=f"Analyze this journal entry: {prompt_builder.fit_journal_text(text)}")])],
+            types.GenerateContentConfig(
+                system_instruction=system_prompt,
+                response_mime_type="application/json",
+                response_schema=JournalInsight,
+            ),
+            deadline
+        )
+        
+        if not response.text:
+            raise ValueError("Empty response from AI model")
+        return JournalInsight.model_validate_json(response.text).model_dump()
+    
+    @staticmethod
+    def _journal_escalation_reason(rule: RoutingRule, result: dict) -> Optional[str]:
+        if result["risk"] in rule.escalate_risks:
+            return 'risk'
+        if result["confidence"] < rule.min_confidence:
+            return 'low_confidence'
+        return None
+    
+    def chat_response(self, message: str, conversation_history: List[dict] = None,
+                      summary: Optional[str] = None) -> dict:
+        """Generate contextual chat response for mental wellness guidance"""
+        try:
+            prompt = prompt_builder.build_chat_prompt(
+                message, conversation_history, summary,
+                "Provide a supportive response that acknowledges their feelings and offers helpful guidance."
             )
             
-            if response.text:
-                result = json.loads(response.text)
-                
-                # Add escalation advice for high risk cases
-                if result.get("risk") == "high":
-                    result["escalation_advice"] = (
-                        "Please consider reaching out to a trusted adult, counselor, or mental health helpline. "
-                        "You don't have to go through this alone - support is available."
-                    )
-                
-                logger.info("Journal analysis completed successfully")
-                return result
-            else:
-                raise ValueError("Empty response from AI model")
+            # Risk keywords skip the fast tier, as for journal analysis
+            risky = lexicon_classifier.classify(message)["risk"] != "low"
+            deadline = Deadline(Config.GEMINI_CHAT_DEADLINE_SECONDS)
+            result = self._chat_inflight.do(
+                hashlib.sha256(prompt.encode()).hexdigest(),
+                lambda: model_router.run(
+                    'chat',
+                    lambda model: self._generate_chat_reply(prompt, model, deadline),
+                    self._chat_escalation_reason,
+                    force_reason='risk_keywords' if risky else None
+                )
+            )
+            logger.info("Chat response generated successfully")
+            return copy.deepcopy(result)
                 
         except Exception as e:
-            logger.error(f"Journal analysis failed: {e}")
+            logger.error(f"Chat response generation failed: {e}")
             # Return safe fallback response
-            return {
-                "mood": "neutral",
-                "categories": ["general"],
-                "confidence": 0.5,
-                "recommendations": [
-                    {
-                        "type": "breathing",
-                        "title": "5-minute deep breathing",
-                        "duration_min": 5,
-                        "resource_url": ""
-                    }
-                ],
-                "risk": "low",
-                "message": "Thank you for sharing your thoughts. Remember that every feeling is valid."
-            }
+            return dict(CHAT_FALLBACK_RESPONSE)
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def chat_response(self, message: str, conversation_history: List[dict] = None) -> dict:
-        """Generate contextual chat response for mental wellness guidance"""
+    def _generate_chat_reply(self, prompt: str, model: str, deadline: Deadline) -> dict:
+        """Run one chat call and validate it against the schema"""
+        response = self._generate(
+            model,
+            [types.Content(role="user", parts=[types.Part(text=prompt)])],
+            types.GenerateContentConfig(
+                system_instruction=CHAT_SYSTEM_PROMPT,
+                response_mime_type="application/json",
+                response_schema=ChatResponse,
+            ),
+            deadline
+        )
+        
+        if not response.text:
+            raise ValueError("Empty response from AI model")
+        result = ChatResponse.model_validate_json(response.text).model_dump()
+        if not result["response"].strip():
+            raise ValueError("Blank chat response from AI model")
+        return result
+    
+    @staticmethod
+    def _chat_escalation_reason(rule: RoutingRule, result: dict) -> Optional[str]:
+        if result["mood_detected"].strip().lower() in rule.escalate_moods:
+            return 'mood'
+        return None
+    
+    def chat_response_stream(self, message: str, conversation_history: List[dict] = None,
+                             summary: Optional[str] = None) -> Iterator[Tuple[str, object]]:
+        """Stream a chat response.
+
+        Yields ``("token", text)`` chunks as the model generates them, then a
+        single ``("final", dict)`` with the same shape as ``chat_response``.
+        """
+        prompt = prompt_builder.build_chat_prompt(
+            message, conversation_history, summary,
+            f"""Write a supportive response that acknowledges their feelings and offers helpful guidance.
+            After the response, output the line {CHAT_STREAM_DELIMITER} followed by a JSON object with
+            "mood_detected" (string) and "suggestions" (list of short strings). Output nothing else after it."""
+        )
+        
+        text = ""
+        pending = ""
+        metadata = ""
+        in_metadata = False
+        # Streamed replies can't be escalated after the user sees them, so route up front:
+        # the fast tier unless the message has risk keywords
+        risky = lexicon_classifier.classify(message)["risk"] != "low"
+        model = model_router.pick('chat', force_reason='risk_keywords' if risky else None)
+        breaker = self._breaker(model)
+        if not breaker.allow():
+            # Tokens can't be retracted once sent, so an open circuit goes straight to the fallback
+            logger.warning(f"Circuit {model} is open; serving fallback chat response")
+            fallback = dict(CHAT_FALLBACK_RESPONSE)
+            yield "token", fallback["response"]
+            yield "final", fallback
+            return
+        
         try:
-            # Build conversation context
-            context = ""
-            if conversation_history:
-                for turn in conversation_history[-5:]:  # Last 5 turns for context
-                    context += f"User: {turn.get('user', '')}\nAssistant: {turn.get('assistant', '')}\n"
-            
-            system_prompt = """
-            You are Glowra, a compassionate AI companion for young people's mental wellness.
-            
-            Guidelines:
-            - Be warm, empathetic, and supportive
-            - Use age-appropriate language for teens/young adults
-            - Provide practical coping strategies and encouragement
-            - Never provide medical diagnosis or replace professional help
-            - If someone mentions self-harm or severe distress, gently encourage seeking help
-            - Focus on strengths, resilience, and growth mindset
-            - Validate emotions while offering hope and practical next steps
-            
-            Respond with helpful suggestions and maintain a caring, non-judgmental tone.
-            """
-            
-            prompt = f"""
-            Previous conversation:
-            {context}
-            
-            Current message: {message}
-            
-            Provide a supportive response that acknowledges their feelings and offers helpful guidance.
-            """
-            
-            response = client.models.generate_content(
-                model=self.model_name,
+            timeout_ms = int(Config.GEMINI_CHAT_DEADLINE_SECONDS * 1000)
+            stream = client.models.generate_content_stream(
+                model=model,
                 contents=[
                     types.Content(role="user", parts=[types.Part(text=prompt)])
                 ],
                 config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    response_mime_type="application/json",
-                    response_schema=ChatResponse,
+                    system_instruction=CHAT_SYSTEM_PROMPT,
+                    http_options=types.HttpOptions(timeout=timeout_ms)
                 ),
             )
             
-            if response.text:
-                result = json.loads(response.text)
-                logger.info("Chat response generated successfully")
-                return result
+            for chunk in stream:
+                if not chunk.text:
+                    continue
+                if in_metadata:
+                    metadata += chunk.text
+                    continue
+                
+                pending += chunk.text
+                if CHAT_STREAM_DELIMITER in pending:
+                    head, metadata = pending.split(CHAT_STREAM_DELIMITER, 1)
+                    in_metadata = True
+                    pending = head
+                    safe = head
+                else:
+                    # Hold back a tail that could be the start of a split delimiter
+                    safe = pending[:max(0, len(pending) - len(CHAT_STREAM_DELIMITER))]
+                
+                if safe:
+                    text += safe
+                    pending = pending[len(safe):]
+                    yield "token", safe
+            
+            if pending and not in_metadata:
+                text += pending
+                yield "token", pending
+            breaker.record_success()
+        except GeneratorExit:
+            # Client disconnected mid-stream; no verdict on the model's health
+            breaker.release()
+            raise
+        except Exception as e:
+            logger.error(f"Streaming chat response failed: {e}")
+            if is_retryable(e):
+                breaker.record_failure()
             else:
+                breaker.release()
+            if not text:
+                fallback = dict(CHAT_FALLBACK_RESPONSE)
+                yield "token", fallback["response"]
+                yield "final", fallback
+                return
+        
+        result = {
+            "response": text.strip(),
+            "mood_detected": CHAT_FALLBACK_RESPONSE["mood_detected"],
+            "suggestions": list(CHAT_FALLBACK_RESPONSE["suggestions"])
+        }
+        try:
+            parsed = json.loads(metadata.strip().strip("`").removeprefix("json").strip())
+            result["mood_detected"] = parsed.get("mood_detected") or result["mood_detected"]
+            result["suggestions"] = parsed.get("suggestions") or result["suggestions"]
+        except (ValueError, AttributeError):
+            logger.warning("Streaming chat response had no parseable metadata")
+        
+        logger.info("Streaming chat response completed")
+        yield "final", result
+    
+    def summarize_conversation(self, previous_summary: Optional[str], turns: List[dict]) -> Optional[str]:
+        """Fold older conversation turns into a rolling summary; returns None on failure"""
+        try:
+            response = self._generate(
+                "gemini-2.5-flash",
+                prompt_builder.build_summary_prompt(previous_summary, turns),
+                types.GenerateContentConfig(),
+                Deadline(Config.GEMINI_CHAT_DEADLINE_SECONDS)
+            )
+            if not response.text:
                 raise ValueError("Empty response from AI model")
-                
+            return response.text.strip()
         except Exception as e:
-            logger.error(f"Chat response generation failed: {e}")
-            # Return safe fallback response
-            return {
-                "response": "I'm here to listen and support you. Sometimes talking through our feelings can really help. What's on your mind today?",
-                "mood_detected": "neutral",
-                "suggestions": [
-                    "Take a few deep breaths",
-                    "Consider journaling about your feelings",
-                    "Reach out to someone you trust"
-                ]
-            }
+            logger.error(f"Conversation summarization failed: {e}")
+            return None
     
-    def generate_daily_recommendations(self, user_data: dict) -> List[dict]:
-        """Generate personalized daily recommendations based on user's recent data"""
+    def generate_daily_recommendations(self, user_data: dict, fallback: bool = True) -> List[dict]:
+        """Generate personalized daily recommendations based on user's recent data.
+
+        With ``fallback=False`` failures raise instead of returning the default
+        recommendations (batch jobs shouldn't persist a generic plan).
+        """
         try:
-            # Analyze recent mood patterns and journal insights
-            mood_trends = user_data.get("recent_moods", [])
-            journal_insights = user_data.get("recent_insights", [])
-            user_preferences = user_data.get("preferences", {})
-            
-            prompt = f"""
-            Based on this user's recent mental wellness data, suggest 3-5 personalized daily activities:
+            # Compact summary of recent moods, journal themes and progress, capped at the plan budget
+            prompt = prompt_builder.build_plan_prompt(user_data)
             
-            Recent moods: {mood_trends}
-            Recent journal insights: {journal_insights}
-            User preferences: {user_preferences}
-            
-            Suggest a mix of:
-            - Mindfulness/breathing exercises (5-15 min)
-            - Physical activity (10-30 min)
-            - Creative/journaling activities (10-20 min)
-            - Social connection activities
-            - Study/productivity techniques
-            
-            Format as JSON array with objects containing: type, title, estimated_minutes, description, cta_type
-            """
-            
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",  # Use faster model for recommendations
-                contents=prompt
+            response = self._generate(
+                "gemini-2.5-flash",  # Use faster model for recommendations
+                prompt,
+                types.GenerateContentConfig(),
+                Deadline(Config.GEMINI_PLAN_DEADLINE_SECONDS)
             )
             
             if response.text:
@@ -201,11 +400,12 @@ class AIService:
                 logger.info("Daily recommendations generated successfully")
                 return recommendations
             else:
-                # Return default recommendations
-                return self._get_default_recommendations()
+                raise ValueError("Empty response from AI model")
                 
         except Exception as e:
             logger.error(f"Failed to generate daily recommendations: {e}")
+            if not fallback:
+                raise
             return self._get_default_recommendations()
     
     def _get_default_recommendations(self) -> List[dict]:
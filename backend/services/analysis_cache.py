@@ -0,0 +1,89 @@
+import copy
+import hashlib
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+from config import Config
+from utils.cache import TTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normalize journal text so retries and resubmissions hash identically"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+class AnalysisCache:
+    """Content-addressed cache of journal analysis results.
+
+    Keys are a SHA-256 of the normalized text, model name and prompt version,
+    so changing either the model or the prompt naturally invalidates entries.
+    An in-process LRU sits in front of an optional Firestore tier that is
+    shared across workers and instances.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: int, persistent: bool = False):
+        self.memory = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self.persistent_hits = 0
+        self.model_calls = 0
+        self.model_latency_total_ms = 0.0
+    
+    @staticmethod
+    def make_key(text: str, model_name: str, prompt_version: str) -> str:
+        payload = f"{model_name}\x00{prompt_version}\x00{normalize_text(text)}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def get(self, text: str, model_name: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """Return a cached insight, or None if the model must be called"""
+        key = self.make_key(text, model_name, prompt_version)
+        result = self.memory.get(key)
+        
+        if result is None and self.persistent:
+            from services.firestore_service import firestore_service
+            entry = firestore_service.get_cached_analysis(key, self.memory.ttl_seconds)
+            if entry is not None:
+                with self._lock:
+                    self.persistent_hits += 1
+                result = entry['result']
+                # Keep the promoted copy no longer than the persistent entry lives
+                self.memory.set(key, result, expires_at=entry['expires_at'].timestamp())
+        
+        return copy.deepcopy(result) if result is not None else None
+    
+    def put(self, text: str, model_name: str, prompt_version: str, result: Dict[str, Any], latency_ms: float):
+        """Store a model result and record how long the model call took"""
+        key = self.make_key(text, model_name, prompt_version)
+        with self._lock:
+            self.model_calls += 1
+            self.model_latency_total_ms += latency_ms
+        
+        self.memory.set(key, copy.deepcopy(result))
+        if self.persistent:
+            from services.firestore_service import firestore_service
+            firestore_service.save_cached_analysis(key, result, model_name, prompt_version,
+                                                   self.memory.ttl_seconds)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit rates and the model latency saved by cache hits"""
+        memory = self.memory.stats()
+        # Persistent hits are counted as memory misses first
+        hits = memory['hits'] + self.persistent_hits
+        lookups = memory['hits'] + memory['misses']
+        avg_latency_ms = self.model_latency_total_ms / self.model_calls if self.model_calls else 0.0
+        return {
+            'memory': memory,
+            'persistent_enabled': self.persistent,
+            'persistent_hits': self.persistent_hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'model_calls': self.model_calls,
+            'avg_model_latency_ms': round(avg_latency_ms, 1),
+            'saved_latency_ms': round(hits * avg_latency_ms, 1)
+        }
+
+analysis_cache = AnalysisCache(
+    max_size=Config.ANALYSIS_CACHE_SIZE,
+    ttl_seconds=Config.ANALYSIS_CACHE_TTL_SECONDS,
+    persistent=Config.ANALYSIS_CACHE_PERSISTENT
+)
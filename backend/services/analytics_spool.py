@@ -0,0 +1,406 @@
+import atexit
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+from config import Config
+from services.bigquery_batcher import bigquery_batcher
+from services.bigquery_service import BigQueryService
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = '.ndjson.open'
+SEGMENT_SUFFIX = '.ndjson'
+BATCH_PREFIX = 'batch-'
+DEAD_PREFIX = 'dead-'
+BATCH_DATA = 'data.ndjson'
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    __slots__ = ('path', 'file', 'size', 'rows', 'opened_at', 'unsynced')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'ab')
+        # Held until the segment is sealed; a lock anyone else can take means the writer died
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.size = 0
+        self.rows = 0
+        self.opened_at = time.monotonic()
+        self.unsynced = False
+
+
+class AnalyticsSpool:
+    """Write-ahead spool that lands analytics rows on local disk and bulk-loads them into BigQuery.
+
+    Each process appends rows to its own per-table NDJSON segment
+    (``<table>/<name>.ndjson.open``). Every append reaches the kernel before
+    returning, so a process crash loses nothing; a background thread fsyncs
+    open segments every ``fsync_interval_seconds`` (group commit) and seals
+    them once they reach ``segment_max_bytes`` or ``segment_max_age_seconds``.
+
+    One drainer at a time (an flock on the spool directory) moves sealed
+    segments into a ``batch-*`` directory, loads them with a single load job
+    per table and deletes the batch on success. Job ids are derived from the
+    batch name, so a batch replayed after a crash is never loaded twice.
+    Segments left open by a dead process are trimmed to their last complete
+    line and sealed by the next drain.
+    """
+
+    def __init__(self, directory: str, fsync_interval_seconds: float = 0.2,
+                 segment_max_bytes: int = 16 * 1024 * 1024, segment_max_age_seconds: float = 60,
+                 drain_interval_seconds: float = 30, batch_max_bytes: int = 256 * 1024 * 1024,
+                 max_load_attempts: int = 10, load_timeout_seconds: float = 300):
+        self.directory = directory
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age_seconds = segment_max_age_seconds
+        self.drain_interval_seconds = drain_interval_seconds
+        self.batch_max_bytes = batch_max_bytes
+        self.max_load_attempts = max_load_attempts
+        self.load_timeout_seconds = load_timeout_seconds
+        self.reset_after_fork()
+
+    def reset_after_fork(self):
+        """Forget the parent's open segments and threads; the child writes its own segments"""
+        self._lock = threading.Lock()
+        self._segments: Dict[str, _Segment] = {}
+        self._token = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._stop = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+        self._drainer: Optional[threading.Thread] = None
+        self.appended = 0
+        self.sealed = 0
+        self.recovered = 0
+        self.batches_loaded = 0
+        self.rows_loaded = 0
+        self.load_failures = 0
+        self.dead_batches = 0
+        self.last_fsync_ms: Optional[float] = None
+        self.last_drain: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        """Start the fsync and drain threads (idempotent); only serving processes should drain"""
+        with self._lock:
+            self._stop.clear()
+            self._start_syncer()
+            if self._drainer is None or not self._drainer.is_alive():
+                self._drainer = threading.Thread(target=self._drain_loop, name="spool-drain", daemon=True)
+                self._drainer.start()
+
+    def _start_syncer(self):
+        if self._syncer is None or not self._syncer.is_alive():
+            self._syncer = threading.Thread(target=self._sync_loop, name="spool-sync", daemon=True)
+            self._syncer.start()
+
+    def append(self, table: str, row: Dict[str, Any]) -> bool:
+        """Append a row to this process's segment for ``table``; returns False if it could not be written"""
+        line = (json.dumps(row, default=str, separators=(',', ':')) + '\n').encode()
+        try:
+            with self._lock:
+                segment = self._segments.get(table) or self._open_segment(table)
+                segment.file.write(line)
+                segment.file.flush()
+                segment.size += len(line)
+                segment.rows += 1
+                segment.unsynced = True
+                self.appended += 1
+                if segment.size >= self.segment_max_bytes:
+                    self._seal(table)
+        except OSError as e:
+            logger.error(f"Failed to spool analytics row for {table}: {e}")
+            return False
+        if self._syncer is None:
+            # Writers only need the fsync thread; draining is left to serving processes
+            with self._lock:
+                self._start_syncer()
+        return True
+
+    def stream_mood_log(self, mood_data: Dict[str, Any]) -> bool:
+        """Spool a mood log for the mood_logs table"""
+        return self.append(Config.BQ_MOOD_TABLE, BigQueryService.mood_log_row(mood_data))
+
+    def stream_journal_insight(self, journal_data: Dict[str, Any]) -> bool:
+        """Spool a journal insight for the journal_insights table"""
+        return self.append(Config.BQ_JOURNAL_TABLE, BigQueryService.journal_insight_row(journal_data))
+
+    def _open_segment(self, table: str) -> _Segment:
+        table_dir = os.path.join(self.directory, table)
+        os.makedirs(table_dir, exist_ok=True)
+        self._seq += 1
+        # Names sort by creation time, so batches load rows roughly in order
+        name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._token}-{self._seq:06d}{OPEN_SUFFIX}"
+        segment = self._segments[table] = _Segment(os.path.join(table_dir, name))
+        return segment
+
+    def _seal(self, table: str):
+        """Make a segment durable and visible to the drainer (caller holds the lock)"""
+        segment = self._segments.pop(table)
+        segment.file.flush()
+        os.fsync(segment.file.fileno())
+        # Rename while still holding the flock so recovery can't seal it a second time
+        if segment.rows:
+            os.rename(segment.path, segment.path[:-len('.open')])
+        else:
+            os.remove(segment.path)
+        _fsync_dir(os.path.dirname(segment.path))
+        segment.file.close()
+        self.sealed += 1
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.fsync_interval_seconds):
+            self.sync()
+
+    def sync(self):
+        """fsync rows written since the last sync and seal segments past their max age"""
+        started = time.perf_counter()
+        now = time.monotonic()
+        fds = []
+        with self._lock:
+            for table in list(self._segments):
+                segment = self._segments[table]
+                if now - segment.opened_at >= self.segment_max_age_seconds:
+                    self._seal(table)
+                elif segment.unsynced:
+                    # fsync a duplicate outside the lock so appends aren't blocked on the disk
+                    fds.append(os.dup(segment.file.fileno()))
+                    segment.unsynced = False
+        for fd in fds:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if fds:
+            self.last_fsync_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def flush(self) -> int:
+        """Seal every open segment so the next drain picks it up; returns the number sealed"""
+        with self._lock:
+            tables = list(self._segments)
+            for table in tables:
+                self._seal(table)
+        return len(tables)
+
+    def shutdown(self):
+        """Stop background threads and seal open segments (they are loaded by the next drain)"""
+        self._stop.set()
+        for thread in (self._syncer, self._drainer):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=5)
+        try:
+            self.flush()
+        except OSError as e:
+            logger.error(f"Failed to seal analytics spool segments: {e}")
+
+    def _drain_loop(self):
+        while True:
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Analytics spool drain failed: {e}")
+            if self._stop.wait(self.drain_interval_seconds):
+                break
+
+    def drain(self) -> Dict[str, Any]:
+        """Load sealed segments into BigQuery, one load job per table; skipped if another process is draining"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.drain.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {'skipped': 'another process is draining'}
+
+            report = {'recovered': 0, 'batches': 0, 'rows': 0, 'failed': 0}
+            for table in sorted(os.listdir(self.directory)):
+                table_dir = os.path.join(self.directory, table)
+                if not os.path.isdir(table_dir):
+                    continue
+                report['recovered'] += self._recover_orphans(table_dir)
+                # Finish batches from an earlier drain first (a crash may have interrupted them)
+                batches = sorted(name for name in os.listdir(table_dir) if name.startswith(BATCH_PREFIX))
+                new_batch = self._make_batch(table_dir)
+                if new_batch:
+                    batches.append(new_batch)
+                for batch in batches:
+                    rows = self._load_batch(table, os.path.join(table_dir, batch))
+                    if rows is None:
+                        report['failed'] += 1
+                        break
+                    report['batches'] += 1
+                    report['rows'] += rows
+        self.last_drain = {**report, 'at': time.time()}
+        return report
+
+    def _recover_orphans(self, table_dir: str) -> int:
+        """Seal segments whose writer died, dropping a torn final line"""
+        recovered = 0
+        for name in os.listdir(table_dir):
+            if not name.endswith(OPEN_SUFFIX):
+                continue
+            path = os.path.join(table_dir, name)
+            try:
+                f = open(path, 'r+b')
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # still being written
+                if not os.path.exists(path):
+                    continue  # sealed by its writer while we were opening it
+                data = f.read()
+                keep = data.rfind(b'\n') + 1
+                if keep == 0:
+                    os.remove(path)
+                    continue
+                if keep < len(data):
+                    f.truncate(keep)
+                f.flush()
+                os.fsync(f.fileno())
+                os.rename(path, path[:-len('.open')])
+            recovered += 1
+            logger.warning(f"Recovered analytics spool segment {name}")
+        if recovered:
+            _fsync_dir(table_dir)
+            self.recovered += recovered
+        return recovered
+
+    def _make_batch(self, table_dir: str) -> Optional[str]:
+        """Move sealed segments into a new batch directory; each move is atomic, so a batch never loses rows"""
+        segments = sorted(name for name in os.listdir(table_dir) if name.endswith(SEGMENT_SUFFIX))
+        if not segments:
+            return None
+        batch = BATCH_PREFIX + segments[0][:-len(SEGMENT_SUFFIX)]
+        batch_dir = os.path.join(table_dir, batch)
+        os.makedirs(batch_dir, exist_ok=True)
+        size = 0
+        for name in segments:
+            path = os.path.join(table_dir, name)
+            segment_size = os.path.getsize(path)
+            if size and size + segment_size > self.batch_max_bytes:
+                break
+            os.rename(path, os.path.join(batch_dir, name))
+            size += segment_size
+        _fsync_dir(batch_dir)
+        _fsync_dir(table_dir)
+        return batch
+
+    def _load_batch(self, table: str, batch_dir: str) -> Optional[int]:
+        """Load one batch and delete it; returns rows loaded, or None to retry on a later drain"""
+        from services.bigquery_service import bigquery_service
+
+        data_path = os.path.join(batch_dir, BATCH_DATA)
+        if not os.path.exists(data_path):
+            self._write_batch_data(batch_dir, data_path)
+        if os.path.getsize(data_path) == 0:
+            shutil.rmtree(batch_dir)
+            return 0
+
+        batch = os.path.basename(batch_dir)
+        job_base = f"glowra_spool_{table}_{batch[len(BATCH_PREFIX):]}".replace('.', '_')
+        # Attempt ids are deterministic: earlier attempts resolve to their recorded outcome
+        for attempt in range(self.max_load_attempts):
+            try:
+                result = bigquery_service.load_ndjson(table, data_path, f"{job_base}_{attempt}",
+                                                      timeout=self.load_timeout_seconds)
+            except Exception as e:
+                self.load_failures += 1
+                logger.warning(f"Load of {batch} into {table} did not finish ({e}); retrying next drain")
+                return None
+            if result['error'] is None:
+                shutil.rmtree(batch_dir)
+                self.batches_loaded += 1
+                self.rows_loaded += result['rows']
+                logger.info(f"Loaded {result['rows']} spooled rows into {table} from {batch}")
+                return result['rows']
+            self.load_failures += 1
+            logger.warning(f"Load attempt {attempt} of {batch} into {table} failed: {result['error']}")
+
+        dead_dir = os.path.join(os.path.dirname(batch_dir), DEAD_PREFIX + batch[len(BATCH_PREFIX):])
+        os.rename(batch_dir, dead_dir)
+        self.dead_batches += 1
+        logger.error(f"Giving up on {batch} for {table} after {self.max_load_attempts} load attempts; kept at {dead_dir}")
+        return None
+
+    @staticmethod
+    def _write_batch_data(batch_dir: str, data_path: str):
+        """Concatenate a batch's segments into one load file (rebuilt from the segments if interrupted)"""
+        tmp_path = data_path + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            for name in sorted(os.listdir(batch_dir)):
+                if name.endswith(SEGMENT_SUFFIX) and name != BATCH_DATA:
+                    with open(os.path.join(batch_dir, name), 'rb') as segment:
+                        shutil.copyfileobj(segment, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.rename(tmp_path, data_path)
+        _fsync_dir(batch_dir)
+
+    def pending(self) -> Dict[str, int]:
+        """Return sealed-but-unloaded segment counts per table"""
+        counts = {}
+        if not os.path.isdir(self.directory):
+            return counts
+        for table in os.listdir(self.directory):
+            table_dir = os.path.join(self.directory, table)
+            if not os.path.isdir(table_dir):
+                continue
+            count = 0
+            for name in os.listdir(table_dir):
+                path = os.path.join(table_dir, name)
+                if name.endswith(SEGMENT_SUFFIX):
+                    count += 1
+                elif name.startswith(BATCH_PREFIX) and os.path.isdir(path):
+                    count += sum(1 for n in os.listdir(path) if n.endswith(SEGMENT_SUFFIX) and n != BATCH_DATA)
+            counts[table] = count
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        """Return spool write/load counters for monitoring"""
+        return {
+            'directory': self.directory,
+            'open_segments': len(self._segments),
+            'pending_segments': self.pending(),
+            'appended': self.appended,
+            'sealed': self.sealed,
+            'recovered': self.recovered,
+            'batches_loaded': self.batches_loaded,
+            'rows_loaded': self.rows_loaded,
+            'load_failures': self.load_failures,
+            'dead_batches': self.dead_batches,
+            'last_fsync_ms': self.last_fsync_ms,
+            'last_drain': self.last_drain
+        }
+
+
+analytics_spool = None
+if Config.ANALYTICS_SPOOL_DIR:
+    analytics_spool = AnalyticsSpool(
+        Config.ANALYTICS_SPOOL_DIR,
+        fsync_interval_seconds=Config.ANALYTICS_SPOOL_FSYNC_INTERVAL_SECONDS,
+        segment_max_bytes=Config.ANALYTICS_SPOOL_SEGMENT_MAX_BYTES,
+        segment_max_age_seconds=Config.ANALYTICS_SPOOL_SEGMENT_MAX_AGE_SECONDS,
+        drain_interval_seconds=Config.ANALYTICS_SPOOL_DRAIN_INTERVAL_SECONDS,
+        max_load_attempts=Config.ANALYTICS_SPOOL_MAX_LOAD_ATTEMPTS
+    )
+    atexit.register(analytics_spool.shutdown)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=analytics_spool.reset_after_fork)
+
+# Where handlers send analytics rows: the durable spool when configured, else buffered streaming
+analytics_sink = analytics_spool or bigquery_batcher
@@ -0,0 +1,301 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+from config import Config
+from services.bigquery_service import BigQueryService
+from utils.resilience import RETRYABLE_STATUS_CODES, is_retryable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Signature of the function that sends one batch: (table, rows, insert_ids, timeout) -> row errors
+InsertFn = Callable[[str, List[Dict[str, Any]], List[str], float], List[Dict[str, Any]]]
+
+
+class _Row:
+    __slots__ = ('insert_id', 'data', 'size', 'enqueued_at', 'attempts')
+
+    def __init__(self, data: Dict[str, Any], size: int):
+        self.insert_id = uuid.uuid4().hex
+        self.data = data
+        self.size = size
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class _TableQueue:
+    __slots__ = ('rows', 'bytes', 'retry_at', 'failures')
+
+    def __init__(self):
+        self.rows: Deque[_Row] = deque()
+        self.bytes = 0
+        self.retry_at = 0.0
+        self.failures = 0
+
+
+def _is_retryable(error: Exception) -> bool:
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    return is_retryable(error) or isinstance(error, requests.RequestException)
+
+
+def _insert_with_client(table: str, rows: List[Dict[str, Any]], insert_ids: List[str],
+                        timeout: float) -> List[Dict[str, Any]]:
+    from services.bigquery_service import bigquery_service
+    return bigquery_service.insert_rows(table, rows, insert_ids, timeout=timeout)
+
+
+class BigQueryBatcher:
+    """Buffers analytics rows per table and streams them to BigQuery in batches.
+
+    Request handlers only append to an in-memory queue. A background thread
+    flushes a table once it holds ``max_rows`` rows or ``max_bytes`` bytes,
+    or its oldest row has waited ``max_latency_seconds``. Every row carries
+    an insertId, so retried batches are de-duplicated by BigQuery. Failed
+    rows go back to the front of their queue and the table backs off with
+    full jitter; rows BigQuery rejects as invalid are dropped.
+    """
+
+    def __init__(self, max_rows: int = 500, max_bytes: int = 5_000_000, max_latency_seconds: float = 2.0,
+                 max_queue_rows: int = 50_000, max_attempts: int = 5, insert_timeout_seconds: float = 10,
+                 base_backoff_seconds: float = 0.5, max_backoff_seconds: float = 30,
+                 insert: InsertFn = _insert_with_client):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_latency_seconds = max_latency_seconds
+        self.max_queue_rows = max_queue_rows
+        self.max_attempts = max_attempts
+        self.insert_timeout_seconds = insert_timeout_seconds
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._insert = insert
+        self.reset_after_fork()
+
+    def reset_after_fork(self):
+        """Start from empty queues and no flusher thread (rows queued by the parent stay with the parent)"""
+        self._queues: Dict[str, _TableQueue] = {}
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.inserted = 0
+        self.retried = 0
+        self.batches = 0
+        self.batch_failures = 0
+        self.flush_reasons: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+        self.last_flush_ms: Optional[float] = None
+
+    def enqueue(self, table: str, row: Dict[str, Any]) -> bool:
+        """Queue a row for streaming; returns False if the buffer is full and the row was dropped"""
+        item = _Row(row, len(json.dumps(row, default=str)))
+        with self._cond:
+            if self._stopping or self._queued >= self.max_queue_rows:
+                self._count_dropped('stopped' if self._stopping else 'queue_full', 1)
+                return False
+            queue = self._queues.get(table)
+            if queue is None:
+                queue = self._queues[table] = _TableQueue()
+            queue.rows.append(item)
+            queue.bytes += item.size
+            self._queued += 1
+            self.enqueued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="bigquery-batcher", daemon=True)
+                self._thread.start()
+            # Wake the flusher to start this table's latency timer or to flush a full batch
+            if len(queue.rows) == 1 or len(queue.rows) >= self.max_rows or queue.bytes >= self.max_bytes:
+                self._cond.notify()
+        return True
+
+    def stream_mood_log(self, mood_data: Dict[str, Any]) -> bool:
+        """Queue a mood log for the mood_logs table"""
+        return self.enqueue(Config.BQ_MOOD_TABLE, BigQueryService.mood_log_row(mood_data))
+
+    def stream_journal_insight(self, journal_data: Dict[str, Any]) -> bool:
+        """Queue a journal insight for the journal_insights table"""
+        return self.enqueue(Config.BQ_JOURNAL_TABLE, BigQueryService.journal_insight_row(journal_data))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    table, reason, wait = self._next_due(time.monotonic())
+                    if table:
+                        break
+                    self._cond.wait(timeout=wait)
+                batch = self._take(self._queues[table])
+            self._flush(table, batch, reason)
+
+    def _next_due(self, now: float) -> Tuple[Optional[str], Optional[str], Optional[float]]:
+        """Return (table, reason, None) for a table due for a flush, else (None, None, seconds to wait)"""
+        wait = None
+        for table, queue in self._queues.items():
+            if not queue.rows:
+                continue
+            if now < queue.retry_at:
+                due_in = queue.retry_at - now
+            elif len(queue.rows) >= self.max_rows:
+                return table, 'rows', None
+            elif queue.bytes >= self.max_bytes:
+                return table, 'bytes', None
+            else:
+                due_in = queue.rows[0].enqueued_at + self.max_latency_seconds - now
+                if due_in <= 0:
+                    return table, 'latency', None
+            wait = due_in if wait is None else min(wait, due_in)
+        return None, None, wait
+
+    def _take(self, queue: _TableQueue) -> List[_Row]:
+        batch = []
+        size = 0
+        while queue.rows and len(batch) < self.max_rows:
+            if batch and size + queue.rows[0].size > self.max_bytes:
+                break
+            item = queue.rows.popleft()
+            batch.append(item)
+            size += item.size
+        queue.bytes -= size
+        self._queued -= len(batch)
+        return batch
+
+    def _flush(self, table: str, batch: List[_Row], reason: str) -> bool:
+        """Send one batch; failed rows are re-queued. Returns True if every row was accepted or dropped"""
+        started = time.perf_counter()
+        self.batches += 1
+        self.flush_reasons[reason] = self.flush_reasons.get(reason, 0) + 1
+        try:
+            errors = self._insert(table, [item.data for item in batch], [item.insert_id for item in batch],
+                                  self.insert_timeout_seconds)
+        except Exception as e:
+            self.batch_failures += 1
+            if not _is_retryable(e):
+                logger.error(f"BigQuery rejected a batch of {len(batch)} rows for {table}: {e}")
+                self._count_dropped('rejected', len(batch))
+                return True
+            logger.warning(f"BigQuery insert of {len(batch)} rows into {table} failed ({e}); will retry")
+            self._requeue(table, batch)
+            return False
+        finally:
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        retry = []
+        invalid = 0
+        for error in errors or []:
+            item = batch[error['index']]
+            if any(detail.get('reason') == 'invalid' for detail in error.get('errors', [])):
+                invalid += 1
+                logger.error(f"BigQuery rejected a row for {table}: {error.get('errors')}")
+            else:
+                # 'stopped' rows were valid but held back by another row's failure
+                retry.append(item)
+        if invalid:
+            self._count_dropped('invalid', invalid)
+        self.inserted += len(batch) - len(errors or [])
+
+        if retry:
+            self._requeue(table, retry)
+            return False
+        with self._cond:
+            queue = self._queues[table]
+            queue.failures = 0
+            queue.retry_at = 0.0
+        return True
+
+    def _requeue(self, table: str, items: List[_Row]):
+        retry = []
+        for item in items:
+            item.attempts += 1
+            if item.attempts < self.max_attempts:
+                retry.append(item)
+        if len(retry) < len(items):
+            logger.error(f"Dropping {len(items) - len(retry)} rows for {table} after {self.max_attempts} attempts")
+            self._count_dropped('exhausted', len(items) - len(retry))
+
+        with self._cond:
+            queue = self._queues[table]
+            # Back to the front so rows keep their order and their insertIds
+            queue.rows.extendleft(reversed(retry))
+            queue.bytes += sum(item.size for item in retry)
+            self._queued += len(retry)
+            self.retried += len(retry)
+            queue.failures += 1
+            delay = random.uniform(0, min(self.max_backoff_seconds,
+                                          self.base_backoff_seconds * 2 ** (queue.failures - 1)))
+            queue.retry_at = time.monotonic() + delay
+
+    def _count_dropped(self, reason: str, count: int):
+        self.dropped[reason] = self.dropped.get(reason, 0) + count
+
+    def flush(self, timeout: float = 10) -> int:
+        """Send everything queued now, ignoring backoff; returns the number of rows still queued"""
+        give_up_at = time.monotonic() + timeout
+        for table in list(self._queues):
+            while time.monotonic() < give_up_at:
+                with self._cond:
+                    queue = self._queues[table]
+                    if not queue.rows:
+                        break
+                    batch = self._take(queue)
+                if not self._flush(table, batch, 'flush'):
+                    break
+        return self._queued
+
+    def shutdown(self, timeout: float = 10):
+        """Stop the flusher thread and send what is still buffered"""
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        remaining = self.flush(timeout)
+        if remaining:
+            self._count_dropped('shutdown', remaining)
+            logger.error(f"{remaining} BigQuery rows were still queued at shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and delivery counters for monitoring"""
+        with self._cond:
+            queued = {table: len(queue.rows) for table, queue in self._queues.items()}
+        return {
+            'queued': queued,
+            'enqueued': self.enqueued,
+            'inserted': self.inserted,
+            'retried': self.retried,
+            'dropped': dict(self.dropped),
+            'batches': self.batches,
+            'batch_failures': self.batch_failures,
+            'flush_reasons': dict(self.flush_reasons),
+            'avg_batch_rows': round(self.inserted / self.batches, 1) if self.batches else 0.0,
+            'last_flush_ms': self.last_flush_ms
+        }
+
+
+bigquery_batcher = BigQueryBatcher(
+    max_rows=Config.BQ_BATCH_MAX_ROWS,
+    max_bytes=Config.BQ_BATCH_MAX_BYTES,
+    max_latency_seconds=Config.BQ_BATCH_MAX_LATENCY_SECONDS,
+    max_queue_rows=Config.BQ_BATCH_MAX_QUEUE_ROWS,
+    max_attempts=Config.BQ_INSERT_MAX_ATTEMPTS,
+    insert_timeout_seconds=Config.BQ_INSERT_TIMEOUT_SECONDS
+)
+
+atexit.register(bigquery_batcher.shutdown)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=bigquery_batcher.reset_after_fork)
@@ -1,26 +1,31 @@
-from google.cloud import bigquery
-from google.cloud.bigquery import SchemaField
 from config import Config
+from services.registry import registry
 import logging
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 class BigQueryService:
     def __init__(self):
         try:
+            # Imported here so loading this module doesn't pay for the SDK import
+            from google.cloud import bigquery
             self.client = bigquery.Client(project=Config.GCP_PROJECT)
             self.dataset_id = Config.BQ_DATASET
-            self._ensure_dataset_exists()
-            self._ensure_tables_exist()
             logger.info("BigQuery client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize BigQuery client: {e}")
             raise
     
+    def ensure_schema(self):
+        """Create the analytics dataset and tables if missing (run once via `flask init-bigquery`)"""
+        self._ensure_dataset_exists()
+        self._ensure_tables_exist()
+    
     def _ensure_dataset_exists(self):
         """Ensure the analytics dataset exists"""
+        from google.cloud import bigquery
         try:
             dataset_ref = self.client.dataset(self.dataset_id)
             try:
@@ -36,6 +41,7 @@ class BigQueryService:
     
     def _ensure_tables_exist(self):
         """Ensure required tables exist"""
+        from google.cloud.bigquery import SchemaField
         try:
             # Mood logs table schema
             mood_schema = [
@@ -67,6 +73,7 @@ class BigQueryService:
     
     def _create_table_if_not_exists(self, table_name: str, schema: list):
         """Create table if it doesn't exist"""
+        from google.cloud import bigquery
         try:
             table_ref = self.client.dataset(self.dataset_id).table(table_name)
             try:
@@ -79,65 +86,68 @@ class BigQueryService:
         except Exception as e:
             logger.error(f"Failed to create table {table_name}: {e}")
     
-    def stream_mood_log(self, mood_data: Dict[str, Any]) -> bool:
-        """Stream mood log data to BigQuery"""
-        try:
-            table_ref = self.client.dataset(self.dataset_id).table(Config.BQ_MOOD_TABLE)
-            
-            # Prepare row data
-            row_data = {
-                "user_id": mood_data.get("user_id"),
-                "mood": mood_data.get("mood"),
-                "energy": mood_data.get("energy"),
-                "stress": mood_data.get("stress"),
-                "note": mood_data.get("note"),
-                "timestamp": mood_data.get("timestamp", datetime.now(timezone.utc)).isoformat(),
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            # Insert row
-            errors = self.client.insert_rows_json(table_ref, [row_data])
-            
-            if errors:
-                logger.error(f"Failed to insert mood log: {errors}")
-                return False
-            
-            logger.info("Mood log streamed to BigQuery successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to stream mood log to BigQuery: {e}")
-            return False
+    def insert_rows(self, table_name: str, rows: List[Dict[str, Any]], row_ids: List[str],
+                    timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Stream rows into a table; returns BigQuery's per-row errors (empty on success)"""
+        table_ref = self.client.dataset(self.dataset_id).table(table_name)
+        return self.client.insert_rows_json(table_ref, rows, row_ids=row_ids, timeout=timeout)
     
-    def stream_journal_insight(self, journal_data: Dict[str, Any]) -> bool:
-        """Stream journal insight data to BigQuery"""
+    def load_ndjson(self, table_name: str, path: str, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Append a newline-delimited JSON file to a table with a load job and wait for it.
+
+        ``job_id`` makes the load idempotent: if a job with that id was
+        already submitted (e.g. before a crash) its outcome is returned
+        instead of loading the file twice. Returns {'state', 'error', 'rows'}.
+        """
+        from google.api_core.exceptions import Conflict
+        from google.cloud import bigquery
+        
+        table_ref = self.client.dataset(self.dataset_id).table(table_name)
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            ignore_unknown_values=True
+        )
         try:
-            table_ref = self.client.dataset(self.dataset_id).table(Config.BQ_JOURNAL_TABLE)
-            
-            # Prepare row data
-            ai_insight = journal_data.get("ai_insight", {})
-            row_data = {
-                "user_id": journal_data.get("user_id"),
-                "categories": ai_insight.get("categories", []),
-                "mood": ai_insight.get("mood"),
-                "risk_level": ai_insight.get("risk"),
-                "confidence": ai_insight.get("confidence"),
-                "timestamp": journal_data.get("timestamp", datetime.now(timezone.utc)).isoformat(),
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            # Insert row
-            errors = self.client.insert_rows_json(table_ref, [row_data])
-            
-            if errors:
-                logger.error(f"Failed to insert journal insight: {errors}")
-                return False
-            
-            logger.info("Journal insight streamed to BigQuery successfully")
-            return True
-            
+            with open(path, 'rb') as f:
+                job = self.client.load_table_from_file(f, table_ref, job_id=job_id, job_config=job_config,
+                                                       timeout=timeout)
+        except Conflict:
+            job = self.client.get_job(job_id)
+        
+        try:
+            job.result(timeout=timeout)
         except Exception as e:
-            logger.error(f"Failed to stream journal insight to BigQuery: {e}")
-            return False
+            if not job.done():
+                raise
+            return {'state': job.state, 'error': str(job.error_result or e), 'rows': 0}
+        return {'state': job.state, 'error': None, 'rows': job.output_rows or 0}
+    
+    @staticmethod
+    def mood_log_row(mood_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a mood log into a mood_logs row"""
+        return {
+            "user_id": mood_data.get("user_id"),
+            "mood": mood_data.get("mood"),
+            "energy": mood_data.get("energy"),
+            "stress": mood_data.get("stress"),
+            "note": mood_data.get("note"),
+            "timestamp": mood_data.get("timestamp", datetime.now(timezone.utc)).isoformat(),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+    
+    @staticmethod
+    def journal_insight_row(journal_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a journal entry and its AI insight into a journal_insights row"""
+        ai_insight = journal_data.get("ai_insight", {})
+        return {
+            "user_id": journal_data.get("user_id"),
+            "categories": ai_insight.get("categories", []),
+            "mood": ai_insight.get("mood"),
+            "risk_level": ai_insight.get("risk"),
+            "confidence": ai_insight.get("confidence"),
+            "timestamp": journal_data.get("timestamp", datetime.now(timezone.utc)).isoformat(),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
 
-bigquery_service = BigQueryService()
+bigquery_service = registry.register('bigquery', BigQueryService)
@@ -0,0 +1,220 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from utils.cache import TTLCache
+from utils.concurrency import parallel
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ('turn_count', 'summarized_turns', 'summary', 'summarized_until')
+
+class _ConversationState:
+    """Cached summary state and the last few turns of one conversation"""
+    
+    __slots__ = ('uid', 'turn_count', 'summarized_turns', 'summary', 'summarized_until', 'turns')
+    
+    def __init__(self, uid: str, conversation: Dict[str, Any], turns: List[dict], max_turns: int):
+        self.uid = uid
+        self.turn_count = conversation.get('turn_count', 0)
+        self.summarized_turns = conversation.get('summarized_turns', 0)
+        self.summary = conversation.get('summary')
+        self.summarized_until = conversation.get('summarized_until')
+        self.turns = deque(turns, maxlen=max_turns)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in SUMMARY_FIELDS}
+
+class ConversationService:
+    """Loads chat context and keeps each conversation's rolling summary up to date.
+
+    The last turns of active conversations are held in a size- and
+    TTL-bounded in-process cache that is updated on every write, so a
+    follow-up message reads only the conversation document instead of its
+    turns. That document's turn_count validates the entry: if another
+    instance has written turns since, the entry is rebuilt from Firestore.
+    On a miss the document and one limited turns query are read in parallel.
+    """
+    
+    def __init__(self, recent_turns: int, summary_batch_turns: int, cache_size: int, cache_ttl_seconds: float):
+        self.recent_turns = recent_turns
+        self.summary_batch_turns = summary_batch_turns
+        # Enough turns to cover the recent window plus those awaiting summarization
+        self.window = recent_turns + summary_batch_turns
+        self.cache = TTLCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._summarizing = set()
+        self.summaries_written = 0
+        self.summary_failures = 0
+        self.stale_rebuilds = 0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+        return self._executor
+    
+    @staticmethod
+    def _to_turn(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {'user': doc.get('user_message', ''), 'assistant': doc.get('ai_response', ''),
+                'timestamp': doc.get('timestamp')}
+    
+    def load_context(self, uid: str, conversation_id: Optional[str]) -> Tuple[Optional[Dict[str, Any]], List[dict], Optional[str]]:
+        """Return (conversation, recent turns not yet summarized, summary) for a chat prompt.
+
+        The conversation is None when there is no ID or it belongs to another
+        user. An ID without a summary document (e.g. a conversation from before
+        summaries existed) starts from zero counts and its stored turns.
+        Firestore read errors propagate.
+        """
+        from services.firestore_service import firestore_service
+        
+        if not conversation_id:
+            return None, [], None
+        
+        state = self.cache.get(conversation_id)
+        if state is not None and state.uid != uid:
+            return None, [], None
+        
+        turns = None
+        try:
+            if state is None:
+                conversation, turns = parallel(
+                    lambda: firestore_service.get_conversation(uid, conversation_id),
+                    lambda: firestore_service.get_conversation_turns(uid, conversation_id, limit=self.window,
+                                                                     newest=True)
+                )
+            else:
+                conversation = firestore_service.get_conversation(uid, conversation_id)
+        except PermissionError:
+            self.cache.pop(conversation_id)
+            return None, [], None
+        if conversation is None:
+            conversation = {}
+        
+        if state is not None and conversation.get('turn_count', 0) != state.turn_count:
+            # Another instance saved turns since this entry was cached
+            self.stale_rebuilds += 1
+            turns = firestore_service.get_conversation_turns(uid, conversation_id, limit=self.window, newest=True)
+            state = None
+        
+        if state is None:
+            state = _ConversationState(uid, conversation, [self._to_turn(turn) for turn in turns], self.window)
+            self.cache.set(conversation_id, state)
+        else:
+            with self._lock:
+                # The summary may have been advanced by another instance's summarizer
+                for field in SUMMARY_FIELDS:
+                    setattr(state, field, conversation.get(field, getattr(state, field)))
+        
+        with self._lock:
+            # Summarized turns are covered by the summary, so only later turns are sent verbatim
+            summarized_until = state.summarized_until
+            history = [turn for turn in state.turns
+                       if not summarized_until or turn['timestamp'] > summarized_until]
+            return state.snapshot(), history, state.summary
+    
+    def record_turn(self, uid: str, conversation_id: str, turn_data: Dict[str, Any],
+                    conversation: Optional[Dict[str, Any]]):
+        """Save a turn and schedule summarization once enough turns fall outside the recent window"""
+        from services.firestore_service import firestore_service
+        
+        firestore_service.save_conversation_turn(uid, conversation_id, turn_data)
+        
+        state = self.cache.get(conversation_id)
+        if state is None and conversation is None:
+            # New conversation: start its cache entry from this turn
+            state = _ConversationState(uid, {}, [], self.window)
+        
+        with self._lock:
+            if state is not None:
+                state.turns.append(self._to_turn(turn_data))
+                state.turn_count += 1
+                counts = state.snapshot()
+            else:
+                # Entry was evicted since load_context; the next load rebuilds it from Firestore
+                counts = dict(conversation, turn_count=conversation.get('turn_count', 0) + 1)
+            
+            unsummarized = counts['turn_count'] - counts.get('summarized_turns', 0)
+            schedule = unsummarized >= self.window and conversation_id not in self._summarizing
+            if schedule:
+                self._summarizing.add(conversation_id)
+        
+        if state is not None:
+            self.cache.set(conversation_id, state)
+        if schedule:
+            self._get_executor().submit(self._summarize, uid, conversation_id)
+    
+    def _summarize(self, uid: str, conversation_id: str):
+        from services.ai_service import ai_service
+        from services.firestore_service import firestore_service
+        
+        try:
+            conversation = firestore_service.get_conversation(uid, conversation_id)
+            if not conversation:
+                return
+            summarized = conversation.get('summarized_turns', 0)
+            # Fold everything except the most recent turns into the summary
+            to_fold = conversation.get('turn_count', 0) - summarized - self.recent_turns
+            if to_fold <= 0:
+                return
+            
+            turns = firestore_service.get_conversation_turns(
+                uid, conversation_id, after=conversation.get('summarized_until'), limit=to_fold
+            )
+            if not turns:
+                return
+            summary = ai_service.summarize_conversation(conversation.get('summary'),
+                                                        [self._to_turn(turn) for turn in turns])
+            if summary is None:
+                self.summary_failures += 1
+                return
+            
+            summarized += len(turns)
+            firestore_service.save_conversation_summary(conversation_id, summary, summarized,
+                                                        turns[-1]['timestamp'])
+            state = self.cache.get(conversation_id)
+            if state is not None:
+                with self._lock:
+                    state.summary = summary
+                    state.summarized_turns = summarized
+                    state.summarized_until = turns[-1]['timestamp']
+            self.summaries_written += 1
+            logger.info(f"Summarized {len(turns)} turns of conversation {conversation_id}")
+        except Exception as e:
+            self.summary_failures += 1
+            logger.error(f"Failed to summarize conversation {conversation_id}: {e}")
+        finally:
+            with self._lock:
+                self._summarizing.discard(conversation_id)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return summarization counters for monitoring"""
+        return {
+            'history_cache': self.cache.stats(),
+            'summaries_written': self.summaries_written,
+            'summary_failures': self.summary_failures,
+            'stale_rebuilds': self.stale_rebuilds,
+            'summarizing': len(self._summarizing)
+        }
+    
+    def reset_after_fork(self):
+        """Drop the parent's summary pool and in-flight markers in a forked child"""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._summarizing = set()
+
+conversation_service = ConversationService(
+    Config.CHAT_RECENT_TURNS,
+    Config.CHAT_SUMMARY_BATCH_TURNS,
+    Config.CHAT_HISTORY_CACHE_SIZE,
+    Config.CHAT_HISTORY_CACHE_TTL_SECONDS
+)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=conversation_service.reset_after_fork)
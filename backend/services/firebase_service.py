@@ -1,12 +1,22 @@
 import firebase_admin
 from firebase_admin import credentials, auth
 from config import Config
+from services.key_store import create_key_store
+from services.registry import registry
+from utils.cache import TTLCache
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
 class FirebaseService:
     def __init__(self):
+        # Verified claims keyed by token hash; entries never outlive the token's exp
+        self.token_cache = TTLCache(
+            max_size=Config.TOKEN_CACHE_MAX_SIZE,
+            ttl_seconds=Config.TOKEN_CACHE_TTL_SECONDS
+        )
+        
         if not firebase_admin._apps:
             try:
                 if Config.GOOGLE_APPLICATION_CREDENTIALS:
@@ -22,21 +32,45 @@ class FirebaseService:
             except Exception as e:
                 logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
                 raise
+        
+        # Verify ID tokens locally against in-memory signing keys instead of firebase_admin;
+        # tokens whose key isn't loaded (yet) still go through firebase_admin
+        self.key_store = None
+        if Config.JWT_LOCAL_VERIFY:
+            self.key_store = create_key_store(fallback=auth.verify_id_token)
+            self.key_store.start()
     
     def verify_token(self, id_token):
         """Verify Firebase ID token and return user info"""
+        cache_key = hashlib.sha256(id_token.encode()).hexdigest()
+        cached = self.token_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            decoded_token = auth.verify_id_token(id_token)
-            return {
+            if self.key_store:
+                decoded_token = self.key_store.verify(id_token)
+            else:
+                decoded_token = auth.verify_id_token(id_token)
+            user_info = {
                 'uid': decoded_token['uid'],
                 'email': decoded_token.get('email'),
                 'name': decoded_token.get('name'),
                 'picture': decoded_token.get('picture')
             }
+            self.token_cache.set(cache_key, user_info, expires_at=decoded_token.get('exp'))
+            return dict(user_info)
         except Exception as e:
             logger.error(f"Token verification failed: {e}")
             return None
     
+    def get_cache_stats(self):
+        """Return token cache hit/miss counters"""
+        stats = self.token_cache.stats()
+        if self.key_store:
+            stats['key_store'] = self.key_store.stats()
+        return stats
+    
     def get_user(self, uid):
         """Get user information by UID"""
         try:
@@ -52,4 +86,4 @@ class FirebaseService:
             logger.error(f"Failed to get user {uid}: {e}")
             return None
 
-firebase_service = FirebaseService()
+firebase_service = registry.register('firebase', FirebaseService)
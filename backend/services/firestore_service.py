@@ -1,12 +1,31 @@
 from google.cloud import firestore
 from google.cloud.firestore import FieldFilter
+from google.api_core.exceptions import AlreadyExists
+from flask import g, has_request_context
 from config import Config
+from services.registry import registry
+from utils.helpers import MOOD_SCORES
+import copy
 import logging
-from datetime import datetime, timezone
+import uuid
+from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+# Compact mood codes used by bucketed mood log storage
+MOOD_CODES = ["happy", "sad", "stressed", "anxious", "neutral"]
+
+def _deep_merge(target: Dict[str, Any], update: Dict[str, Any]):
+    """Apply a merge=True style update to a cached document"""
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
 class FirestoreService:
     def __init__(self):
         try:
@@ -16,6 +35,34 @@ class FirestoreService:
             logger.error(f"Failed to initialize Firestore client: {e}")
             raise
     
+    # Request-scoped read memo (stored on flask.g, keyed by collection/document ID)
+    def _memo(self) -> Optional[Dict[tuple, Any]]:
+        if not has_request_context():
+            return None
+        if '_firestore_memo' not in g:
+            g._firestore_memo = {}
+        return g._firestore_memo
+    
+    def _memo_get(self, collection: str, doc_id: str) -> Any:
+        memo = self._memo()
+        if memo is None or (collection, doc_id) not in memo:
+            return _MISSING
+        return copy.deepcopy(memo[(collection, doc_id)])
+    
+    def _memo_set(self, collection: str, doc_id: str, data: Optional[Dict[str, Any]]):
+        memo = self._memo()
+        if memo is not None:
+            memo[(collection, doc_id)] = copy.deepcopy(data)
+    
+    def _memo_merge(self, collection: str, doc_id: str, update: Dict[str, Any]):
+        """Reflect a merge write in the memo; unknown documents are left for the next read"""
+        memo = self._memo()
+        if memo is None or (collection, doc_id) not in memo:
+            return
+        if memo[(collection, doc_id)] is None:
+            memo[(collection, doc_id)] = {}
+        _deep_merge(memo[(collection, doc_id)], update)
+    
     # User operations
     def create_user(self, uid: str, user_data: Dict[str, Any]) -> bool:
         """Create or update user profile"""
@@ -24,20 +71,41 @@ class FirestoreService:
             user_data['created_at'] = datetime.now(timezone.utc)
             user_data['updated_at'] = datetime.now(timezone.utc)
             user_ref.set(user_data, merge=True)
+            self._memo_merge('users', uid, user_data)
             logger.info(f"User {uid} created/updated successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to create user {uid}: {e}")
             return False
     
+    def update_user(self, uid: str, update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge fields into a user profile and return the updated profile (None on failure).
+
+        The profile is read once (or taken from the request memo) and the
+        merged result is memoized, so callers don't need to read it back.
+        """
+        try:
+            profile = self.get_user(uid) or {}
+            update = dict(update, updated_at=datetime.now(timezone.utc))
+            self.db.collection('users').document(uid).set(update, merge=True)
+            _deep_merge(profile, update)
+            self._memo_set('users', uid, profile)
+            return profile
+        except Exception as e:
+            logger.error(f"Failed to update user {uid}: {e}")
+            return None
+    
     def get_user(self, uid: str) -> Optional[Dict[str, Any]]:
         """Get user profile"""
+        cached = self._memo_get('users', uid)
+        if cached is not _MISSING:
+            return cached
         try:
             user_ref = self.db.collection('users').document(uid)
             doc = user_ref.get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            user = doc.to_dict() if doc.exists else None
+            self._memo_set('users', uid, user)
+            return user
         except Exception as e:
             logger.error(f"Failed to get user {uid}: {e}")
             return None
@@ -46,27 +114,215 @@ class FirestoreService:
     def save_mood_log(self, uid: str, mood_data: Dict[str, Any]) -> str:
         """Save mood log entry"""
         try:
-            mood_ref = self.db.collection('mood_logs').document()
             mood_data['user_id'] = uid
             mood_data['timestamp'] = datetime.now(timezone.utc)
-            mood_ref.set(mood_data)
+            
+            if Config.MOOD_LOG_STORAGE == 'buckets':
+                log_id = self._append_mood_bucket(uid, mood_data)
+            else:
+                # Write the log and its daily rollup together
+                mood_ref = self.db.collection('mood_logs').document()
+                batch = self.db.batch()
+                batch.set(mood_ref, mood_data)
+                self._add_rollup_write(batch, uid, mood_data['timestamp'].date().isoformat(),
+                                       *self._mood_rollup_increments(mood_data))
+                batch.commit()
+                log_id = mood_ref.id
+            
             logger.info(f"Mood log saved for user {uid}")
-            return mood_ref.id
+            return log_id
         except Exception as e:
             logger.error(f"Failed to save mood log for user {uid}: {e}")
             raise
     
-    def get_mood_logs(self, uid: str, from_date: datetime = None, to_date: datetime = None) -> List[Dict[str, Any]]:
-        """Get mood logs for user within date range"""
-        try:
-            query = self.db.collection('mood_logs').where(filter=FieldFilter('user_id', '==', uid))
+    def _mood_rollup_increments(self, mood_data: Dict[str, Any]) -> tuple:
+        increments = {
+            'mood_count': 1,
+            'mood_score_sum': MOOD_SCORES.get(mood_data.get('mood'), 3),
+            'energy_sum': mood_data.get('energy', 0),
+            'stress_sum': mood_data.get('stress', 0),
+        }
+        return increments, {'mood_counts': {mood_data.get('mood', 'neutral'): 1}}
+    
+    # Bucketed mood log storage: one document per user per month holding parallel arrays
+    def _mood_bucket_ref(self, uid: str, month: str):
+        return self.db.collection('mood_log_buckets').document(f"{uid}_{month}")
+    
+    def _append_mood_bucket(self, uid: str, mood_data: Dict[str, Any]) -> str:
+        """Append a mood entry to the user's monthly bucket in a transaction"""
+        timestamp = mood_data['timestamp']
+        month = timestamp.strftime('%Y-%m')
+        bucket_ref = self._mood_bucket_ref(uid, month)
+        rollup_ref = self.db.collection('user_daily_rollups').document(f"{uid}_{timestamp.date().isoformat()}")
+        rollup_update = self._rollup_update(uid, timestamp.date().isoformat(),
+                                            *self._mood_rollup_increments(mood_data))
+        log_id = uuid.uuid4().hex[:20]
+        mood = mood_data.get('mood', 'neutral')
+        
+        # Parallel arrays can't use ArrayUnion (it de-duplicates values), so append under a transaction
+        @firestore.transactional
+        def append(transaction):
+            snapshot = bucket_ref.get(transaction=transaction)
+            bucket = snapshot.to_dict() if snapshot.exists else {
+                'user_id': uid, 'month': month,
+                'ids': [], 'timestamps': [], 'moods': [], 'energy': [], 'stress': [], 'notes': []
+            }
+            bucket['ids'].append(log_id)
+            bucket['timestamps'].append(timestamp)
+            bucket['moods'].append(MOOD_CODES.index(mood) if mood in MOOD_CODES else MOOD_CODES.index('neutral'))
+            bucket['energy'].append(mood_data.get('energy', 0))
+            bucket['stress'].append(mood_data.get('stress', 0))
+            bucket['notes'].append(mood_data.get('note') or '')
+            bucket['count'] = len(bucket['ids'])
+            transaction.set(bucket_ref, bucket)
+            transaction.set(rollup_ref, rollup_update, merge=True)
+        
+        append(self.db.transaction())
+        return f"{month}:{log_id}"
+    
+    def migrate_mood_logs_to_buckets(self, uid: str) -> int:
+        """Copy a user's ``mood_logs`` documents into monthly buckets; returns the number copied.
+        
+        Bucket entries reuse the document IDs, so logs already copied are
+        skipped and the migration can be re-run. Rollups are left as they are
+        since the documents were already counted when they were written.
+        """
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        query = self.db.collection('mood_logs').where(filter=FieldFilter('user_id', '==', uid))
+        for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            by_month.setdefault(data['timestamp'].strftime('%Y-%m'), []).append(data)
+        
+        copied = 0
+        for month, logs in by_month.items():
+            bucket_ref = self._mood_bucket_ref(uid, month)
             
-            if from_date:
-                query = query.where(filter=FieldFilter('timestamp', '>=', from_date))
-            if to_date:
-                query = query.where(filter=FieldFilter('timestamp', '<=', to_date))
+            @firestore.transactional
+            def merge(transaction):
+                snapshot = bucket_ref.get(transaction=transaction)
+                bucket = snapshot.to_dict() if snapshot.exists else {
+                    'user_id': uid, 'month': month,
+                    'ids': [], 'timestamps': [], 'moods': [], 'energy': [], 'stress': [], 'notes': []
+                }
+                existing = set(bucket['ids'])
+                new_logs = [log for log in logs if log['id'] not in existing]
+                if not new_logs:
+                    return 0
+                entries = list(zip(bucket['ids'], bucket['timestamps'], bucket['moods'],
+                                   bucket['energy'], bucket['stress'], bucket['notes']))
+                for log in new_logs:
+                    mood = log.get('mood', 'neutral')
+                    entries.append((log['id'], log['timestamp'],
+                                    MOOD_CODES.index(mood) if mood in MOOD_CODES else MOOD_CODES.index('neutral'),
+                                    log.get('energy', 0), log.get('stress', 0), log.get('note') or ''))
+                # Keep entries in write order, as appends would have left them
+                entries.sort(key=lambda entry: entry[1])
+                for field, values in zip(('ids', 'timestamps', 'moods', 'energy', 'stress', 'notes'),
+                                         zip(*entries)):
+                    bucket[field] = list(values)
+                bucket['count'] = len(entries)
+                transaction.set(bucket_ref, bucket)
+                return len(new_logs)
             
-            query = query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+            copied += merge(self.db.transaction())
+        return copied
+    
+    def _get_bucketed_mood_logs(self, uid: str, from_date: datetime = None, to_date: datetime = None,
+                                limit: int = None, start_after: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Read and slice monthly mood buckets into the per-log shape returned by get_mood_logs"""
+        upper = min(filter(None, [to_date, start_after and start_after['timestamp']]), default=None)
+        
+        if from_date:
+            # Bounded range: fetch exactly the month buckets it covers
+            end = upper or datetime.now(timezone.utc)
+            months = []
+            cursor = datetime(end.year, end.month, 1, tzinfo=timezone.utc)
+            while cursor >= datetime(from_date.year, from_date.month, 1, tzinfo=timezone.utc):
+                months.append(cursor.strftime('%Y-%m'))
+                cursor = (cursor - timedelta(days=1)).replace(day=1)
+            snapshots = self.db.get_all([self._mood_bucket_ref(uid, month) for month in months])
+            # get_all doesn't preserve request order
+            buckets = sorted((doc.to_dict() for doc in snapshots if doc.exists),
+                             key=lambda bucket: bucket['month'], reverse=True)
+        else:
+            query = (self.db.collection('mood_log_buckets')
+                     .where(filter=FieldFilter('user_id', '==', uid))
+                     .order_by('month', direction=firestore.Query.DESCENDING))
+            if upper:
+                query = query.where(filter=FieldFilter('month', '<=', upper.strftime('%Y-%m')))
+            # Already month-ordered: consume lazily so the loop below can stop reading early
+            buckets = (doc.to_dict() for doc in query.stream())
+        
+        results = []
+        for bucket in buckets:
+            for i in range(len(bucket.get('ids', []))):
+                timestamp = bucket['timestamps'][i]
+                log_id = f"{bucket['month']}:{bucket['ids'][i]}"
+                if from_date and timestamp < from_date:
+                    continue
+                if to_date and timestamp > to_date:
+                    continue
+                if start_after and (timestamp, log_id) >= (start_after['timestamp'], start_after['id']):
+                    continue
+                results.append({
+                    'id': log_id,
+                    'user_id': uid,
+                    'mood': MOOD_CODES[bucket['moods'][i]],
+                    'energy': bucket['energy'][i],
+                    'stress': bucket['stress'][i],
+                    'note': bucket['notes'][i],
+                    'timestamp': timestamp
+                })
+            # Buckets are month-ordered, so once a full page is collected older buckets can't matter
+            if limit and len(results) >= limit:
+                break
+        
+        results.sort(key=lambda log: (log['timestamp'], log['id']), reverse=True)
+        return results[:limit] if limit else results
+    
+    def _user_timeline_query(self, collection: str, uid: str, from_date: datetime = None,
+                             to_date: datetime = None, limit: int = None,
+                             start_after: Optional[Dict[str, Any]] = None):
+        """Build a newest-first query over a user's timestamped documents.
+
+        Ordering ties on timestamp are broken by document ID so that a
+        ``start_after`` cursor of ``{'timestamp': ..., 'id': ...}`` resumes
+        exactly after the last document of the previous page.
+        """
+        collection_ref = self.db.collection(collection)
+        query = collection_ref.where(filter=FieldFilter('user_id', '==', uid))
+        
+        if from_date:
+            query = query.where(filter=FieldFilter('timestamp', '>=', from_date))
+        if to_date:
+            query = query.where(filter=FieldFilter('timestamp', '<=', to_date))
+        
+        query = (query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+                 .order_by(firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING))
+        
+        if start_after:
+            query = query.start_after({
+                'timestamp': start_after['timestamp'],
+                firestore.FieldPath.document_id(): collection_ref.document(start_after['id'])
+            })
+        if limit:
+            query = query.limit(limit)
+        return query
+    
+    def get_mood_logs(self, uid: str, from_date: datetime = None, to_date: datetime = None,
+                      limit: int = None, start_after: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get mood logs for user within date range, newest first"""
+        # Date-only bounds parse as naive; stored timestamps are UTC-aware
+        if from_date and from_date.tzinfo is None:
+            from_date = from_date.replace(tzinfo=timezone.utc)
+        if to_date and to_date.tzinfo is None:
+            to_date = to_date.replace(tzinfo=timezone.utc)
+        try:
+            if Config.MOOD_LOG_STORAGE == 'buckets':
+                return self._get_bucketed_mood_logs(uid, from_date, to_date, limit, start_after)
+            
+            query = self._user_timeline_query('mood_logs', uid, from_date, to_date, limit, start_after)
             
             docs = query.stream()
             results = []
@@ -87,20 +343,33 @@ class FirestoreService:
             journal_ref = self.db.collection('journal_entries').document()
             journal_data['user_id'] = uid
             journal_data['timestamp'] = datetime.now(timezone.utc)
-            journal_ref.set(journal_data)
+            
+            # Write the entry and its daily rollup together
+            categories = (journal_data.get('ai_insight') or {}).get('categories', [])
+            batch = self.db.batch()
+            batch.set(journal_ref, journal_data)
+            self._add_rollup_write(batch, uid, journal_data['timestamp'].date().isoformat(),
+                                   {'journal_entries': 1},
+                                   nested={'category_counts': {c: 1 for c in categories}})
+            batch.commit()
             logger.info(f"Journal entry saved for user {uid}")
             return journal_ref.id
         except Exception as e:
             logger.error(f"Failed to save journal entry for user {uid}: {e}")
             raise
     
-    def get_journal_entries(self, uid: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get recent journal entries for user"""
+    def get_journal_entries(self, uid: str, limit: int = 10, start_after: Optional[Dict[str, Any]] = None,
+                            from_date: datetime = None, to_date: datetime = None,
+                            fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get recent journal entries for user, newest first.
+
+        ``fields`` projects the returned documents server-side (timestamp is
+        always included so results can be paginated).
+        """
         try:
-            query = (self.db.collection('journal_entries')
-                    .where(filter=FieldFilter('user_id', '==', uid))
-                    .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                    .limit(limit))
+            query = self._user_timeline_query('journal_entries', uid, from_date, to_date, limit, start_after)
+            if fields:
+                query = query.select(sorted(set(fields) | {'timestamp'}))
             
             docs = query.stream()
             results = []
@@ -114,6 +383,67 @@ class FirestoreService:
             logger.error(f"Failed to get journal entries for user {uid}: {e}")
             return []
     
+    def save_journal_insight(self, uid: str, entry_id: str, ai_insight: Dict[str, Any], timestamp: datetime) -> bool:
+        """Attach a completed AI insight to a journal entry and count its categories in the daily rollup"""
+        try:
+            batch = self.db.batch()
+            batch.update(self.db.collection('journal_entries').document(entry_id), {
+                'ai_insight': ai_insight,
+                'analysis_status': 'complete',
+                'analyzed_at': datetime.now(timezone.utc)
+            })
+            categories = ai_insight.get('categories', [])
+            if categories:
+                self._add_rollup_write(batch, uid, timestamp.date().isoformat(), {},
+                                       nested={'category_counts': {c: 1 for c in categories}})
+            batch.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save insight for journal entry {entry_id}: {e}")
+            raise
+    
+    def mark_journal_analysis_failed(self, entry_id: str) -> bool:
+        """Record that background analysis of a journal entry failed"""
+        try:
+            self.db.collection('journal_entries').document(entry_id).update({'analysis_status': 'failed'})
+            return True
+        except Exception as e:
+            logger.error(f"Failed to mark analysis failure for journal entry {entry_id}: {e}")
+            return False
+    
+    def get_pending_journal_entries(self, older_than: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get journal entries whose analysis never completed (e.g. the worker process died)"""
+        try:
+            query = (self.db.collection('journal_entries')
+                     .where(filter=FieldFilter('analysis_status', 'in', ['pending', 'failed']))
+                     .where(filter=FieldFilter('timestamp', '<', older_than))
+                     .limit(limit))
+            results = []
+            for doc in query.stream():
+                data = doc.to_dict()
+                data['id'] = doc.id
+                results.append(data)
+            return results
+        except Exception as e:
+            logger.error(f"Failed to get pending journal entries: {e}")
+            return []
+    
+    def get_journal_entry(self, uid: str, entry_id: str) -> Optional[Dict[str, Any]]:
+        """Get a single journal entry, only if it belongs to the user"""
+        try:
+            doc = self.db.collection('journal_entries').document(entry_id).get()
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            if data.get('user_id') != uid:
+                logger.warning(f"User {uid} requested journal entry {entry_id} owned by another user")
+                return None
+            data['id'] = doc.id
+            return data
+        except Exception as e:
+            logger.error(f"Failed to get journal entry {entry_id} for user {uid}: {e}")
+            return None
+    
     # Daily plan operations
     def save_daily_plan(self, uid: str, date: str, plan_data: Dict[str, Any]) -> bool:
         """Save daily plan for user"""
@@ -123,24 +453,314 @@ class FirestoreService:
             plan_data['date'] = date
             plan_data['created_at'] = datetime.now(timezone.utc)
             plan_ref.set(plan_data, merge=True)
+            self._memo_merge('daily_plans', f"{uid}_{date}", plan_data)
             logger.info(f"Daily plan saved for user {uid} on {date}")
             return True
         except Exception as e:
             logger.error(f"Failed to save daily plan for user {uid}: {e}")
             return False
     
-    def get_daily_plan(self, uid: str, date: str) -> Optional[Dict[str, Any]]:
-        """Get daily plan for user and date"""
+    def get_daily_plan(self, uid: str, date: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Get daily plan for user and date (``fresh`` skips the request memo)"""
+        cached = _MISSING if fresh else self._memo_get('daily_plans', f"{uid}_{date}")
+        if cached is not _MISSING:
+            return cached
         try:
             plan_ref = self.db.collection('daily_plans').document(f"{uid}_{date}")
             doc = plan_ref.get()
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            plan = doc.to_dict() if doc.exists else None
+            self._memo_set('daily_plans', f"{uid}_{date}", plan)
+            return plan
         except Exception as e:
             logger.error(f"Failed to get daily plan for user {uid}: {e}")
             return None
     
+    def get_daily_plans(self, uid: str, dates: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get daily plans for several dates in one batched read, keyed by date"""
+        try:
+            plans = {}
+            date_by_id = {}
+            for date in dates:
+                cached = self._memo_get('daily_plans', f"{uid}_{date}")
+                if cached is _MISSING:
+                    date_by_id[f"{uid}_{date}"] = date
+                elif cached is not None:
+                    plans[date] = cached
+            
+            if date_by_id:
+                refs = [self.db.collection('daily_plans').document(doc_id) for doc_id in date_by_id]
+                for doc in self.db.get_all(refs):
+                    plan = doc.to_dict() if doc.exists else None
+                    self._memo_set('daily_plans', doc.id, plan)
+                    if plan is not None:
+                        plans[date_by_id[doc.id]] = plan
+            return plans
+        except Exception as e:
+            logger.error(f"Failed to get daily plans for user {uid}: {e}")
+            return {}
+    
+    # Batch job reads
+    def get_documents(self, collection: str, doc_ids: List[str], chunk_size: int = 300) -> Dict[str, Dict[str, Any]]:
+        """Fetch many documents by ID with batched reads, keyed by document ID (missing ones omitted)"""
+        results = {}
+        for start in range(0, len(doc_ids), chunk_size):
+            refs = [self.db.collection(collection).document(doc_id) for doc_id in doc_ids[start:start + chunk_size]]
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    results[doc.id] = doc.to_dict()
+        return results
+    
+    def get_active_user_ids(self, since_date: str) -> List[str]:
+        """Return users with any daily rollup (mood log, journal or task) on or after since_date"""
+        query = (self.db.collection('user_daily_rollups')
+                 .where(filter=FieldFilter('date', '>=', since_date))
+                 .select(['user_id']))
+        return sorted({doc.get('user_id') for doc in query.stream() if doc.get('user_id')})
+    
+    def get_recent_docs_for_users(self, collection: str, uids: List[str], since: datetime,
+                                  fields: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetch timestamped documents for many users with one ``in`` query per 30 users.
+
+        Returns newest-first lists keyed by user ID. Mood logs in bucket
+        storage are read per user since they don't live in ``mood_logs``.
+        """
+        results = {uid: [] for uid in uids}
+        if collection == 'mood_logs' and Config.MOOD_LOG_STORAGE == 'buckets':
+            for uid in uids:
+                results[uid] = self._get_bucketed_mood_logs(uid, since)
+            return results
+        
+        for start in range(0, len(uids), 30):
+            query = (self.db.collection(collection)
+                     .where(filter=FieldFilter('user_id', 'in', uids[start:start + 30]))
+                     .where(filter=FieldFilter('timestamp', '>=', since)))
+            if fields:
+                query = query.select(sorted(set(fields) | {'user_id', 'timestamp'}))
+            for doc in query.stream():
+                data = doc.to_dict()
+                data['id'] = doc.id
+                results.setdefault(data['user_id'], []).append(data)
+        
+        for docs in results.values():
+            docs.sort(key=lambda doc: doc['timestamp'], reverse=True)
+        return results
+    
+    # Daily rollup operations
+    def _rollup_update(self, uid: str, date: str, increments: Dict[str, float],
+                       nested: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Any]:
+        """Build a merge update that increments rollup counters server-side"""
+        update = {
+            'user_id': uid,
+            'date': date,
+            'updated_at': datetime.now(timezone.utc)
+        }
+        for field, amount in increments.items():
+            update[field] = firestore.Increment(amount)
+        for field, counts in (nested or {}).items():
+            if counts:
+                update[field] = {key: firestore.Increment(amount) for key, amount in counts.items()}
+        return update
+    
+    def _add_rollup_write(self, batch, uid: str, date: str, increments: Dict[str, float],
+                          nested: Optional[Dict[str, Dict[str, float]]] = None):
+        rollup_ref = self.db.collection('user_daily_rollups').document(f"{uid}_{date}")
+        batch.set(rollup_ref, self._rollup_update(uid, date, increments, nested), merge=True)
+    
+    def increment_daily_rollup(self, uid: str, date: str, increments: Dict[str, float],
+                               nested: Optional[Dict[str, Dict[str, float]]] = None) -> bool:
+        """Atomically increment counters on a user's daily rollup document"""
+        try:
+            rollup_ref = self.db.collection('user_daily_rollups').document(f"{uid}_{date}")
+            rollup_ref.set(self._rollup_update(uid, date, increments, nested), merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to update daily rollup for user {uid} on {date}: {e}")
+            return False
+    
+    def get_daily_rollups(self, uid: str, dates: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get daily rollups for several dates in one batched read, keyed by date"""
+        try:
+            date_by_id = {f"{uid}_{date}": date for date in dates}
+            refs = [self.db.collection('user_daily_rollups').document(doc_id) for doc_id in date_by_id]
+            rollups = {}
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    rollups[date_by_id[doc.id]] = doc.to_dict()
+            return rollups
+        except Exception as e:
+            logger.error(f"Failed to get daily rollups for user {uid}: {e}")
+            return {}
+    
+    def replace_daily_rollup(self, uid: str, date: str, rollup: Dict[str, Any]) -> bool:
+        """Overwrite a daily rollup document (used when rebuilding from raw data)"""
+        try:
+            rollup_ref = self.db.collection('user_daily_rollups').document(f"{uid}_{date}")
+            rollup_ref.set({**rollup, 'user_id': uid, 'date': date, 'updated_at': datetime.now(timezone.utc)})
+            return True
+        except Exception as e:
+            logger.error(f"Failed to replace daily rollup for user {uid} on {date}: {e}")
+            return False
+    
+    # Conversation operations
+    def save_conversation_turn(self, uid: str, conversation_id: str, turn_data: Dict[str, Any]) -> str:
+        """Save a chat turn and bump the conversation's turn count in one batch"""
+        try:
+            turn_ref = self.db.collection('conversations').document()
+            batch = self.db.batch()
+            batch.set(turn_ref, {**turn_data, 'conversation_id': conversation_id, 'user_id': uid})
+            batch.set(self.db.collection('chat_conversations').document(conversation_id), {
+                'user_id': uid,
+                'turn_count': firestore.Increment(1),
+                'updated_at': turn_data['timestamp']
+            }, merge=True)
+            batch.commit()
+            return turn_ref.id
+        except Exception as e:
+            logger.error(f"Failed to save conversation turn for user {uid}: {e}")
+            raise
+    
+    def get_conversation(self, uid: str, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Get a conversation's summary state, or None if it has none yet.
+
+        Raises PermissionError if the conversation belongs to another user.
+        Read errors propagate so callers don't mistake them for a new conversation.
+        """
+        try:
+            doc = self.db.collection('chat_conversations').document(conversation_id).get()
+        except Exception as e:
+            logger.error(f"Failed to get conversation {conversation_id}: {e}")
+            raise
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        if data.get('user_id') != uid:
+            raise PermissionError(f"Conversation {conversation_id} belongs to another user")
+        return data
+    
+    def get_conversation_turns(self, uid: str, conversation_id: str, after: datetime = None,
+                               limit: int = None, newest: bool = False) -> List[Dict[str, Any]]:
+        """Get turns of a conversation in chronological order.
+
+        ``after`` skips turns up to that timestamp; ``newest`` returns the last
+        ``limit`` turns instead of the first.
+        """
+        try:
+            query = (self.db.collection('conversations')
+                     .where(filter=FieldFilter('conversation_id', '==', conversation_id))
+                     .where(filter=FieldFilter('user_id', '==', uid)))
+            if after:
+                query = query.where(filter=FieldFilter('timestamp', '>', after))
+            direction = firestore.Query.DESCENDING if newest else firestore.Query.ASCENDING
+            query = query.order_by('timestamp', direction=direction)
+            if limit:
+                query = query.limit(limit)
+            
+            turns = [doc.to_dict() for doc in query.stream()]
+            if newest:
+                turns.reverse()
+            return turns
+        except Exception as e:
+            logger.error(f"Failed to get turns for conversation {conversation_id}: {e}")
+            raise
+    
+    def save_conversation_summary(self, conversation_id: str, summary: str, summarized_turns: int,
+                                  summarized_until: datetime) -> bool:
+        """Store the rolling summary covering a conversation's turns up to summarized_until"""
+        try:
+            self.db.collection('chat_conversations').document(conversation_id).set({
+                'summary': summary,
+                'summarized_turns': summarized_turns,
+                'summarized_until': summarized_until,
+                'summary_updated_at': datetime.now(timezone.utc)
+            }, merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save summary for conversation {conversation_id}: {e}")
+            return False
+    
+    # Lease operations (cross-instance mutual exclusion)
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the named lease if it is free or expired; returns False if someone else holds it"""
+        lease_ref = self.db.collection('leases').document(name)
+        now = datetime.now(timezone.utc)
+        lease = {'owner': owner, 'acquired_at': now, 'expires_at': now + timedelta(seconds=ttl_seconds)}
+        try:
+            lease_ref.create(lease)
+            return True
+        except AlreadyExists:
+            pass
+        
+        # Existing lease: take it over only if its holder let it expire
+        @firestore.transactional
+        def take_over(transaction):
+            snapshot = lease_ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.get('expires_at') > now:
+                return False
+            transaction.set(lease_ref, lease)
+            return True
+        
+        try:
+            return take_over(self.db.transaction())
+        except Exception as e:
+            logger.error(f"Failed to acquire lease {name}: {e}")
+            return False
+    
+    def release_lease(self, name: str, owner: str) -> bool:
+        """Release a lease held by owner"""
+        lease_ref = self.db.collection('leases').document(name)
+        
+        @firestore.transactional
+        def release(transaction):
+            snapshot = lease_ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.get('owner') == owner:
+                transaction.delete(lease_ref)
+                return True
+            return False
+        
+        try:
+            return release(self.db.transaction())
+        except Exception as e:
+            logger.error(f"Failed to release lease {name}: {e}")
+            return False
+    
+    # Analysis cache operations
+    def get_cached_analysis(self, key: str, ttl_seconds: float) -> Optional[Dict[str, Any]]:
+        """Get an unexpired cache entry ({'result', 'expires_at'}) by content hash"""
+        try:
+            doc = self.db.collection('journal_analysis_cache').document(key).get()
+            if not doc.exists:
+                return None
+            entry = doc.to_dict()
+            # Entries written before expires_at existed expire ttl_seconds after creation
+            expires_at = entry.get('expires_at') or entry['created_at'] + timedelta(seconds=ttl_seconds)
+            if expires_at <= datetime.now(timezone.utc):
+                return None
+            return {'result': entry.get('result'), 'expires_at': expires_at}
+        except Exception as e:
+            logger.error(f"Failed to read analysis cache entry {key}: {e}")
+            return None
+    
+    def save_cached_analysis(self, key: str, result: Dict[str, Any], model_name: str, prompt_version: str,
+                             ttl_seconds: float) -> bool:
+        """Store a journal analysis result by content hash.
+
+        expires_at is checked on read and can also back a Firestore TTL
+        policy on the collection so expired entries get deleted.
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            self.db.collection('journal_analysis_cache').document(key).set({
+                'result': result,
+                'model': model_name,
+                'prompt_version': prompt_version,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=ttl_seconds)
+            })
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write analysis cache entry {key}: {e}")
+            return False
+    
     # Gamification operations
     def update_user_stats(self, uid: str, stats_update: Dict[str, Any]) -> bool:
         """Update user gamification stats"""
@@ -148,28 +768,65 @@ class FirestoreService:
             stats_ref = self.db.collection('user_stats').document(uid)
             stats_update['updated_at'] = datetime.now(timezone.utc)
             stats_ref.set(stats_update, merge=True)
+            self._memo_merge('user_stats', uid, stats_update)
             logger.info(f"User stats updated for {uid}")
             return True
         except Exception as e:
             logger.error(f"Failed to update user stats for {uid}: {e}")
             return False
     
+    def increment_user_stats(self, uid: str, increments: Dict[str, float],
+                             fields: Optional[Dict[str, Any]] = None,
+                             append: Optional[Dict[str, List[Any]]] = None) -> bool:
+        """Atomically increment counters and append to arrays on user stats in a single write"""
+        try:
+            stats_ref = self.db.collection('user_stats').document(uid)
+            stats_update = dict(fields or {})
+            for field, amount in increments.items():
+                stats_update[field] = firestore.Increment(amount)
+            for field, values in (append or {}).items():
+                stats_update[field] = firestore.ArrayUnion(values)
+            stats_update['updated_at'] = datetime.now(timezone.utc)
+            stats_ref.set(stats_update, merge=True)
+            
+            # Mirror the server-side transforms in the request memo
+            cached = self._memo_get('user_stats', uid)
+            if cached is not _MISSING:
+                local = dict(fields or {}, updated_at=stats_update['updated_at'])
+                for field, amount in increments.items():
+                    local[field] = (cached or {}).get(field, 0) + amount
+                for field, values in (append or {}).items():
+                    existing = list((cached or {}).get(field, []))
+                    local[field] = existing + [v for v in values if v not in existing]
+                self._memo_merge('user_stats', uid, local)
+            logger.info(f"User stats incremented for {uid}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to increment user stats for {uid}: {e}")
+            return False
+    
     def get_user_stats(self, uid: str) -> Optional[Dict[str, Any]]:
         """Get user gamification stats"""
+        cached = self._memo_get('user_stats', uid)
+        if cached is not _MISSING:
+            return cached
         try:
             stats_ref = self.db.collection('user_stats').document(uid)
             doc = stats_ref.get()
             if doc.exists:
-                return doc.to_dict()
-            return {
-                'points': 0,
-                'streak_days': 0,
-                'completed_tasks': 0,
-                'badges': [],
-                'level': 1
-            }
+                stats = doc.to_dict()
+            else:
+                stats = {
+                    'points': 0,
+                    'streak_days': 0,
+                    'completed_tasks': 0,
+                    'badges': [],
+                    'level': 1
+                }
+            self._memo_set('user_stats', uid, stats)
+            return stats
         except Exception as e:
             logger.error(f"Failed to get user stats for {uid}: {e}")
             return None
 
-firestore_service = FirestoreService()
+firestore_service = registry.register('firestore', FirestoreService)
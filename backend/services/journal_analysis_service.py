@@ -0,0 +1,95 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JournalAnalysisService:
+    """Runs journal analysis off the request thread on a bounded worker pool"""
+    
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="journal-analysis"
+                    )
+        return self._executor
+    
+    def submit(self, uid: str, entry_id: str, text: str, timestamp: datetime) -> bool:
+        """Queue an entry for analysis; returns False when the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.warning(f"Journal analysis queue full ({self._pending} pending)")
+                return False
+            self._pending += 1
+        
+        self._get_executor().submit(self._analyze, uid, entry_id, text, timestamp)
+        return True
+    
+    def _analyze(self, uid: str, entry_id: str, text: str, timestamp: datetime):
+        from services.ai_service import ai_service
+        from services.firestore_service import firestore_service
+        from services.analytics_spool import analytics_sink
+        
+        try:
+            ai_insight = ai_service.analyze_journal(text)
+            firestore_service.save_journal_insight(uid, entry_id, ai_insight, timestamp)
+            analytics_sink.stream_journal_insight({
+                'user_id': uid,
+                'ai_insight': ai_insight,
+                'timestamp': timestamp
+            })
+            self.completed += 1
+            logger.info(f"Background analysis completed for journal entry {entry_id}")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Background analysis failed for journal entry {entry_id}: {e}")
+            firestore_service.mark_journal_analysis_failed(entry_id)
+        finally:
+            with self._lock:
+                self._pending -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and outcome counters"""
+        return {
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'workers': self.max_workers,
+            'completed': self.completed,
+            'failed': self.failed
+        }
+    
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and optionally wait for in-flight analyses"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+    
+    def reset_after_fork(self):
+        """Drop the parent's pool and counters; its threads don't exist in a forked child"""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+journal_analysis_service = JournalAnalysisService(
+    max_workers=Config.JOURNAL_ANALYSIS_WORKERS,
+    max_pending=Config.JOURNAL_ANALYSIS_MAX_PENDING
+)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=journal_analysis_service.reset_after_fork)
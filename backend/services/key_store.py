@@ -0,0 +1,156 @@
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from google.auth import jwt
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+class SigningKeyStore:
+    """In-memory store of Firebase signing certificates with background refresh.
+
+    Tokens are verified against the certificates held in memory, so the
+    request path never touches the network. A daemon thread re-fetches the
+    certificates ahead of their Cache-Control expiry. Tokens signed with a
+    key the store doesn't hold (e.g. before the first load succeeds) are
+    passed to ``fallback`` if one is given.
+    """
+
+    def __init__(self, project_id: str, certs_url: str = None, certs_file: str = None,
+                 refresh_margin_seconds: int = 300, min_refresh_seconds: int = 60,
+                 fallback: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self.project_id = project_id
+        self.certs_url = certs_url
+        self.certs_file = certs_file
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.fallback = fallback
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.fallback_verifications = 0
+
+    def load(self) -> bool:
+        """Load certificates from the fixture file or the certificate endpoint"""
+        try:
+            if self.certs_file:
+                with open(self.certs_file) as f:
+                    certs = json.load(f)
+                # Fixture keys do not rotate; keep them until the next explicit reload
+                max_age = 24 * 3600
+            else:
+                response = requests.get(self.certs_url, timeout=10)
+                response.raise_for_status()
+                certs = response.json()
+                max_age = self._parse_max_age(response.headers.get('Cache-Control', ''))
+
+            with self._lock:
+                self._certs = certs
+                self._expires_at = time.time() + max_age
+            self.refresh_count += 1
+            logger.info(f"Loaded {len(certs)} signing keys, valid for {max_age}s")
+            return True
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.error(f"Failed to load signing keys: {e}")
+            return False
+
+    def start(self):
+        """Load keys once and start the background refresh thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        if not self._certs:
+            self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="signing-key-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        self._refresh_requested.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            # Refresh ahead of expiry; after a failed load this falls back to min_refresh_seconds
+            delay = max(self.min_refresh_seconds,
+                        self._expires_at - time.time() - self.refresh_margin_seconds)
+            self._refresh_requested.wait(timeout=delay)
+            self._refresh_requested.clear()
+            if self._stop.is_set():
+                break
+            self.load()
+
+    def request_refresh(self):
+        """Ask the background thread to refresh keys without blocking the caller"""
+        self._refresh_requested.set()
+
+    def verify(self, id_token: str) -> Dict[str, Any]:
+        """Verify an RS256 Firebase ID token locally and return its claims"""
+        header = jwt.decode_header(id_token)
+        if header.get('alg') != 'RS256':
+            raise ValueError("ID token must be signed with RS256")
+
+        kid = header.get('kid')
+        with self._lock:
+            cert = self._certs.get(kid)
+        if cert is None:
+            # Unknown kid usually means keys rotated before our refresh; fetch off-thread
+            self.request_refresh()
+            if self.fallback:
+                self.fallback_verifications += 1
+                return self.fallback(id_token)
+            raise ValueError(f"No signing key found for kid {kid}")
+
+        claims = jwt.decode(id_token, certs={kid: cert}, audience=self.project_id)
+
+        if claims.get('iss') != f"{FIREBASE_ISSUER_PREFIX}{self.project_id}":
+            raise ValueError("ID token has incorrect issuer")
+        if not claims.get('sub') or len(claims['sub']) > 128:
+            raise ValueError("ID token has invalid subject")
+        if claims.get('auth_time', 0) > time.time() + 60:
+            raise ValueError("ID token auth_time is in the future")
+
+        claims['uid'] = claims['sub']
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        """Return key store state for monitoring"""
+        return {
+            'keys': len(self._certs),
+            'expires_in_seconds': max(0, int(self._expires_at - time.time())),
+            'refresh_count': self.refresh_count,
+            'refresh_failures': self.refresh_failures,
+            'fallback_verifications': self.fallback_verifications
+        }
+
+    @staticmethod
+    def _parse_max_age(cache_control: str) -> int:
+        match = re.search(r'max-age=(\d+)', cache_control)
+        return int(match.group(1)) if match else 3600
+
+
+def create_key_store(fallback: Optional[Callable[[str], Dict[str, Any]]] = None) -> SigningKeyStore:
+    """Build a key store from application config"""
+    return SigningKeyStore(
+        project_id=Config.FIREBASE_PROJECT_ID,
+        certs_url=Config.FIREBASE_CERTS_URL,
+        certs_file=Config.FIREBASE_CERTS_FILE,
+        refresh_margin_seconds=Config.FIREBASE_CERTS_REFRESH_MARGIN_SECONDS,
+        fallback=fallback
+    )
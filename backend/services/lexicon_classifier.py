@@ -0,0 +1,151 @@
+import re
+from typing import Any, Dict, List, Pattern
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Phrases are matched on word boundaries against the lowercased entry
+MOOD_LEXICON = {
+    "anxious": ["anxious", "anxiety", "nervous", "worried", "worry", "worrying", "panic", "panicking",
+                "scared", "afraid", "fear", "dread", "on edge", "overthinking", "uneasy", "restless"],
+    "stressed": ["stress", "stressed", "stressful", "overwhelmed", "pressure", "too much", "swamped",
+                 "deadline", "deadlines", "burned out", "burnt out", "frustrated", "tense", "behind on",
+                 "guilty", "drained"],
+    "sad": ["sad", "cry", "cried", "crying", "tears", "lonely", "upset", "down", "miss", "missing",
+            "heartbroken", "unhappy", "depressed", "hurt", "disappointed", "alone", "isolated",
+            "hopeless", "worthless", "numb"],
+    "happy": ["happy", "glad", "grateful", "thankful", "excited", "proud", "relieved", "joy", "calm",
+              "peaceful", "fun", "smiled", "laughed", "awesome", "amazing", "great day", "good day",
+              "enjoyed", "motivated", "productive"],
+}
+
+CATEGORY_LEXICON = {
+    "exam_anxiety": ["exam", "exams", "test", "tests", "finals", "midterm", "midterms", "quiz", "grade",
+                     "grades", "marks", "studying", "revision", "boards", "entrance", "results"],
+    "procrastination": ["procrastinate", "procrastinating", "procrastination", "put off", "putting off",
+                        "keep delaying", "kept delaying", "haven't started", "havent started", "wasted",
+                        "scrolling", "distracted", "last minute", "avoiding", "kept avoiding"],
+    "sleep": ["sleep", "slept", "sleeping", "insomnia", "awake", "nightmare", "nightmares", "nap",
+              "all night", "3am", "2am", "4am", "can't fall asleep", "woke up"],
+    "loneliness": ["lonely", "loneliness", "alone", "no friends", "isolated", "left out", "nobody",
+                   "ignored", "no one", "miss my friends", "by myself", "don't belong"],
+    "burnout": ["burnout", "burned out", "burnt out", "drained", "exhausted", "no energy", "running on empty",
+                "can't keep up", "unmotivated", "worn out", "nothing left", "so tired"],
+}
+
+RISK_LEXICON = {
+    "high": ["kill myself", "end my life", "suicide", "suicidal", "want to die", "wanna die", "self harm",
+             "self-harm", "hurt myself", "cutting myself", "better off dead", "no reason to live",
+             "end it all", "don't want to be here", "dont want to be here"],
+    "moderate": ["hopeless", "worthless", "can't go on", "cannot go on", "give up on everything",
+                 "nothing matters", "hate myself", "can't cope", "cannot cope", "no way out", "numb",
+                 "can't do this anymore", "everyone would be better"],
+}
+
+# Mood implied by a category when the entry has no explicit mood words
+CATEGORY_MOODS = {
+    "exam_anxiety": "anxious",
+    "procrastination": "stressed",
+    "loneliness": "sad",
+    "burnout": "stressed",
+}
+
+# A mood keyword preceded by one of these within a few words is ignored ("not happy")
+NEGATION_PATTERN = re.compile(r"\b(?:not|never|no|\w+n't)\W+(?:\w+\W+)?$")
+
+CATEGORY_RECOMMENDATIONS = {
+    "exam_anxiety": {"type": "study", "title": "25-minute focused study block with a 5-minute break", "duration_min": 30},
+    "procrastination": {"type": "study", "title": "Start with just 10 minutes on the smallest task", "duration_min": 10},
+    "sleep": {"type": "mindfulness", "title": "Screen-free wind-down before bed", "duration_min": 15},
+    "loneliness": {"type": "social", "title": "Send a message to someone you trust", "duration_min": 10},
+    "burnout": {"type": "activity", "title": "Short walk outside without your phone", "duration_min": 15},
+}
+
+MOOD_RECOMMENDATIONS = {
+    "anxious": {"type": "breathing", "title": "4-7-8 breathing exercise", "duration_min": 5},
+    "stressed": {"type": "breathing", "title": "5-minute box breathing", "duration_min": 5},
+    "sad": {"type": "journaling", "title": "Write down three small things that went okay today", "duration_min": 10},
+    "happy": {"type": "journaling", "title": "Note what made today good so you can repeat it", "duration_min": 5},
+    "neutral": {"type": "breathing", "title": "5-minute deep breathing", "duration_min": 5},
+}
+
+MOOD_MESSAGES = {
+    "anxious": "It sounds like a lot is weighing on you right now. Those worries make sense, and you can take this one step at a time.",
+    "stressed": "You're carrying a lot at the moment. It's okay to slow down and focus on one thing at a time.",
+    "sad": "Thank you for sharing something this personal. What you're feeling is valid, and you don't have to carry it alone.",
+    "happy": "It's great to hear about the good parts of your day. Moments like these are worth holding on to.",
+    "neutral": "Thank you for sharing your thoughts. Remember that every feeling is valid.",
+}
+
+
+def _compile(phrases: List[str]) -> Pattern:
+    # Longest phrases first so "burned out" wins over "out"
+    alternation = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    return re.compile(rf"(?<![\w'])(?:{alternation})(?![\w'])")
+
+
+class LexiconClassifier:
+    """Keyword classifier that labels journal entries with mood, categories and risk in-process.
+
+    Used for an instant provisional insight while the model runs, to force
+    escalation to the strong model on risk keywords, and as the degraded
+    answer when the model is unavailable.
+    """
+
+    def __init__(self):
+        self._moods = [(mood, _compile(phrases)) for mood, phrases in MOOD_LEXICON.items()]
+        self._categories = [(category, _compile(phrases)) for category, phrases in CATEGORY_LEXICON.items()]
+        self._risks = [(risk, _compile(phrases)) for risk, phrases in RISK_LEXICON.items()]
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """Return a provisional insight in the same shape as the model's JournalInsight"""
+        lowered = text.lower().replace("’", "'")
+
+        risk = "low"
+        for level, pattern in self._risks:
+            if pattern.search(lowered):
+                risk = level
+                break
+
+        mood, mood_hits, total_mood_hits = "neutral", 0, 0
+        for label, pattern in self._moods:
+            hits = sum(1 for match in pattern.finditer(lowered)
+                       if not NEGATION_PATTERN.search(lowered, max(0, match.start() - 20), match.start()))
+            total_mood_hits += hits
+            # MOOD_LEXICON order breaks ties toward the more concerning mood
+            if hits > mood_hits:
+                mood, mood_hits = label, hits
+
+        category_hits = []
+        for label, pattern in self._categories:
+            hits = len(pattern.findall(lowered))
+            if hits:
+                category_hits.append((hits, label))
+        category_hits.sort(key=lambda item: -item[0])
+        categories = [label for _, label in category_hits] or ["general"]
+
+        if not mood_hits:
+            if risk != "low":
+                mood = "sad"
+            elif categories[0] in CATEGORY_MOODS:
+                mood = CATEGORY_MOODS[categories[0]]
+
+        # Share of mood evidence behind the winning label, capped well below model confidence
+        confidence = 0.3 if not mood_hits else round(min(0.65, 0.35 + 0.3 * mood_hits / total_mood_hits), 2)
+
+        recommendations = [dict(MOOD_RECOMMENDATIONS[mood], resource_url="")]
+        for label in categories[:2]:
+            if label in CATEGORY_RECOMMENDATIONS:
+                recommendations.append(dict(CATEGORY_RECOMMENDATIONS[label], resource_url=""))
+
+        return {
+            "mood": mood,
+            "categories": categories,
+            "confidence": confidence,
+            "recommendations": recommendations,
+            "risk": risk,
+            "message": MOOD_MESSAGES[mood],
+            "provisional": True
+        }
+
+lexicon_classifier = LexiconClassifier()
@@ -0,0 +1,142 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Optional
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RoutingRule:
+    """Model tiers and escalation thresholds for one call type"""
+    fast_model: str
+    strong_model: str
+    enabled: bool = True
+    min_confidence: float = 0.0
+    escalate_risks: FrozenSet[str] = field(default_factory=frozenset)
+    escalate_moods: FrozenSet[str] = field(default_factory=frozenset)
+    
+    @property
+    def route_id(self) -> str:
+        return f"{self.fast_model}>{self.strong_model}" if self.enabled else self.strong_model
+
+class ModelRouter:
+    """Sends calls to the fast model first and escalates to the strong model when a rule trips"""
+    
+    def __init__(self, rules: Dict[str, RoutingRule]):
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+    
+    def run(self, call_type: str, invoke: Callable[[str], dict],
+            should_escalate: Callable[[RoutingRule, dict], Optional[str]],
+            force_reason: Optional[str] = None) -> dict:
+        """Invoke the call on the fast tier, escalating to the strong tier if needed.
+
+        ``invoke`` takes a model name and returns the parsed result, raising on
+        validation failure. ``should_escalate`` returns an escalation reason or
+        None. Passing ``force_reason`` skips the fast tier and records that
+        reason. Exceptions from the strong tier propagate to the caller.
+        """
+        rule = self.rules[call_type]
+        
+        if rule.enabled and not force_reason and rule.fast_model != rule.strong_model:
+            started = time.perf_counter()
+            try:
+                result = invoke(rule.fast_model)
+                reason = should_escalate(rule, result)
+                self._record(call_type, 'fast', started, ok=True)
+            except Exception as e:
+                logger.warning(f"{call_type} fast tier failed: {e}")
+                self._record(call_type, 'fast', started, ok=False)
+                # Schema/parse problems raise ValueError (incl. pydantic); anything else is an outage
+                reason = 'validation_failed' if isinstance(e, ValueError) else 'fast_unavailable'
+            
+            if reason is None:
+                return result
+            self._record_escalation(call_type, reason)
+        elif force_reason:
+            self._record_escalation(call_type, force_reason)
+        
+        started = time.perf_counter()
+        try:
+            result = invoke(rule.strong_model)
+            self._record(call_type, 'strong', started, ok=True)
+            return result
+        except Exception:
+            self._record(call_type, 'strong', started, ok=False)
+            raise
+    
+    def pick(self, call_type: str, force_reason: Optional[str] = None) -> str:
+        """Choose a single model for calls whose output can't be checked before use (streaming).
+
+        The fast tier is used unless routing is off or ``force_reason`` is
+        given, in which case the strong tier is used and the reason recorded.
+        """
+        rule = self.rules[call_type]
+        if not rule.enabled:
+            return rule.strong_model
+        if force_reason:
+            self._record_escalation(call_type, force_reason)
+            return rule.strong_model
+        return rule.fast_model
+    
+    def _entry(self, call_type: str) -> Dict[str, Any]:
+        return self._stats.setdefault(call_type, {
+            'fast': {'calls': 0, 'errors': 0, 'latency_ms_total': 0.0},
+            'strong': {'calls': 0, 'errors': 0, 'latency_ms_total': 0.0},
+            'escalations': {}
+        })
+    
+    def _record(self, call_type: str, tier: str, started: float, ok: bool):
+        with self._lock:
+            tier_stats = self._entry(call_type)[tier]
+            tier_stats['calls'] += 1
+            tier_stats['latency_ms_total'] += (time.perf_counter() - started) * 1000
+            if not ok:
+                tier_stats['errors'] += 1
+    
+    def _record_escalation(self, call_type: str, reason: str):
+        with self._lock:
+            escalations = self._entry(call_type)['escalations']
+            escalations[reason] = escalations.get(reason, 0) + 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tier call counts, average latency and escalation reasons"""
+        with self._lock:
+            result = {}
+            for call_type, entry in self._stats.items():
+                result[call_type] = {'escalations': dict(entry['escalations'])}
+                for tier in ('fast', 'strong'):
+                    tier_stats = entry[tier]
+                    result[call_type][tier] = {
+                        'calls': tier_stats['calls'],
+                        'errors': tier_stats['errors'],
+                        'avg_latency_ms': round(tier_stats['latency_ms_total'] / tier_stats['calls'], 1)
+                        if tier_stats['calls'] else 0.0
+                    }
+                fast_calls = entry['fast']['calls']
+                result[call_type]['escalation_rate'] = (
+                    round(sum(entry['escalations'].values()) / fast_calls, 4) if fast_calls else 0.0
+                )
+            return result
+
+def _csv(value: str) -> FrozenSet[str]:
+    return frozenset(item.strip() for item in value.split(',') if item.strip())
+
+model_router = ModelRouter({
+    'journal': RoutingRule(
+        fast_model=Config.JOURNAL_FAST_MODEL,
+        strong_model=Config.JOURNAL_STRONG_MODEL,
+        enabled=Config.MODEL_ROUTING_ENABLED,
+        min_confidence=Config.JOURNAL_MIN_CONFIDENCE,
+        escalate_risks=_csv(Config.JOURNAL_ESCALATE_RISKS)
+    ),
+    'chat': RoutingRule(
+        fast_model=Config.CHAT_FAST_MODEL,
+        strong_model=Config.CHAT_STRONG_MODEL,
+        enabled=Config.MODEL_ROUTING_ENABLED,
+        escalate_moods=_csv(Config.CHAT_ESCALATE_MOODS)
+    )
+})
@@ -0,0 +1,271 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional
+from config import Config
+from utils.helpers import get_current_utc_time, get_date_range
+from utils.concurrency import parallel
+from utils.singleflight import SingleFlight
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Guards against two scheduler processes running the same day's batch; released when the run ends
+SCHEDULED_RUN_LEASE_SECONDS = 6 * 3600
+
+class PlanService:
+    """Builds daily plans, on demand for one user or ahead of time for all active users"""
+    
+    def __init__(self):
+        self._stop = threading.Event()
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._inflight = SingleFlight('daily_plan')
+        self.lease_waits = 0
+        self.lease_timeouts = 0
+    
+    @staticmethod
+    def build_user_data(recent_moods: List[dict], recent_journals: List[dict],
+                        user_stats: Optional[dict], user_profile: Optional[dict]) -> Dict[str, Any]:
+        """Shape a user's recent activity into the input for generate_daily_recommendations"""
+        return {
+            'recent_moods': [
+                {
+                    'mood': log.get('mood'),
+                    'energy': log.get('energy'),
+                    'stress': log.get('stress'),
+                    'timestamp': log.get('timestamp').isoformat() if log.get('timestamp') else None
+                } for log in recent_moods[-7:]  # Last 7 mood logs
+            ],
+            'recent_insights': [
+                {
+                    'categories': entry.get('ai_insight', {}).get('categories', []),
+                    'mood': entry.get('ai_insight', {}).get('mood'),
+                    'risk': entry.get('ai_insight', {}).get('risk')
+                } for entry in recent_journals
+            ],
+            'preferences': (user_profile or {}).get('preferences', {}),
+            'stats': user_stats
+        }
+    
+    @staticmethod
+    def build_plan(date: str, recommendations: List[dict]) -> Dict[str, Any]:
+        """Turn AI recommendations into a daily plan document"""
+        tasks = []
+        for i, rec in enumerate(recommendations):
+            task = {
+                'id': str(uuid.uuid4()),
+                'title': rec.get('title', f'Activity {i+1}'),
+                'cta_type': rec.get('cta_type', 'activity'),
+                'estimated_minutes': rec.get('estimated_minutes', 10),
+                'description': rec.get('description', ''),
+                'type': rec.get('type', 'general'),
+                'status': 'pending'
+            }
+            tasks.append(task)
+        
+        return {
+            'date': date,
+            'tasks': tasks,
+            'generated_at': get_current_utc_time(),
+            'total_estimated_minutes': sum(task['estimated_minutes'] for task in tasks),
+            'completed_tasks': 0
+        }
+    
+    def generate_plan(self, uid: str, date: str) -> Dict[str, Any]:
+        """Generate and save a plan for one user from their recent data"""
+        from services.ai_service import ai_service
+        from services.firestore_service import firestore_service
+        
+        start_date, end_date = get_date_range(7)  # Last 7 days
+        recent_moods, recent_journals, user_stats, user_profile = parallel(
+            lambda: firestore_service.get_mood_logs(uid, start_date, end_date),
+            lambda: firestore_service.get_journal_entries(uid, 5, fields=['ai_insight']),  # Last 5 entries
+            lambda: firestore_service.get_user_stats(uid),
+            lambda: firestore_service.get_user(uid)
+        )
+        
+        user_data = self.build_user_data(recent_moods, recent_journals, user_stats, user_profile)
+        daily_plan = self.build_plan(date, ai_service.generate_daily_recommendations(user_data))
+        firestore_service.save_daily_plan(uid, date, daily_plan)
+        return daily_plan
+    
+    def get_or_generate_plan(self, uid: str, date: str) -> Dict[str, Any]:
+        """Generate a missing plan exactly once across concurrent requests, workers and instances.
+
+        Requests in this process coalesce on a single-flight key; across
+        processes a Firestore lease elects one generator and the others wait
+        for its plan to appear.
+        """
+        return self._inflight.do((uid, date), lambda: self._generate_under_lease(uid, date))
+    
+    def _generate_under_lease(self, uid: str, date: str) -> Dict[str, Any]:
+        from services.firestore_service import firestore_service
+        
+        lease_name = f"daily_plan_{uid}_{date}"
+        owner = uuid.uuid4().hex
+        give_up_at = time.monotonic() + Config.PLAN_LEASE_WAIT_SECONDS
+        waited = False
+        
+        while True:
+            if firestore_service.acquire_lease(lease_name, owner, Config.PLAN_LEASE_TTL_SECONDS):
+                try:
+                    # Another instance may have finished between our first read and the lease
+                    existing = firestore_service.get_daily_plan(uid, date, fresh=True)
+                    return existing or self.generate_plan(uid, date)
+                finally:
+                    firestore_service.release_lease(lease_name, owner)
+            
+            if not waited:
+                waited = True
+                self.lease_waits += 1
+            time.sleep(0.5)
+            plan = firestore_service.get_daily_plan(uid, date, fresh=True)
+            if plan:
+                return plan
+            if time.monotonic() >= give_up_at:
+                # Prefer a duplicate generation over failing the request
+                self.lease_timeouts += 1
+                logger.warning(f"Timed out waiting for plan lease {lease_name}; generating anyway")
+                return self.generate_plan(uid, date)
+    
+    def pregenerate_plans(self, date: Optional[str] = None, uids: Optional[List[str]] = None,
+                          active_days: int = 7, workers: int = 8, overwrite: bool = False) -> Dict[str, Any]:
+        """Generate plans for recently active users ahead of their first request.
+
+        Inputs are gathered with batched reads, generation runs on a bounded
+        pool, and a failure for one user is logged and counted without
+        stopping the batch. Users left without a plan fall back to lazy
+        generation in the planner route.
+        """
+        from services.ai_service import ai_service
+        from services.firestore_service import firestore_service
+        
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        date = date or now.date().isoformat()
+        since = now - timedelta(days=active_days)
+        
+        if uids is None:
+            uids = firestore_service.get_active_user_ids(since.date().isoformat())
+        candidates = len(uids)
+        
+        if not overwrite:
+            existing = firestore_service.get_documents('daily_plans', [f"{uid}_{date}" for uid in uids])
+            uids = [uid for uid in uids if f"{uid}_{date}" not in existing]
+        
+        report = {
+            'date': date,
+            'candidates': candidates,
+            'skipped_existing': candidates - len(uids),
+            'skipped_locked': 0,
+            'generated': 0,
+            'failed': 0,
+            'failed_uids': []
+        }
+        
+        if uids:
+            profiles, stats, moods, journals = parallel(
+                lambda: firestore_service.get_documents('users', uids),
+                lambda: firestore_service.get_documents('user_stats', uids),
+                lambda: firestore_service.get_recent_docs_for_users('mood_logs', uids, since),
+                lambda: firestore_service.get_recent_docs_for_users('journal_entries', uids, since,
+                                                                    fields=['ai_insight'])
+            )
+            
+            def generate(uid: str) -> bool:
+                lease_name = f"daily_plan_{uid}_{date}"
+                owner = uuid.uuid4().hex
+                if not firestore_service.acquire_lease(lease_name, owner, Config.PLAN_LEASE_TTL_SECONDS):
+                    return False  # A request or another batch worker is generating it
+                try:
+                    if not overwrite and firestore_service.get_daily_plan(uid, date, fresh=True):
+                        return False
+                    user_data = self.build_user_data(
+                        list(reversed(moods.get(uid, [])[:7])),
+                        journals.get(uid, [])[:5],
+                        stats.get(uid),
+                        profiles.get(uid)
+                    )
+                    recommendations = ai_service.generate_daily_recommendations(user_data, fallback=False)
+                    firestore_service.save_daily_plan(uid, date, self.build_plan(date, recommendations))
+                    return True
+                finally:
+                    firestore_service.release_lease(lease_name, owner)
+            
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-batch") as executor:
+                futures = {executor.submit(generate, uid): uid for uid in uids}
+                for future in as_completed(futures):
+                    uid = futures[future]
+                    try:
+                        if future.result():
+                            report['generated'] += 1
+                        else:
+                            report['skipped_locked'] += 1
+                    except Exception as e:
+                        report['failed'] += 1
+                        if len(report['failed_uids']) < 50:
+                            report['failed_uids'].append(uid)
+                        logger.error(f"Plan pre-generation failed for user {uid}: {e}")
+        
+        elapsed = time.perf_counter() - started
+        report['elapsed_seconds'] = round(elapsed, 2)
+        report['plans_per_second'] = round(report['generated'] / elapsed, 2) if elapsed else 0.0
+        self.last_run = report
+        logger.info(f"Plan pre-generation for {date}: {report['generated']} generated, "
+                    f"{report['failed']} failed, {report['skipped_existing']} already existed "
+                    f"in {report['elapsed_seconds']}s")
+        return report
+    
+    def run_scheduler(self, run_at: str):
+        """Run pregenerate_plans daily at run_at ("HH:MM", UTC); blocks until stop_scheduler.
+
+        Meant for one designated process (`flask run-plan-scheduler`), not
+        for the web workers.
+        """
+        hour, minute = (int(part) for part in run_at.split(':'))
+        self._stop.clear()
+        logger.info(f"Daily plan pre-generation scheduled for {run_at} UTC")
+        while not self._stop.is_set():
+            now = datetime.now(timezone.utc)
+            next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            if self._stop.wait(timeout=(next_run - now).total_seconds()):
+                break
+            self._run_scheduled()
+    
+    def stop_scheduler(self):
+        self._stop.set()
+    
+    def _run_scheduled(self):
+        from services.firestore_service import firestore_service
+        
+        lease_name = f"plan_pregeneration_{datetime.now(timezone.utc).date().isoformat()}"
+        owner = uuid.uuid4().hex
+        try:
+            if not firestore_service.acquire_lease(lease_name, owner, SCHEDULED_RUN_LEASE_SECONDS):
+                logger.warning(f"Plan pre-generation already running elsewhere ({lease_name})")
+                return
+        except Exception as e:
+            logger.error(f"Could not take plan pre-generation lease {lease_name}: {e}")
+            return
+        try:
+            self.pregenerate_plans(active_days=Config.PLAN_PREGENERATE_ACTIVE_DAYS,
+                                   workers=Config.PLAN_PREGENERATE_WORKERS)
+        except Exception as e:
+            logger.error(f"Scheduled plan pre-generation failed: {e}")
+        finally:
+            firestore_service.release_lease(lease_name, owner)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return the last pre-generation report and plan de-duplication counters"""
+        return {
+            'last_run': self.last_run,
+            'single_flight': self._inflight.stats(),
+            'lease_waits': self.lease_waits,
+            'lease_timeouts': self.lease_timeouts
+        }
+
+plan_service = PlanService()
@@ -0,0 +1,149 @@
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Only these user_stats fields are useful for planning; lists like badges grow without bound
+PLAN_STATS_FIELDS = ('level', 'points', 'streak_days', 'completed_tasks', 'journal_entries',
+                     'total_meditation_minutes', 'meditation_sessions')
+
+RISK_ORDER = {'low': 0, 'moderate': 1, 'high': 2}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, marking the cut"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+class PromptBuilder:
+    """Builds compact prompts that stay within a per-call-type token budget"""
+    
+    def __init__(self, budgets: Dict[str, int], turn_max_tokens: int = 150, summary_max_tokens: int = 250):
+        self.budgets = budgets
+        self.turn_max_tokens = turn_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+    
+    # Daily plan prompts
+    def _format_moods(self, recent_moods: List[dict]) -> List[str]:
+        lines = []
+        for log in recent_moods:
+            day = (log.get('timestamp') or '')[:10]
+            lines.append(f"{day} {log.get('mood')} energy={log.get('energy')} stress={log.get('stress')}")
+        return lines
+    
+    def _format_insights(self, recent_insights: List[dict]) -> str:
+        categories = Counter(c for insight in recent_insights for c in insight.get('categories') or [])
+        moods = Counter(insight.get('mood') for insight in recent_insights if insight.get('mood'))
+        risk = max((insight.get('risk') or 'low' for insight in recent_insights),
+                   key=lambda r: RISK_ORDER.get(r, 0), default='low')
+        parts = []
+        if categories:
+            parts.append("themes " + ", ".join(f"{c} x{n}" for c, n in categories.most_common(5)))
+        if moods:
+            parts.append("moods " + ", ".join(f"{m} x{n}" for m, n in moods.most_common(3)))
+        parts.append(f"highest risk {risk}")
+        return "; ".join(parts)
+    
+    def build_plan_prompt(self, user_data: Dict[str, Any]) -> str:
+        """Prompt for generate_daily_recommendations with only the fields the model needs"""
+        stats = user_data.get('stats') or {}
+        compact_stats = {field: stats[field] for field in PLAN_STATS_FIELDS if field in stats}
+        preferences = json.dumps(user_data.get('preferences') or {}, separators=(',', ':'), default=str)
+        mood_lines = self._format_moods(user_data.get('recent_moods') or [])
+        
+        def render(moods: List[str]) -> str:
+            return f"""
+            Based on this user's recent mental wellness data, suggest 3-5 personalized daily activities:
+            
+            Recent moods (oldest first): {"; ".join(moods) or "none logged"}
+            Recent journal insights: {self._format_insights(user_data.get('recent_insights') or [])}
+            Progress: {json.dumps(compact_stats, separators=(',', ':'))}
+            User preferences: {truncate(preferences, 100)}
+            
+            Suggest a mix of:
+            - Mindfulness/breathing exercises (5-15 min)
+            - Physical activity (10-30 min)
+            - Creative/journaling activities (10-20 min)
+            - Social connection activities
+            - Study/productivity techniques
+            
+            Format as JSON array with objects containing: type, title, estimated_minutes, description, cta_type
+            """
+        
+        # Drop the oldest mood logs until the prompt fits
+        prompt = render(mood_lines)
+        while estimate_tokens(prompt) > self.budgets['plan'] and mood_lines:
+            mood_lines = mood_lines[1:]
+            prompt = render(mood_lines)
+        return prompt
+    
+    # Chat prompts
+    def build_chat_prompt(self, message: str, conversation_history: Optional[List[dict]] = None,
+                          summary: Optional[str] = None, instructions: str = "") -> str:
+        """Chat prompt with the rolling summary and as many recent turns as the budget allows"""
+        summary_block = f"Summary of earlier conversation: {truncate(summary, self.summary_max_tokens)}\n" if summary else ""
+        
+        def render(turn_lines: List[str]) -> str:
+            return f"""
+            {summary_block}Previous conversation:
+            {"".join(turn_lines)}
+            Current message: {message}
+            
+            {instructions}
+            """
+        
+        turn_lines: List[str] = []
+        used = estimate_tokens(render([]))
+        # Newest turns are the most relevant, so fill the budget from the end
+        for turn in reversed(conversation_history or []):
+            line = (f"User: {truncate(turn.get('user', ''), self.turn_max_tokens)}\n"
+                    f"Assistant: {truncate(turn.get('assistant', ''), self.turn_max_tokens)}\n")
+            cost = estimate_tokens(line)
+            if used + cost > self.budgets['chat']:
+                break
+            turn_lines.insert(0, line)
+            used += cost
+        return render(turn_lines)
+    
+    def build_summary_prompt(self, previous_summary: Optional[str], turns: List[dict]) -> str:
+        """Prompt that folds older turns into the conversation's rolling summary"""
+        turn_text = "".join(
+            f"User: {truncate(turn.get('user', ''), self.turn_max_tokens)}\n"
+            f"Assistant: {truncate(turn.get('assistant', ''), self.turn_max_tokens)}\n"
+            for turn in turns
+        )
+        return f"""
+            Update the running summary of a supportive wellness conversation with a young person.
+            Keep what matters for continuing the conversation: their situation, feelings, worries,
+            goals and any coping strategies already suggested. Write at most 120 words in the third person.
+            
+            Current summary: {previous_summary or "(none)"}
+            
+            New turns:
+            {turn_text}
+            """
+    
+    def fit_journal_text(self, text: str) -> str:
+        """Trim a journal entry to the journal budget, keeping its beginning and end"""
+        budget = self.budgets['journal']
+        if estimate_tokens(text) <= budget:
+            return text
+        half = budget * 2
+        return f"{text[:half].rstrip()} [...] {text[-half:].lstrip()}"
+
+prompt_builder = PromptBuilder({
+    'chat': Config.PROMPT_BUDGET_CHAT_TOKENS,
+    'plan': Config.PROMPT_BUDGET_PLAN_TOKENS,
+    'journal': Config.PROMPT_BUDGET_JOURNAL_TOKENS
+})
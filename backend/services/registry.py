@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Creates service instances on first use and records how long each took.
+
+    Modules register a factory and export the returned proxy under the usual
+    singleton name, so importing a route no longer opens network clients.
+    Instances are dropped in forked children (see ``reset``), so a preloaded
+    parent can share imported code with its workers while every worker opens
+    its own gRPC/HTTP connections.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.init_ms: Dict[str, float] = {}
+        self.startup_ms: Dict[str, float] = {}
+        self.resets = 0
+
+    def register(self, name: str, factory: Callable[[], Any]) -> "LazyService":
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+        return LazyService(self, name)
+
+    def get(self, name: str) -> Any:
+        """Return the service instance, creating it on first call"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self.init_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+                self._instances[name] = instance
+                logger.info(f"Initialized {name} service in {self.init_ms[name]}ms")
+        return instance
+
+    def reset(self):
+        """Forget created instances so the next access builds fresh clients in this process"""
+        self._instances = {}
+        self.init_ms = {}
+        # A lock held by another thread at fork time would never be released in the child
+        self._locks = {name: threading.Lock() for name in self._factories}
+        self.resets += 1
+
+    def record_startup(self, label: str, started: float):
+        """Record a startup step that began at ``started`` (perf_counter)"""
+        self.startup_ms[label] = round((time.perf_counter() - started) * 1000, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return startup step timings and per-service lazy init timings"""
+        return {
+            'pid': os.getpid(),
+            'resets': self.resets,
+            'startup_ms': dict(self.startup_ms),
+            'services': {
+                name: {'initialized': name in self._instances, 'init_ms': self.init_ms.get(name)}
+                for name in self._factories
+            }
+        }
+
+
+class LazyService:
+    """Proxy that resolves to the registry's instance on first attribute access"""
+
+    __slots__ = ('_registry', '_name')
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._name} service>"
+
+
+registry = ServiceRegistry()
+
+# Clients created before a fork (gRPC channels, HTTP pools) must not be used by the child
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
@@ -1,5 +1,5 @@
-from google.cloud import storage
 from config import Config
+from services.registry import registry
 import logging
 from datetime import datetime, timedelta
 from typing import Optional
@@ -9,6 +9,8 @@ logger = logging.getLogger(__name__)
 class StorageService:
     def __init__(self):
         try:
+            # Imported here so loading this module doesn't pay for the SDK import
+            from google.cloud import storage
             self.client = storage.Client(project=Config.GCP_PROJECT)
             self.bucket_name = Config.GCS_BUCKET
             self.bucket = self.client.bucket(self.bucket_name)
@@ -79,4 +81,4 @@ class StorageService:
             logger.error(f"Failed to upload file to {destination_path}: {e}")
             return False
 
-storage_service = StorageService()
+storage_service = registry.register('storage', StorageService)
@@ -558,8 +558,12 @@ async function saveJournalEntry() {
             document.getElementById('journal-text').value = '';
             document.getElementById('word-count').textContent = '0';
             
-            // Show AI insights
-            showJournalInsights(data.data.insight);
+            // Show AI insights (analysis may still be running in the background)
+            if (data.data.analysis_status === 'pending') {
+                pollJournalInsight(data.data.entry_id);
+            } else {
+                showJournalInsights(data.data.insight);
+            }
             
             // Reload data
             loadUserStats();
@@ -578,6 +582,33 @@ async function saveJournalEntry() {
     }
 }
 
+// Poll for a journal insight that is being analyzed in the background
+async function pollJournalInsight(entryId, attempt = 0) {
+    const maxAttempts = 20;
+    
+    try {
+        const response = await makeAuthenticatedRequest(`/api/journal/${entryId}/insight`);
+        const data = await response.json();
+        
+        if (data.success && data.data.analysis_status === 'complete') {
+            showJournalInsights(data.data.insight);
+            loadRecentJournalEntries();
+            return;
+        }
+        
+        if (data.success && data.data.analysis_status === 'failed') {
+            showError('We saved your entry but could not analyze it right now');
+            return;
+        }
+    } catch (error) {
+        console.error('Error polling journal insight:', error);
+    }
+    
+    if (attempt < maxAttempts) {
+        setTimeout(() => pollJournalInsight(entryId, attempt + 1), 1500);
+    }
+}
+
 // Show journal insights
 function showJournalInsights(insight) {
     const modal = document.createElement('div');
@@ -698,7 +729,7 @@ async function sendChatMessage() {
     addTypingIndicator();
     
     try {
-        const response = await makeAuthenticatedRequest('/api/chat/', {
+        const response = await makeAuthenticatedRequest('/api/chat/stream', {
             method: 'POST',
             body: JSON.stringify({
                 message: message,
@@ -706,24 +737,58 @@ async function sendChatMessage() {
             })
         });
         
-        const data = await response.json();
+        if (!response.ok || !response.body) {
+            removeTypingIndicator();
+            addChatMessage('Sorry, I encountered an error. Please try again.', 'ai');
+            return;
+        }
         
-        // Remove typing indicator
-        removeTypingIndicator();
+        // Read server-sent events from the streaming response body
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let messageContent = null;
+        let responseText = '';
         
-        if (data.success) {
-            currentConversationId = data.data.conversation_id;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
             
-            // Add AI response
-            addChatMessage(data.data.response, 'ai');
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
             
-            // Show suggestions if any
-            if (data.data.suggestions && data.data.suggestions.length > 0) {
-                showChatSuggestions(data.data.suggestions);
+            for (const rawEvent of events) {
+                const eventName = (rawEvent.match(/^event: (.*)$/m) || [])[1];
+                const dataLine = (rawEvent.match(/^data: (.*)$/m) || [])[1];
+                if (!eventName || !dataLine) continue;
+                const payload = JSON.parse(dataLine);
+                
+                if (eventName === 'start') {
+                    currentConversationId = payload.conversation_id;
+                } else if (eventName === 'token') {
+                    if (!messageContent) {
+                        // First token: swap the typing indicator for the AI message bubble
+                        removeTypingIndicator();
+                        const messageEl = addChatMessage('', 'ai');
+                        messageContent = messageEl ? messageEl.querySelector('.message-content') : document.createElement('div');
+                    }
+                    responseText += payload.text;
+                    messageContent.textContent = responseText;
+                    const chatMessages = document.getElementById('chat-messages');
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (eventName === 'done') {
+                    if (payload.suggestions && payload.suggestions.length > 0) {
+                        showChatSuggestions(payload.suggestions);
+                    }
+                } else if (eventName === 'error') {
+                    removeTypingIndicator();
+                    addChatMessage('Sorry, I encountered an error. Please try again.', 'ai');
+                }
             }
-        } else {
-            addChatMessage('Sorry, I encountered an error. Please try again.', 'ai');
         }
+        
+        removeTypingIndicator();
     } catch (error) {
         console.error('Error sending chat message:', error);
         removeTypingIndicator();
@@ -766,6 +831,7 @@ function addChatMessage(message, sender) {
     chatMessages.scrollTop = chatMessages.scrollHeight;
     
     feather.replace();
+    return messageEl;
 }
 
 // Add typing indicator
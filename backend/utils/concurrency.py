@@ -0,0 +1,71 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide executor used for fan-out reads"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=Config.PARALLEL_MAX_WORKERS,
+                    thread_name_prefix="glowra-io"
+                )
+    return _executor
+
+
+def _run_in_worker(ctx: contextvars.Context, fn: Callable[[], Any]) -> Any:
+    _worker_state.active = True
+    try:
+        return ctx.run(fn)
+    finally:
+        _worker_state.active = False
+
+
+def parallel(*fns: Callable[[], Any]) -> List[Any]:
+    """Run independent zero-argument calls concurrently and return their results in order.
+
+    Each call runs in a copy of the caller's context, so Flask's ``g`` and
+    ``request`` remain available. The first exception raised is re-raised
+    here. Calls made from inside a worker run inline, so nested fan-out
+    can't deadlock the shared pool.
+    """
+    if len(fns) <= 1 or getattr(_worker_state, 'active', False):
+        return [fn() for fn in fns]
+
+    executor = get_executor()
+    futures = [executor.submit(_run_in_worker, contextvars.copy_context(), fn) for fn in fns]
+    return [future.result() for future in futures]
+
+
+def shutdown_executor():
+    """Stop the shared executor (used on worker shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _reset_after_fork():
+    # Worker threads don't survive fork; the child starts its own pool on first use
+    global _executor, _executor_lock, _worker_state
+    _executor = None
+    _executor_lock = threading.Lock()
+    _worker_state = threading.local()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,10 +1,21 @@
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import base64
 import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Numeric score for each mood label
+MOOD_SCORES = {
+    "happy": 5,
+    "neutral": 3,
+    "sad": 2,
+    "stressed": 2,
+    "anxious": 1
+}
+
 def get_current_utc_time():
     """Get current UTC timestamp"""
     return datetime.now(timezone.utc)
@@ -59,13 +70,7 @@ def calculate_mood_average(mood_logs: List[Dict[str, Any]]) -> Dict[str, float]:
         return {"mood_score": 0, "energy": 0, "stress": 0}
     
     # Convert mood to numeric scores
-    mood_scores = {
-        "happy": 5,
-        "neutral": 3,
-        "sad": 2,
-        "stressed": 2,
-        "anxious": 1
-    }
+    mood_scores = MOOD_SCORES
     
     total_mood = 0
     total_energy = 0
@@ -144,3 +149,99 @@ def format_response(data: Any, success: bool = True, message: str = None) -> Dic
         response["message"] = message
     
     return response
+
+
+def encode_cursor(last_item: Dict[str, Any]) -> str:
+    """Encode the last item of a page as an opaque pagination cursor"""
+    payload = {'ts': last_item['timestamp'].isoformat(), 'id': last_item['id']}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Decode a pagination cursor into a start_after position; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {'timestamp': datetime.fromisoformat(payload['ts']), 'id': payload['id']}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def calculate_rollup_average(rollups: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Calculate average mood metrics from daily rollup documents"""
+    count = sum(r.get("mood_count", 0) for r in rollups)
+    if not count:
+        return {"mood_score": 0, "energy": 0, "stress": 0}
+    
+    return {
+        "mood_score": round(sum(r.get("mood_score_sum", 0) for r in rollups) / count, 2),
+        "energy": round(sum(r.get("energy_sum", 0) for r in rollups) / count, 2),
+        "stress": round(sum(r.get("stress_sum", 0) for r in rollups) / count, 2)
+    }
+
+def get_rollup_wellness_insights(rollups: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Generate wellness insights from daily rollups (newest day first)"""
+    insights = {
+        "total_entries": sum(r.get("mood_count", 0) + r.get("journal_entries", 0) for r in rollups),
+        "recent_mood_trend": "stable",
+        "key_challenges": [],
+        "positive_patterns": []
+    }
+    
+    # Analyze mood trend over the last 7 days with check-ins
+    mood_days = [r for r in rollups if r.get("mood_count")][:7]
+    if len(mood_days) >= 3:
+        avg_recent = calculate_rollup_average(mood_days[:3])["mood_score"]
+        avg_older = calculate_rollup_average(mood_days[3:])["mood_score"] if mood_days[3:] else avg_recent
+        
+        if avg_recent > avg_older + 0.5:
+            insights["recent_mood_trend"] = "improving"
+        elif avg_recent < avg_older - 0.5:
+            insights["recent_mood_trend"] = "declining"
+    
+    # Identify top challenges from journal categories
+    category_counts = {}
+    for rollup in rollups:
+        for category, count in rollup.get("category_counts", {}).items():
+            category_counts[category] = category_counts.get(category, 0) + count
+    top_challenges = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+    insights["key_challenges"] = [challenge[0] for challenge in top_challenges]
+    
+    return insights
+
+def build_daily_rollups(mood_logs: List[Dict[str, Any]], journal_entries: List[Dict[str, Any]],
+                        daily_plans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Rebuild daily rollup documents from raw mood logs, journal entries and plans"""
+    rollups = {}
+    
+    def day(date_str):
+        return rollups.setdefault(date_str, {
+            "mood_count": 0, "mood_score_sum": 0, "energy_sum": 0, "stress_sum": 0,
+            "mood_counts": {}, "journal_entries": 0, "category_counts": {}, "tasks_completed": 0
+        })
+    
+    for log in mood_logs:
+        if not log.get("timestamp"):
+            continue
+        rollup = day(log["timestamp"].date().isoformat())
+        mood = log.get("mood", "neutral")
+        rollup["mood_count"] += 1
+        rollup["mood_score_sum"] += MOOD_SCORES.get(mood, 3)
+        rollup["energy_sum"] += log.get("energy", 0)
+        rollup["stress_sum"] += log.get("stress", 0)
+        rollup["mood_counts"][mood] = rollup["mood_counts"].get(mood, 0) + 1
+    
+    for entry in journal_entries:
+        if not entry.get("timestamp"):
+            continue
+        rollup = day(entry["timestamp"].date().isoformat())
+        rollup["journal_entries"] += 1
+        for category in (entry.get("ai_insight") or {}).get("categories", []):
+            rollup["category_counts"][category] = rollup["category_counts"].get(category, 0) + 1
+    
+    for plan in daily_plans:
+        completed = sum(1 for task in plan.get("tasks", []) if task.get("status") == "completed")
+        if plan.get("date") and completed:
+            day(plan["date"])["tasks_completed"] += completed
+    
+    return rollups
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from flask import g, request
+from flask_limiter import Limiter, RequestLimit
+from limits import parse_many
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_rejected: Dict[str, int] = {}
+_rejected_lock = threading.Lock()
+
+
+def user_rate_limit_key() -> str:
+    """Rate limit per authenticated user, falling back to the client address (resolved by ProxyFix)"""
+    user = getattr(g, 'current_user', None)
+    if user and user.get('uid'):
+        return f"user:{user['uid']}"
+    return f"ip:{request.remote_addr}"
+
+
+def _breach_counter(scope: str):
+    def on_breach(request_limit: RequestLimit):
+        with _rejected_lock:
+            _rejected[scope] = _rejected.get(scope, 0) + 1
+        logger.warning(f"Rate limit {request_limit.limit} exceeded for {request_limit.key}")
+    return on_breach
+
+
+limiter = Limiter(
+    key_func=user_rate_limit_key,
+    storage_uri=Config.RATELIMIT_STORAGE_URI,
+    strategy=Config.RATELIMIT_STRATEGY,
+    headers_enabled=True,
+    # Keep limiting per process if a shared store becomes unreachable
+    in_memory_fallback_enabled=True
+)
+
+# Each scope is a separate bucket per user. Apply below @require_auth so the
+# user is known, and above @handle_errors so the 429 isn't turned into a 500.
+ai_limit = limiter.shared_limit(Config.RATE_LIMIT_AI, scope='ai', on_breach=_breach_counter('ai'))
+standard_limit = limiter.shared_limit(Config.RATE_LIMIT_STANDARD, scope='standard',
+                                      on_breach=_breach_counter('standard'))
+_ai_limits = parse_many(Config.RATE_LIMIT_AI)
+
+
+def charge_ai_limit() -> Optional[Tuple[str, int]]:
+    """Charge one call to the caller's 'ai' bucket from inside a view.
+
+    For routes under @standard_limit that only sometimes call the model; the
+    counters are shared with @ai_limit. Returns None if the call is allowed,
+    else (breached limit, seconds until it resets) and nothing is charged.
+    """
+    key = user_rate_limit_key()
+    strategy = limiter.limiter
+    for item in _ai_limits:
+        if not strategy.test(item, key, 'ai'):
+            _breach_counter('ai')(RequestLimit(limiter, item, [key, 'ai'], True, True))
+            reset_at = strategy.get_window_stats(item, key, 'ai').reset_time
+            return str(item), max(1, int(reset_at - time.time()) + 1)
+    for item in _ai_limits:
+        strategy.hit(item, key, 'ai')
+    return None
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    """Return configured limits and rejected call counts per scope"""
+    with _rejected_lock:
+        rejected = dict(_rejected)
+    return {
+        'storage': Config.RATELIMIT_STORAGE_URI.split('://', 1)[0],
+        'per_process': Config.RATELIMIT_STORAGE_URI.startswith('memory://'),
+        'limits': {'ai': Config.RATE_LIMIT_AI, 'standard': Config.RATE_LIMIT_STANDARD},
+        'rejected': rejected
+    }
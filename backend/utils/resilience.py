@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict
+import logging
+
+import httpx
+from google.genai import errors as genai_errors
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying: rate limiting and transient server failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit breaker is open"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call's time budget runs out before it can be attempted"""
+
+
+class Deadline:
+    """Absolute time budget shared by every attempt of one logical call"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe.
+
+    Closed: calls pass through. After ``failure_threshold`` consecutive
+    failures the breaker opens and rejects calls for ``reset_timeout_seconds``.
+    It then lets one probe through (half-open); success closes it, failure
+    re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.transitions: Dict[str, int] = {}
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                    self.rejected += 1
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def release(self):
+        """Give back a half-open probe slot without recording an outcome"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _transition(self, state: str):
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning(f"Circuit {self.name} {key}")
+        self.state = state
+
+    def stats(self) -> Dict[str, Any]:
+        """Return breaker state and transition counters for monitoring"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'rejected': self.rejected,
+                'transitions': dict(self.transitions)
+            }
+
+
+def is_retryable(error: Exception) -> bool:
+    """Return True for transient Gemini/network errors"""
+    if isinstance(error, genai_errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError, ConnectionError, TimeoutError))
+
+
+def call_with_retries(fn: Callable[[float], Any], deadline: Deadline, breaker: CircuitBreaker,
+                      max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 4.0,
+                      retryable: Callable[[Exception], bool] = is_retryable) -> Any:
+    """Call ``fn(timeout_seconds)`` with retries bounded by the deadline and the breaker.
+
+    Only retryable errors are retried and count as breaker failures; other
+    exceptions (bad requests, validation errors) are raised immediately.
+    Backoff uses full jitter and is skipped when it would not leave time for
+    another attempt.
+    """
+    attempt = 0
+    while True:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{breaker.name} deadline exhausted after {attempt} attempts")
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} circuit is open")
+
+        attempt += 1
+        try:
+            result = fn(remaining)
+        except Exception as e:
+            if not retryable(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            if attempt >= max_attempts or breaker.state == breaker.OPEN or delay >= deadline.remaining():
+                raise
+            logger.warning(f"{breaker.name} attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result